@@ -5,9 +5,11 @@ Provides JWT validation and role-based access control.
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
+import hashlib
 import os
 import logging
+import re
 import time
 import httpx
 from sqlalchemy import create_engine
@@ -25,10 +27,21 @@ logger = logging.getLogger(__name__)
 JWKS_CACHE_TTL_SECONDS = 10 * 60
 ASYMMETRIC_JWT_ALGORITHMS = {"ES256", "RS256"}
 
+# Compact JWS shape: three non-empty base64url segments. Checked before jose
+# so garbage tokens are rejected with a string scan, not a decode attempt.
+_JWT_SHAPE = re.compile(r"[A-Za-z0-9_\-]+\.[A-Za-z0-9_\-]+\.[A-Za-z0-9_\-]+")
+
+# Successfully verified tokens are remembered briefly so a client reusing one
+# token does not pay for signature verification on every request. Entries
+# never outlive the token's own exp claim; failures are never cached.
+VERIFIED_JWT_CACHE_TTL_SECONDS = 30
+VERIFIED_JWT_CACHE_MAX_ENTRIES = 10_000
+
 # Database session for profile management
 _profile_session = None
 _jwks_cache: Optional[Dict[str, Any]] = None
 _jwks_cache_expires_at = 0.0
+_verified_jwt_cache: Dict[bytes, Tuple[Dict[str, Any], float]] = {}
 
 
 class AuthConfigurationError(Exception):
@@ -99,6 +112,39 @@ async def _decode_supabase_jwt(token: str) -> Dict[str, Any]:
     SUPABASE_JWT_SECRET. Projects migrated to Supabase JWT signing keys issue
     asymmetric ES256/RS256 tokens verified through the project's JWKS endpoint.
     """
+    if token.count(".") != 2 or not _JWT_SHAPE.fullmatch(token):
+        raise JWTError("Malformed token")
+
+    cache_key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+    cached = _verified_jwt_cache.get(cache_key)
+    if cached is not None:
+        payload, expires_at = cached
+        if now < expires_at:
+            return payload
+        del _verified_jwt_cache[cache_key]
+
+    payload = await _verify_supabase_jwt(token)
+    _remember_verified_jwt(cache_key, payload, now)
+    return payload
+
+
+def _remember_verified_jwt(cache_key: bytes, payload: Dict[str, Any], now: float) -> None:
+    """Cache a verified payload until min(TTL, token exp)."""
+    exp = payload.get("exp")
+    if not isinstance(exp, (int, float)):
+        return
+    expires_at = min(now + VERIFIED_JWT_CACHE_TTL_SECONDS, exp)
+    if expires_at <= now:
+        return
+    if len(_verified_jwt_cache) >= VERIFIED_JWT_CACHE_MAX_ENTRIES:
+        # dicts keep insertion order, so this evicts the oldest entry
+        del _verified_jwt_cache[next(iter(_verified_jwt_cache))]
+    _verified_jwt_cache[cache_key] = (payload, expires_at)
+
+
+async def _verify_supabase_jwt(token: str) -> Dict[str, Any]:
+    """Verify the token signature and claims for its header algorithm."""
     header = jwt.get_unverified_header(token)
     alg = header.get("alg")
 
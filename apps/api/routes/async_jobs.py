@@ -5,8 +5,8 @@ from redis import asyncio as aioredis
 import os
 import json
 import uuid
-import base64
 import time
+import msgpack
 
 router = APIRouter()
 
@@ -53,18 +53,24 @@ async def ingest_image_async(
             "submitted_at": submitted_at,
         }
 
-        await redis.setex(
+        # Job metadata, image and queue entry go out in one round-trip
+        pipe = redis.pipeline(transaction=False)
+        pipe.setex(
             f"ingestion:job:{job_id}",
             3600,
             json.dumps(job_meta)
         )
         
-        # Submit to ingestion queue
-        await redis.lpush(
+        # Submit to ingestion queue (a stream read by the workers' consumer group).
+        # The image goes under its own key and the job only references it, so
+        # queue entries stay small; the worker deletes it once the job is done.
+        image_key = f"image:{job_id}"
+        pipe.set(image_key, img_bytes, ex=3600)
+        pipe.xadd(
             "ingestion:jobs",
-            json.dumps({
+            {"job": msgpack.packb({
                 "job_id": job_id,
-                "image_b64": base64.b64encode(img_bytes).decode(),
+                "image_key": image_key,
                 "user_id": user.id,
                 "priority": priority,
                 "filename": file.filename,
@@ -73,8 +79,9 @@ async def ingest_image_async(
                 "text_hint": x_client_caption,
                 "client_confidence": x_client_confidence,
                 "submitted_at": submitted_at
-            })
+            })}
         )
+        await pipe.execute()
         
         return {
             "job_id": job_id,
@@ -1,11 +1,17 @@
 """Image management routes - upload, get, update, delete, list"""
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Header, Response
 from pydantic import BaseModel
-from typing import Optional
-import hashlib
+from typing import Any, Dict, List, Optional
+import asyncio
+import ipaddress
+import json
 import os
+import socket
 import time
 import logging
+from urllib.parse import urljoin, urlsplit
+
+import httpx
 
 from apps.api.deps import get_embedder, get_vector_store, get_image_storage, get_captioner
 from apps.api.services.embedder_client import EmbedderClient
@@ -13,18 +19,16 @@ from apps.api.services.captioner_client import CaptionerClient
 from apps.api.services.image_storage import ImageStorage
 from apps.api.auth.dependencies import get_current_user, require_auth
 from apps.api.auth.models import CurrentUser
-from apps.api.services.routing.router import AIFeatureRouter, RoutingContext, RoutingTier
+from apps.api.services.ingest import ingest_image_bytes
 
 logger = logging.getLogger("imagesearch")
 
 router = APIRouter(prefix="/images", tags=["images"])
 
 # Import metrics from main module to avoid circular imports
-from prometheus_client import Counter, Histogram
+from prometheus_client import Histogram
 
 # These will be initialized when the module is imported
-ROUTED_LOCAL = Counter("router_local_total", "Local caption route count")
-ROUTED_CLOUD = Counter("router_cloud_total", "Cloud caption route count")
 LATENCY = Histogram("request_latency_ms", "Request latency (ms)", buckets=(50,100,200,400,800,1600,3200))
 
 
@@ -33,10 +37,89 @@ class ImageUpdate(BaseModel):
     visibility: Optional[str] = None
 
 
+class BatchIngestItem(BaseModel):
+    """A single remote image to ingest via POST /images/batch"""
+    url: str
+    metadata: Dict[str, Any] = {}
+
+
+class BatchIngestRequest(BaseModel):
+    """Schema for bulk ingestion of remote images"""
+    items: List[BatchIngestItem]
+    visibility: str = "private"
+
+
+# Upper bound on items accepted per batch request
+MAX_BATCH_SIZE = int(os.getenv("INGEST_MAX_BATCH_SIZE", "64"))
+# Images fetched/processed concurrently within a batch
+BATCH_CONCURRENCY = int(os.getenv("INGEST_BATCH_CONCURRENCY", "8"))
+# Largest remote image accepted (the upload limit of validate_image_bytes)
+MAX_FETCH_BYTES = int(os.getenv("INGEST_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+# Redirects followed per URL; every hop is checked like the original URL
+MAX_FETCH_REDIRECTS = 3
+# Hosts fetched even if they resolve to internal addresses (e.g. a MinIO
+# bucket on the private network); comma-separated, empty = public hosts only
+FETCH_ALLOWED_HOSTS = {
+    h.strip().lower() for h in os.getenv("INGEST_URL_ALLOWED_HOSTS", "").split(",") if h.strip()
+}
+
+
+async def _check_fetch_url(url: str):
+    """Reject URLs the server must not fetch on a user's behalf.
+    
+    Only http(s) URLs whose host resolves exclusively to public addresses
+    (or is in INGEST_URL_ALLOWED_HOSTS) pass, so batch ingestion can't be
+    pointed at internal services or cloud metadata endpoints.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise HTTPException(400, "Only http(s) URLs can be ingested")
+    host = parts.hostname.lower()
+    if host in FETCH_ALLOWED_HOSTS:
+        return
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (OSError, ValueError):
+        raise HTTPException(400, f"Cannot resolve host {host}")
+    for info in infos:
+        if not ipaddress.ip_address(info[4][0]).is_global:
+            raise HTTPException(400, f"Host {host} is not a public address")
+
+
+def _fetch_client() -> httpx.AsyncClient:
+    """HTTP client for batch fetches; redirects are followed by _fetch_image"""
+    return httpx.AsyncClient(timeout=30.0, follow_redirects=False)
+
+
+async def _fetch_image(client: httpx.AsyncClient, url: str) -> bytes:
+    """Download a remote image, checking every redirect hop and capping its size"""
+    for _ in range(MAX_FETCH_REDIRECTS + 1):
+        await _check_fetch_url(url)
+        async with client.stream("GET", url) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers.get("location", ""))
+                continue
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "")
+            if not content_type.lower().startswith("image/"):
+                raise HTTPException(415, f"Not an image (content-type {content_type or 'missing'})")
+            if int(response.headers.get("content-length") or 0) > MAX_FETCH_BYTES:
+                raise HTTPException(413, f"Image larger than {MAX_FETCH_BYTES} bytes")
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) > MAX_FETCH_BYTES:
+                    raise HTTPException(413, f"Image larger than {MAX_FETCH_BYTES} bytes")
+            return bytes(body)
+    raise HTTPException(400, "Too many redirects")
+
+
 @router.post("")
 async def ingest_image(
     file: UploadFile = File(...),
     visibility: str = Form("private"),
+    metadata: Optional[str] = Form(None),
     current_user: CurrentUser = Depends(require_auth),
     captioner: CaptionerClient = Depends(get_captioner),
     embedder: EmbedderClient = Depends(get_embedder),
@@ -51,125 +134,28 @@ async def ingest_image(
         print(f"DEBUG: ingest_image headers: x_client_caption={x_client_caption}, x_client_confidence={x_client_confidence}")
         img_bytes = await file.read()
         src = {"source": "upload", "filename": file.filename}
-
-        image_id = hashlib.sha256(img_bytes).hexdigest()[:16]
-
-        # 1. Local Caption (always run for fallback/metrics)
-        local_caption, local_conf, local_ms = await captioner.caption(img_bytes)
-
-        # 2. Route Request (Tier 1/2/3/4)
-        # We pass the client caption as a hint to the router
-        ai_router = AIFeatureRouter()
-        try:
-            budget_ms = int(os.getenv("CAPTION_LATENCY_BUDGET_MS", 600))
-        except Exception:
-            budget_ms = 600
-            
-        routing_decision = await ai_router.route_caption_request(
-            image_bytes=img_bytes,
-            context=RoutingContext(latency_budget_ms=budget_ms),
-            text_hint=x_client_caption,
-            client_confidence=x_client_confidence
-        )
-        
-        tier = routing_decision.tier
-        caption = local_caption # Default to local caption
-        origin = "local"
-        conf = local_conf
-        
-        use_cloud = routing_decision.tier == RoutingTier.CLOUD
-        use_cache = routing_decision.tier == RoutingTier.CACHE
-        use_edge = routing_decision.tier == RoutingTier.EDGE
         
-        logger.info(
-            f"routing_decision: tier={routing_decision.tier} reason={routing_decision.reason}",
-            extra={"tier": routing_decision.tier, "reason": routing_decision.reason}
-        )
-        
-        if use_cache:
-            # Cache hit!
-            logger.info("routing: cache hit", extra={"tier": "cache"})
-            cached = routing_decision.metadata.get("cached_result", {})
-            caption = cached.get("caption", local_caption)
-            origin = cached.get("origin", "cache")
-            conf = cached.get("confidence", 1.0)
-            
-        elif use_edge:
-            # Edge accepted!
-            logger.info("routing: edge accepted", extra={"tier": "edge"})
-            caption = x_client_caption
-            origin = "edge"
-            conf = x_client_confidence or 1.0
-            
-        elif use_cloud:
-            logger.info("routing: attempting cloud caption", extra={"use_cloud": True})
-            cloud_caption, cloud_ms, cost_usd = await captioner.caption_cloud(img_bytes)
-            if cloud_caption:
-                caption = cloud_caption
-                origin = "cloud"
-                ROUTED_CLOUD.inc()
-                logger.info(
-                    f"routing: cloud_success latency_ms={cloud_ms} cost_usd={cost_usd}",
-                    extra={"cloud_latency_ms": cloud_ms, "cost_usd": cost_usd}
-                )
-                # Store in cache
-                await ai_router.cache.store(img_bytes, {
-                    "caption": caption,
-                    "confidence": 1.0, # Cloud is high conf
-                    "origin": "cloud"
-                })
-            else:
-                ROUTED_LOCAL.inc()  # fallback failed → keep local
-                logger.warning("routing: cloud_fallback_failed; using local caption", extra={"use_cloud": True})
-        else:
-            ROUTED_LOCAL.inc()
-
-        # Embeddings (image + caption text)
-        embedder = get_embedder()
-        img_vec = await embedder.embed_image(img_bytes)
-
-        # Persist image and thumbnail to configured storage
-        img_metadata = await storage.save_image(image_id=image_id, image_bytes=img_bytes, generate_thumbnail=True)
-
-        # Validate visibility
-        if visibility not in ("private", "public", "public_admin"):
-            raise HTTPException(400, "visibility must be 'private', 'public', or 'public_admin'")
-        
-        # Only admins can create public_admin images
-        if visibility == "public_admin" and not current_user.is_admin():
-            raise HTTPException(403, "Only admins can create public_admin images")
-        
-        store = get_vector_store()
-        await store.upsert_image(
-            image_id=image_id,
-            caption=caption,
-            caption_confidence=conf,
-            caption_origin=origin,
-            img_vec=img_vec,
-            payload={"src": src},
-            file_path=img_metadata.file_path,
-            format=img_metadata.format,
-            size_bytes=img_metadata.size_bytes,
-            width=img_metadata.width,
-            height=img_metadata.height,
-            thumbnail_path=img_metadata.thumbnail_path,
-            owner_user_id=current_user.id,
-            visibility=visibility
-        )
+        # Optional JSON object of caller metadata (dataset, license, ...)
+        extra = None
+        if metadata:
+            try:
+                extra = json.loads(metadata)
+            except ValueError:
+                raise HTTPException(400, "metadata must be a JSON object")
+            if not isinstance(extra, dict):
+                raise HTTPException(400, "metadata must be a JSON object")
 
-        base_url = os.getenv("BASE_URL", "http://localhost:8000").rstrip("/")
-        return {
-            "id": image_id, 
-            "caption": caption, 
-            "origin": origin, 
-            "confidence": conf,
-            "download_url": f"{base_url}/images/{image_id}/download",
-            "thumbnail_url": f"{base_url}/images/{image_id}/thumbnail",
-            "width": img_metadata.width,
-            "height": img_metadata.height,
-            "size_bytes": img_metadata.size_bytes,
-            "format": img_metadata.format
-        }
+        return await ingest_image_bytes(
+            img_bytes,
+            src,
+            visibility,
+            current_user,
+            captioner,
+            storage,
+            client_caption=x_client_caption,
+            client_confidence=x_client_confidence,
+            metadata=extra
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -187,6 +173,67 @@ async def ingest_image(
             pass
 
 
+@router.post("/batch")
+async def ingest_images_batch(
+    request: BatchIngestRequest,
+    current_user: CurrentUser = Depends(require_auth),
+    captioner: CaptionerClient = Depends(get_captioner),
+    storage: ImageStorage = Depends(get_image_storage)
+):
+    """Ingest a batch of remote images by URL in a single request.
+    
+    Used by the dataset seeders to avoid one HTTP round trip per image.
+    Items are processed concurrently; failures are reported per item and
+    do not fail the whole batch.
+    """
+    if len(request.items) > MAX_BATCH_SIZE:
+        raise HTTPException(413, f"Batch too large (max {MAX_BATCH_SIZE} items)")
+    
+    # Validate visibility once for the whole batch
+    if request.visibility not in ("private", "public", "public_admin"):
+        raise HTTPException(400, "visibility must be 'private', 'public', or 'public_admin'")
+    
+    if request.visibility == "public_admin" and not current_user.is_admin():
+        raise HTTPException(403, "Only admins can create public_admin images")
+    
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def ingest_item(client: httpx.AsyncClient, item: BatchIngestItem) -> dict:
+        async with semaphore:
+            t0 = time.time()
+            try:
+                img_bytes = await _fetch_image(client, item.url)
+                result = await ingest_image_bytes(
+                    img_bytes,
+                    {"source": "url", "url": item.url},
+                    request.visibility,
+                    current_user,
+                    captioner,
+                    storage,
+                    metadata=item.metadata
+                )
+                result["url"] = item.url
+                return result
+            except HTTPException as e:
+                return {"url": item.url, "error": e.detail}
+            except Exception as e:
+                logger.warning(f"batch ingest failed for {item.url}: {e}")
+                return {"url": item.url, "error": str(e)}
+            finally:
+                LATENCY.observe(max(1.0, (time.time() - t0) * 1000.0))
+    
+    async with _fetch_client() as client:
+        outcomes = await asyncio.gather(*(ingest_item(client, item) for item in request.items))
+    
+    results = [o for o in outcomes if "error" not in o]
+    errors = [o for o in outcomes if "error" in o]
+    return {
+        "results": results,
+        "errors": errors,
+        "count": len(results)
+    }
+
+
 @router.get("")
 async def list_images(
     limit: int = 20,
@@ -1,8 +1,10 @@
+import asyncio
 import time
 from typing import Tuple, Optional
 from PIL import Image
 import io
 import sys
+import threading
 
 # Monkeypatch lzma if missing (common on some python builds)
 try:
@@ -29,15 +31,34 @@ from apps.api.services.cloud_providers.circuit_breaker import get_circuit_breake
 
 _processor = None
 _model = None
+# captions run in worker threads, so two first calls can race to load BLIP
+_load_lock = threading.Lock()
 
 def _load_blip():
     global _processor, _model
-    if _processor is None or _model is None:
-        if not _BLIP_OK:
-            raise RuntimeError("transformers/torch not available")
-        _processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-        _model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-        _model.eval()
+    if _processor is not None and _model is not None:
+        return
+    with _load_lock:
+        if _processor is None or _model is None:
+            if not _BLIP_OK:
+                raise RuntimeError("transformers/torch not available")
+            processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
+            model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
+            model.eval()
+            _processor, _model = processor, model
+
+def _caption_local(img_bytes: bytes, image: Optional[Image.Image] = None) -> Tuple[str, float]:
+    # Blocking; callers run it in a thread so generate() doesn't stall the loop
+    _load_blip()
+    if image is None:
+        image = Image.open(io.BytesIO(img_bytes))
+    inputs = _processor(images=image.convert("RGB"), return_tensors="pt")
+    with torch.no_grad():
+        out = _model.generate(**inputs, max_new_tokens=30)
+    text = _processor.decode(out[0], skip_special_tokens=True)
+    # naive confidence proxy: inverse length penalty + basic heuristic
+    conf = max(0.0, min(1.0, 0.9 - 0.005 * max(0, len(text) - 15)))
+    return text, conf
 
 class CaptionerClient:
     def __init__(self):
@@ -56,8 +77,18 @@ class CaptionerClient:
                 self._cloud_provider = None
         return self._cloud_provider
     
-    async def caption(self, img_bytes: bytes) -> Tuple[str, float, int]:
-        start = time.time()
+    async def warmup(self):
+        """Load BLIP now so the first caption doesn't pay for it"""
+        try:
+            await asyncio.to_thread(_load_blip)
+        except Exception as e:
+            print(f"[WARN] Captioner warmup failed (will fall back to cloud/mock): {e}")
+    
+    async def caption(self, img_bytes: bytes, image: Optional[Image.Image] = None) -> Tuple[str, float, int]:
+        """Caption locally (BLIP), falling back to cloud, then to a mock caption.
+        
+        Pass `image` if `img_bytes` is already decoded to skip re-decoding.
+        """
         start = time.time()
         import os
         use_real = os.getenv("USE_REAL_CAPTIONER", "true").lower() == "true"
@@ -65,14 +96,7 @@ class CaptionerClient:
         try:
             if not use_real:
                 raise RuntimeError("Local captioner disabled by config")
-            _load_blip()
-            image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-            inputs = _processor(images=image, return_tensors="pt")
-            with torch.no_grad():
-                out = _model.generate(**inputs, max_new_tokens=30)
-            text = _processor.decode(out[0], skip_special_tokens=True)
-            # naive confidence proxy: inverse length penalty + basic heuristic
-            conf = max(0.0, min(1.0, 0.9 - 0.005 * max(0, len(text) - 15)))
+            text, conf = await asyncio.to_thread(_caption_local, img_bytes, image)
         except Exception as e:
             print(f"[WARN] Local captioner failed/disabled: {e}")
             # Fallback to cloud
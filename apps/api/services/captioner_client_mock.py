@@ -26,7 +26,10 @@ class CaptionerClient:
                 self._cloud_provider = None
         return self._cloud_provider
 
-    async def caption(self, img_bytes: bytes) -> Tuple[str, float, int]:
+    async def warmup(self):
+        """Nothing to load"""
+
+    async def caption(self, img_bytes: bytes, image=None) -> Tuple[str, float, int]:
         """Generate a mock caption based on image hash"""
         start = time.time()
         
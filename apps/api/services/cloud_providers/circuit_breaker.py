@@ -1,9 +1,11 @@
 """Circuit breaker for cloud provider fault tolerance"""
 
+import itertools
 import time
 import os
+import threading
 from enum import Enum
-from typing import Optional
+from typing import Callable, Optional
 
 try:
     from .metrics import get_metrics
@@ -23,6 +25,9 @@ class CircuitBreaker:
     """
     Circuit breaker pattern implementation for cloud API calls.
     Prevents cascading failures by temporarily blocking requests when errors exceed threshold.
+    State checks and transitions are serialized by a lock, so at most
+    half_open_max_calls probes are admitted even under concurrent callers.
+    Failures below the threshold only bump a counter and skip the lock.
     """
     
     def __init__(
@@ -30,6 +35,7 @@ class CircuitBreaker:
         failure_threshold: Optional[int] = None,
         timeout_seconds: Optional[int] = None,
         half_open_max_calls: int = 1,
+        time_fn: Callable[[], float] = time.time,
     ):
         """
         Initialize circuit breaker.
@@ -38,6 +44,8 @@ class CircuitBreaker:
             failure_threshold: Number of failures before opening circuit
             timeout_seconds: Seconds to wait before attempting recovery
             half_open_max_calls: Max calls allowed in half-open state
+            time_fn: Clock returning seconds; wall-clock by default since
+                opened_at/last_failure_time are reported in get_stats()
         """
         self.failure_threshold = failure_threshold or int(
             os.getenv("CLOUD_CIRCUIT_BREAKER_THRESHOLD", 5)
@@ -46,14 +54,17 @@ class CircuitBreaker:
             os.getenv("CLOUD_CIRCUIT_BREAKER_TIMEOUT_SECONDS", 60)
         )
         self.half_open_max_calls = half_open_max_calls
+        self._time_fn = time_fn
         
         # State
         self.state = CircuitState.CLOSED
         self.failure_count = 0
+        self._failure_counter = itertools.count(1)
         self.success_count = 0
         self.last_failure_time = None
         self.opened_at = None
         self.half_open_calls = 0
+        self._lock = threading.Lock()
         
         # Metrics
         self.metrics = get_metrics() if METRICS_AVAILABLE else None
@@ -67,69 +78,80 @@ class CircuitBreaker:
         Returns:
             Tuple of (can_proceed, reason_if_blocked)
         """
-        current_time = time.time()
-        
-        if self.state == CircuitState.CLOSED:
-            # Normal operation
-            return True, None
-        
-        elif self.state == CircuitState.OPEN:
-            # Check if timeout expired
-            if self.opened_at and (current_time - self.opened_at) >= self.timeout_seconds:
-                # Transition to half-open
-                self._transition_to_half_open()
-                return True, None
-            else:
-                remaining = self.timeout_seconds - int(current_time - self.opened_at) if self.opened_at else 0
-                if self.metrics:
-                    self.metrics.record_circuit_breaker_rejected()
-                return False, f"Circuit breaker OPEN ({remaining}s remaining until retry)"
-        
-        elif self.state == CircuitState.HALF_OPEN:
-            # Allow limited calls for testing
-            if self.half_open_calls < self.half_open_max_calls:
-                self.half_open_calls += 1
+        with self._lock:
+            current_time = self._time_fn()
+            
+            if self.state == CircuitState.CLOSED:
+                # Normal operation
                 return True, None
-            else:
-                return False, "Circuit breaker HALF_OPEN (max test calls reached)"
-        
-        return False, "Unknown circuit state"
+            
+            elif self.state == CircuitState.OPEN:
+                # Check if timeout expired
+                if self.opened_at and (current_time - self.opened_at) >= self.timeout_seconds:
+                    # Transition to half-open; this caller is the first probe
+                    self._transition_to_half_open()
+                    self.half_open_calls = 1
+                    return True, None
+                else:
+                    remaining = self.timeout_seconds - int(current_time - self.opened_at) if self.opened_at else 0
+                    if self.metrics:
+                        self.metrics.record_circuit_breaker_rejected()
+                    return False, f"Circuit breaker OPEN ({remaining}s remaining until retry)"
+            
+            elif self.state == CircuitState.HALF_OPEN:
+                # Allow limited calls for testing
+                if self.half_open_calls < self.half_open_max_calls:
+                    self.half_open_calls += 1
+                    return True, None
+                else:
+                    return False, "Circuit breaker HALF_OPEN (max test calls reached)"
+            
+            return False, "Unknown circuit state"
     
     def record_success(self):
         """Record a successful request"""
-        if self.metrics:
-            self.metrics.record_circuit_breaker_success()
-        
-        if self.state == CircuitState.CLOSED:
-            # Reset failure count on success
-            if self.failure_count > 0:
-                self.failure_count = 0
-        
-        elif self.state == CircuitState.HALF_OPEN:
-            self.success_count += 1
-            # If success in half-open, close the circuit
-            self._transition_to_closed()
+        with self._lock:
+            if self.metrics:
+                self.metrics.record_circuit_breaker_success()
+            
+            if self.state == CircuitState.CLOSED:
+                # Reset failure count on success
+                if self.failure_count > 0:
+                    self._reset_failures()
+            
+            elif self.state == CircuitState.HALF_OPEN:
+                self.success_count += 1
+                # If success in half-open, close the circuit
+                self._transition_to_closed()
     
     def record_failure(self):
         """Record a failed request"""
         if self.metrics:
             self.metrics.record_circuit_breaker_failure()
         
-        self.last_failure_time = time.time()
+        self.last_failure_time = self._time_fn()
         
         if self.state == CircuitState.CLOSED:
-            self.failure_count += 1
-            if self.failure_count >= self.failure_threshold:
-                self._transition_to_open()
+            # next() on itertools.count is atomic under the GIL, so the
+            # common below-threshold case needs no lock
+            count = next(self._failure_counter)
+            self.failure_count = count
+            if count < self.failure_threshold:
+                return
         
-        elif self.state == CircuitState.HALF_OPEN:
-            # Failure in half-open, go back to open
-            self._transition_to_open()
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                if self.failure_count >= self.failure_threshold:
+                    self._transition_to_open()
+            
+            elif self.state == CircuitState.HALF_OPEN:
+                # Failure in half-open, go back to open
+                self._transition_to_open()
     
     def _transition_to_open(self):
         """Transition to OPEN state"""
         self.state = CircuitState.OPEN
-        self.opened_at = time.time()
+        self.opened_at = self._time_fn()
         if self.metrics:
             self.metrics.update_circuit_breaker_state('open')
             self.metrics.record_circuit_breaker_opened()
@@ -145,13 +167,18 @@ class CircuitBreaker:
     def _transition_to_closed(self):
         """Transition to CLOSED state"""
         self.state = CircuitState.CLOSED
-        self.failure_count = 0
+        self._reset_failures()
         self.success_count = 0
         self.half_open_calls = 0
         self.opened_at = None
         if self.metrics:
             self.metrics.update_circuit_breaker_state('closed')
     
+    def _reset_failures(self):
+        """Restart the consecutive-failure count"""
+        self._failure_counter = itertools.count(1)
+        self.failure_count = 0
+    
     def get_stats(self) -> dict:
         """Get circuit breaker statistics"""
         return {
@@ -166,7 +193,8 @@ class CircuitBreaker:
     
     def reset(self):
         """Manually reset circuit breaker"""
-        self._transition_to_closed()
+        with self._lock:
+            self._transition_to_closed()
 
 
 # Global circuit breaker instance
@@ -1,5 +1,6 @@
 """Mock cloud provider for testing without API keys"""
 
+import os
 import time
 import hashlib
 from .base import CloudCaptionProvider, CloudCaptionResponse
@@ -19,6 +20,10 @@ class MockCloudProvider(CloudCaptionProvider):
         self.input_cost = 0.0001  # Mock cost per 1M tokens
         self.output_cost = 0.0004
         
+        # Fixed simulated latency; unset means a random 1-3 seconds
+        latency_ms = os.getenv("MOCK_PROVIDER_LATENCY_MS")
+        self.latency_ms = int(latency_ms) if latency_ms is not None else None
+        
         # Initialize metrics, rate limiter, and circuit breaker
         self.metrics = get_metrics()
         self.rate_limiter = get_rate_limiter()
@@ -109,6 +114,10 @@ class MockCloudProvider(CloudCaptionProvider):
     async def _simulate_latency(self):
         """Simulate API call latency"""
         import asyncio
+        if self.latency_ms is not None:
+            if self.latency_ms > 0:
+                await asyncio.sleep(self.latency_ms / 1000)
+            return
         # Random latency between 1-3 seconds
         import random
         delay = random.uniform(1.0, 3.0)
@@ -41,6 +41,8 @@ class OpenRouterProvider(CloudCaptionProvider):
         self.rate_limiter = get_rate_limiter()
         self.metrics = get_metrics()
         self.tracing = get_tracing()
+        # One pooled client per provider, so repeat captions reuse the TLS connection
+        self.client = httpx.AsyncClient(timeout=30.0)
         
         # Load pricing configuration
         self._load_pricing()
@@ -150,14 +152,13 @@ class OpenRouterProvider(CloudCaptionProvider):
                 self.tracing.add_event(parent_span, 'api_request_start')
                 
                 with self.metrics.track_request('openrouter'):
-                    async with httpx.AsyncClient(timeout=30.0) as client:
-                        response = await client.post(
-                            self.api_url,
-                            headers=headers,
-                            json=payload
-                        )
-                        response.raise_for_status()
-                        data = response.json()
+                    response = await self.client.post(
+                        self.api_url,
+                        headers=headers,
+                        json=payload
+                    )
+                    response.raise_for_status()
+                    data = response.json()
                 
                 self.tracing.add_event(parent_span, 'api_response_received')
                 
@@ -3,7 +3,8 @@
 import time
 import os
 from collections import deque
-from typing import Optional
+from itertools import repeat
+from typing import Callable, Optional
 
 try:
     from .metrics import get_metrics
@@ -23,6 +24,7 @@ class RateLimiter:
         max_per_minute: Optional[int] = None,
         max_per_day: Optional[int] = None,
         daily_budget_usd: Optional[float] = None,
+        time_fn: Callable[[], float] = time.monotonic,
     ):
         """
         Initialize rate limiter.
@@ -31,28 +33,37 @@ class RateLimiter:
             max_per_minute: Maximum requests per minute (default from env)
             max_per_day: Maximum requests per day (default from env)
             daily_budget_usd: Maximum daily spend in USD (default from env)
+            time_fn: Clock returning seconds; only differences are used, so a
+                monotonic clock (the default) or a fake clock in tests both work
         """
         self.max_per_minute = max_per_minute or int(os.getenv("CLOUD_MAX_REQUESTS_PER_MINUTE", 60))
         self.max_per_day = max_per_day or int(os.getenv("CLOUD_MAX_REQUESTS_PER_DAY", 10000))
         self.daily_budget_usd = daily_budget_usd or float(os.getenv("CLOUD_DAILY_BUDGET_USD", 10.0))
+        self._time_fn = time_fn
         
         # Request tracking
-        self.minute_requests = deque()  # Timestamps of requests in last minute
-        self.daily_requests = []  # All requests today
+        self.minute_requests = deque()  # Timestamps of requests in last minute (oldest first)
+        self.daily_requests = deque()  # All requests today
         self.daily_cost = 0.0  # Total cost today
-        self.last_reset = time.time()  # Last daily reset time
+        self.last_reset = self._time_fn()  # Last daily reset time
         
         # Metrics
         self.metrics = get_metrics() if METRICS_AVAILABLE else None
     
     def _reset_daily_if_needed(self):
         """Reset daily counters if 24 hours have passed"""
-        now = time.time()
+        now = self._time_fn()
         if now - self.last_reset > 86400:  # 24 hours
-            self.daily_requests = []
+            self.daily_requests.clear()
             self.daily_cost = 0.0
             self.last_reset = now
     
+    def _prune_minute_window(self, now: float):
+        """Drop timestamps older than 60s from the front of the window"""
+        window = self.minute_requests
+        while window and now - window[0] >= 60:
+            window.popleft()
+    
     def can_proceed(self, estimated_cost_usd: float = 0.001) -> tuple[bool, Optional[str]]:
         """
         Check if request can proceed based on limits.
@@ -63,7 +74,7 @@ class RateLimiter:
         Returns:
             Tuple of (can_proceed, reason_if_blocked)
         """
-        now = time.time()
+        now = self._time_fn()
         self._reset_daily_if_needed()
         
         # Check daily budget
@@ -75,7 +86,7 @@ class RateLimiter:
             return False, reason
         
         # Check per-minute limit
-        self.minute_requests = deque([t for t in self.minute_requests if now - t < 60])
+        self._prune_minute_window(now)
         if len(self.minute_requests) >= self.max_per_minute:
             reason = f"Per-minute limit exceeded ({len(self.minute_requests)}/{self.max_per_minute})"
             if self.metrics:
@@ -102,10 +113,25 @@ class RateLimiter:
         Args:
             cost_usd: Actual cost of the request
         """
-        now = time.time()
-        self.minute_requests.append(now)
-        self.daily_requests.append(now)
-        self.daily_cost += cost_usd
+        self.record_requests(1, cost_usd)
+    
+    def record_requests(self, n: int, unit_cost_usd: float = 0.0):
+        """
+        Record a burst of n successful requests at the same instant.
+        
+        Timestamps are added with one C-level extend and metrics are updated
+        once, rather than once per request.
+        
+        Args:
+            n: Number of requests
+            unit_cost_usd: Actual cost of each request
+        """
+        if n <= 0:
+            return
+        now = self._time_fn()
+        self.minute_requests.extend(repeat(now, n))
+        self.daily_requests.extend(repeat(now, n))
+        self.daily_cost += n * unit_cost_usd
         
         # Update metrics
         if self.metrics:
@@ -118,11 +144,11 @@ class RateLimiter:
         Returns:
             Dictionary with current usage stats
         """
-        now = time.time()
+        now = self._time_fn()
         self._reset_daily_if_needed()
         
         # Clean up minute requests
-        self.minute_requests = deque([t for t in self.minute_requests if now - t < 60])
+        self._prune_minute_window(now)
         
         return {
             "requests_last_minute": len(self.minute_requests),
@@ -145,8 +171,8 @@ class RateLimiter:
             return
         
         # Clean up minute requests
-        now = time.time()
-        self.minute_requests = deque([t for t in self.minute_requests if now - t < 60])
+        now = self._time_fn()
+        self._prune_minute_window(now)
         
         # Update gauges
         self.metrics.update_rate_limiter_stats(
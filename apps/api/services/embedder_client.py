@@ -1,8 +1,11 @@
+import asyncio
 import numpy as np
 from PIL import Image
 import io
 import os
+from typing import Optional
 import sys
+import threading
 
 # Monkeypatch lzma if missing or broken (common on some python builds)
 try:
@@ -32,17 +35,23 @@ except Exception as e:
 _model = None
 _preprocess = None
 _tokenizer = None
+# embeds run in worker threads, so two first calls can race to load the model
+_load_lock = threading.Lock()
 
 
 def _load_openclip():
     global _model, _preprocess, _tokenizer
-    if _model is None:
+    if _model is not None:
+        return
+    with _load_lock:
+        if _model is not None:
+            return
         if not _OK:
             raise RuntimeError("open_clip/torch not available")
         # Choose model from env (defaults to small CPU-friendly ViT-B-32)
         model_name = os.getenv("OPENCLIP_MODEL", "ViT-B-32")
         pretrained = os.getenv("OPENCLIP_PRETRAINED", "laion2b_s34b_b79k")
-        _model, _, _preprocess = open_clip.create_model_and_transforms(
+        model, _, _preprocess = open_clip.create_model_and_transforms(
             model_name, pretrained=pretrained
         )
         _tokenizer = open_clip.get_tokenizer("ViT-B-32")
@@ -53,31 +62,68 @@ def _load_openclip():
             torch.set_num_interop_threads(int(os.getenv("TORCH_NUM_INTEROP_THREADS", "1")))
         except Exception:
             pass
-        _model.eval()
+        model.eval()
+        # published last: the unlocked check above treats _model as "fully loaded"
+        _model = model
+
+def _load_image(img_bytes: bytes, image: Optional[Image.Image] = None) -> Image.Image:
+    # convert() returns a copy, so a caller's decoded image is never resized
+    if image is None:
+        image = Image.open(io.BytesIO(img_bytes))
+    image = image.convert("RGB")
+    # Pre-resize to cap memory before preprocess (configurable)
+    try:
+        max_side = int(os.getenv("EMBED_MAX_SIDE", "768"))
+    except Exception:
+        max_side = 768
+    if max_side and max_side > 0:
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return image
+
+def _embed_image(img_bytes: bytes, image: Optional[Image.Image] = None) -> np.ndarray:
+    # Blocking; callers run it in a thread so the forward pass doesn't stall the loop
+    _load_openclip()
+    im = _preprocess(_load_image(img_bytes, image)).unsqueeze(0)
+    import torch
+    with torch.inference_mode():
+        vec = _model.encode_image(im)
+        vec = vec / vec.norm(dim=-1, keepdim=True)
+    return vec.squeeze(0).cpu().numpy().astype(np.float32)
+
+def _embed_batch(images: list) -> np.ndarray:
+    _load_openclip()
+    import torch
+    batch = torch.stack([_preprocess(_load_image(b)) for b in images])
+    with torch.inference_mode():
+        vecs = _model.encode_image(batch)
+        vecs = vecs / vecs.norm(dim=-1, keepdim=True)
+    return vecs.cpu().numpy().astype(np.float32)
 
 class EmbedderClient:
-    async def embed_image(self, img_bytes: bytes):
+    async def warmup(self):
+        """Load the model now so the first embed doesn't pay for it"""
         try:
-            _load_openclip()
-            image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-            # Pre-resize to cap memory before preprocess (configurable)
-            try:
-                max_side = int(os.getenv("EMBED_MAX_SIDE", "768"))
-            except Exception:
-                max_side = 768
-            if max_side and max_side > 0:
-                image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
-            im = _preprocess(image).unsqueeze(0)
-            import torch
-            with torch.inference_mode():
-                vec = _model.encode_image(im)
-                vec = vec / vec.norm(dim=-1, keepdim=True)
-            return vec.squeeze(0).cpu().numpy().astype(np.float32)
+            await asyncio.to_thread(_load_openclip)
+        except Exception as e:
+            print(f"[WARN] Embedder warmup failed (will fall back to mock): {e}")
+
+    async def embed_image(self, img_bytes: bytes, image: Optional[Image.Image] = None):
+        """Embed an image; pass `image` if it is already decoded to skip re-decoding"""
+        try:
+            return await asyncio.to_thread(_embed_image, img_bytes, image)
         except Exception as e:
             print(f"[WARN] Embedder failed (fallback to mock): {e}")
             # Return random vector of size 512 (default for ViT-B-32)
             return np.random.rand(512).astype(np.float32)
 
+    async def embed_batch(self, images: list) -> np.ndarray:
+        """Embed several images in one forward pass; returns an (n, dim) array"""
+        try:
+            return await asyncio.to_thread(_embed_batch, images)
+        except Exception as e:
+            print(f"[WARN] Batch embedder failed (fallback to mock): {e}")
+            return np.random.rand(len(images), 512).astype(np.float32)
+
     async def embed_text(self, text: str):
         try:
             _load_openclip()
@@ -19,10 +19,17 @@ class EmbedderClient:
         
         return vec
     
-    async def embed_image(self, img_bytes: bytes) -> np.ndarray:
+    async def warmup(self):
+        """Nothing to load"""
+    
+    async def embed_image(self, img_bytes: bytes, image=None) -> np.ndarray:
         """Generate mock image embedding"""
         return self._hash_to_vector(img_bytes, 512)
     
+    async def embed_batch(self, images: list) -> np.ndarray:
+        """Generate mock image embeddings, one row per image"""
+        return np.stack([self._hash_to_vector(b, 512) for b in images])
+    
     async def embed_text(self, text: str) -> np.ndarray:
         """Generate mock text embedding"""
         # Add prefix to differentiate text from images
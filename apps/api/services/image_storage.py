@@ -5,6 +5,7 @@ Supports local filesystem, S3, or other storage providers.
 from abc import ABC, abstractmethod
 from typing import Tuple, Optional
 from dataclasses import dataclass
+from PIL import Image
 
 
 @dataclass
@@ -27,7 +28,8 @@ class ImageStorage(ABC):
         self, 
         image_id: str, 
         image_bytes: bytes,
-        generate_thumbnail: bool = True
+        generate_thumbnail: bool = True,
+        image: Optional[Image.Image] = None
     ) -> ImageMetadata:
         """
         Save image and optionally generate thumbnail.
@@ -36,6 +38,8 @@ class ImageStorage(ABC):
             image_id: Unique identifier for the image
             image_bytes: Raw image bytes
             generate_thumbnail: Whether to generate thumbnail
+            image: `image_bytes` already decoded (and loaded), to skip
+                re-decoding; never modified
             
         Returns:
             ImageMetadata with file paths and dimensions
@@ -0,0 +1,165 @@
+"""
+Image ingestion service: caption routing, embedding, storage and indexing
+for a single image. Used by the /images routes.
+"""
+import hashlib
+import logging
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+from prometheus_client import Counter
+
+from apps.api.deps import get_embedder, get_vector_store
+from apps.api.services.captioner_client import CaptionerClient
+from apps.api.services.image_storage import ImageStorage
+from apps.api.auth.models import CurrentUser
+from apps.api.services.routing.router import AIFeatureRouter, RoutingContext, RoutingTier
+
+logger = logging.getLogger("imagesearch")
+
+ROUTED_LOCAL = Counter("router_local_total", "Local caption route count")
+ROUTED_CLOUD = Counter("router_cloud_total", "Cloud caption route count")
+
+
+async def ingest_image_bytes(
+    img_bytes: bytes,
+    src: dict,
+    visibility: str,
+    current_user: CurrentUser,
+    captioner: CaptionerClient,
+    storage: ImageStorage,
+    client_caption: Optional[str] = None,
+    client_confidence: Optional[float] = None,
+    metadata: Optional[dict] = None
+) -> dict:
+    """Caption, embed, store and index a single image.
+    
+    Shared by the single-upload and batch ingestion routes; callable directly
+    when the HTTP layer is not under test. Caller-supplied `metadata` (e.g.
+    dataset/license info from the seeders) is stored in the vector payload
+    and echoed back, so clients don't have to merge it themselves.
+    """
+    image_id = hashlib.sha256(img_bytes).hexdigest()[:16]
+
+    # 1. Local Caption (always run for fallback/metrics)
+    local_caption, local_conf, local_ms = await captioner.caption(img_bytes)
+
+    # 2. Route Request (Tier 1/2/3/4)
+    # We pass the client caption as a hint to the router
+    ai_router = AIFeatureRouter()
+    try:
+        budget_ms = int(os.getenv("CAPTION_LATENCY_BUDGET_MS", 600))
+    except Exception:
+        budget_ms = 600
+        
+    routing_decision = await ai_router.route_caption_request(
+        image_bytes=img_bytes,
+        context=RoutingContext(latency_budget_ms=budget_ms),
+        text_hint=client_caption,
+        client_confidence=client_confidence
+    )
+    
+    tier = routing_decision.tier
+    caption = local_caption # Default to local caption
+    origin = "local"
+    conf = local_conf
+    
+    use_cloud = routing_decision.tier == RoutingTier.CLOUD
+    use_cache = routing_decision.tier == RoutingTier.CACHE
+    use_edge = routing_decision.tier == RoutingTier.EDGE
+    
+    logger.info(
+        f"routing_decision: tier={routing_decision.tier} reason={routing_decision.reason}",
+        extra={"tier": routing_decision.tier, "reason": routing_decision.reason}
+    )
+    
+    if use_cache:
+        # Cache hit!
+        logger.info("routing: cache hit", extra={"tier": "cache"})
+        cached = routing_decision.metadata.get("cached_result", {})
+        caption = cached.get("caption", local_caption)
+        origin = cached.get("origin", "cache")
+        conf = cached.get("confidence", 1.0)
+        
+    elif use_edge:
+        # Edge accepted!
+        logger.info("routing: edge accepted", extra={"tier": "edge"})
+        caption = client_caption
+        origin = "edge"
+        conf = client_confidence or 1.0
+        
+    elif use_cloud:
+        logger.info("routing: attempting cloud caption", extra={"use_cloud": True})
+        cloud_caption, cloud_ms, cost_usd = await captioner.caption_cloud(img_bytes)
+        if cloud_caption:
+            caption = cloud_caption
+            origin = "cloud"
+            ROUTED_CLOUD.inc()
+            logger.info(
+                f"routing: cloud_success latency_ms={cloud_ms} cost_usd={cost_usd}",
+                extra={"cloud_latency_ms": cloud_ms, "cost_usd": cost_usd}
+            )
+            # Store in cache
+            await ai_router.cache.store(img_bytes, {
+                "caption": caption,
+                "confidence": 1.0, # Cloud is high conf
+                "origin": "cloud"
+            })
+        else:
+            ROUTED_LOCAL.inc()  # fallback failed → keep local
+            logger.warning("routing: cloud_fallback_failed; using local caption", extra={"use_cloud": True})
+    else:
+        ROUTED_LOCAL.inc()
+
+    # Embeddings (image + caption text)
+    embedder = get_embedder()
+    img_vec = await embedder.embed_image(img_bytes)
+
+    # Persist image and thumbnail to configured storage
+    img_metadata = await storage.save_image(image_id=image_id, image_bytes=img_bytes, generate_thumbnail=True)
+
+    # Validate visibility
+    if visibility not in ("private", "public", "public_admin"):
+        raise HTTPException(400, "visibility must be 'private', 'public', or 'public_admin'")
+    
+    # Only admins can create public_admin images
+    if visibility == "public_admin" and not current_user.is_admin():
+        raise HTTPException(403, "Only admins can create public_admin images")
+    
+    payload = {"src": src}
+    if metadata:
+        payload["metadata"] = metadata
+    
+    store = get_vector_store()
+    await store.upsert_image(
+        image_id=image_id,
+        caption=caption,
+        caption_confidence=conf,
+        caption_origin=origin,
+        img_vec=img_vec,
+        payload=payload,
+        file_path=img_metadata.file_path,
+        format=img_metadata.format,
+        size_bytes=img_metadata.size_bytes,
+        width=img_metadata.width,
+        height=img_metadata.height,
+        thumbnail_path=img_metadata.thumbnail_path,
+        owner_user_id=current_user.id,
+        visibility=visibility
+    )
+
+    base_url = os.getenv("BASE_URL", "http://localhost:8000").rstrip("/")
+    return {
+        "id": image_id, 
+        "caption": caption, 
+        "origin": origin, 
+        "confidence": conf,
+        "download_url": f"{base_url}/images/{image_id}/download",
+        "thumbnail_url": f"{base_url}/images/{image_id}/thumbnail",
+        "width": img_metadata.width,
+        "height": img_metadata.height,
+        "size_bytes": img_metadata.size_bytes,
+        "format": img_metadata.format,
+        "metadata": metadata or {}
+    }
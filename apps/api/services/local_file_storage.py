@@ -42,11 +42,12 @@ class LocalFileStorage(ImageStorage):
         self, 
         image_id: str, 
         image_bytes: bytes,
-        generate_thumbnail: bool = True
+        generate_thumbnail: bool = True,
+        image: Optional[Image.Image] = None
     ) -> ImageMetadata:
         """Save image and generate thumbnail"""
         # Detect format and dimensions
-        img = Image.open(io.BytesIO(image_bytes))
+        img = image if image is not None else Image.open(io.BytesIO(image_bytes))
         format_str = img.format.lower() if img.format else 'jpeg'
         width, height = img.size
         size_bytes = len(image_bytes)
@@ -82,10 +83,6 @@ class LocalFileStorage(ImageStorage):
         format_str: str
     ) -> str:
         """Generate and save thumbnail"""
-        # Create thumbnail
-        thumb = img.copy()
-        thumb.thumbnail((self.thumbnail_size, self.thumbnail_size), Image.Resampling.LANCZOS)
-        
         # Save thumbnail
         thumb_shard_dir = self._get_shard_path(image_id, is_thumbnail=True)
         thumb_name = f"{image_id}.{format_str}"
@@ -95,6 +92,9 @@ class LocalFileStorage(ImageStorage):
         loop = asyncio.get_event_loop()
         
         def save_thumbnail():
+            # Decode + LANCZOS resize is the CPU-heavy part; keep it off the loop too
+            thumb = img.copy()
+            thumb.thumbnail((self.thumbnail_size, self.thumbnail_size), Image.Resampling.LANCZOS)
             thumb_buffer = io.BytesIO()
             thumb.save(thumb_buffer, format=format_str.upper())
             thumb_path.write_bytes(thumb_buffer.getvalue())
@@ -1,7 +1,8 @@
 from dataclasses import dataclass
-from typing import List, Set
+from functools import lru_cache
+from typing import FrozenSet, List
 
-@dataclass
+@dataclass(frozen=True)
 class ComplexityScore:
     level: str  # "simple", "moderate", "complex"
     score: float  # 0.0 to 1.0 (1.0 = most complex)
@@ -14,24 +15,30 @@ class ComplexityClassifier:
     """
     
     # Indicators of complex queries
-    ABSTRACT_INDICATORS: Set[str] = {
+    ABSTRACT_INDICATORS: FrozenSet[str] = frozenset({
         "atmosphere", "mood", "feeling", "reminiscent", 
         "style", "aesthetic", "vibe", "essence", "context",
         "emotional", "abstract", "surreal"
-    }
+    })
     
     def classify(self, text: str) -> ComplexityScore:
         if not text:
             return ComplexityScore(level="simple", score=0.0)
-            
+        return self._classify_text(text)
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _classify_text(text: str) -> ComplexityScore:
+        """Score non-empty text; results are frozen, so repeats share one"""
         tokens = text.lower().split()
         
-        # Count abstract vs concrete terms
-        abstract_count = sum(1 for t in tokens if t in self.ABSTRACT_INDICATORS)
+        # Only presence matters; isdisjoint is one C-level pass that stops
+        # at the first abstract term
+        has_abstract = not ComplexityClassifier.ABSTRACT_INDICATORS.isdisjoint(tokens)
         
         # Heuristic for CAPTIONS (not just keywords)
         # 1. Very short captions are likely "Simple" (e.g. "a dog")
-        if len(tokens) <= 5 and abstract_count == 0:
+        if len(tokens) <= 5 and not has_abstract:
             return ComplexityScore(level="simple", score=0.2)
             
         # 2. Long, detailed captions OR abstract terms -> Complex
@@ -40,7 +47,7 @@ class ComplexityClassifier:
         # But usually Edge models are simple.
         # Let's stick to: Abstract terms = Complex.
         
-        if abstract_count > 0:
+        if has_abstract:
             return ComplexityScore(level="complex", score=0.8)
             
         # 3. Moderate length without abstract terms -> Moderate
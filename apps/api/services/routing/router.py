@@ -47,11 +47,13 @@ class AIFeatureRouter:
         image_bytes: bytes,
         context: RoutingContext,
         text_hint: Optional[str] = None,
-        client_confidence: Optional[float] = None
+        client_confidence: Optional[float] = None,
+        phash: Optional[int] = None
     ) -> RoutingDecision:
         """
         Decide which tier should handle the caption request.
         text_hint: Now represents the Client/Edge caption if available.
+        phash: The image's perceptual hash, if the caller already has it.
         """
         from apps.api.services.routing.metrics.routing_metrics import ROUTING_DECISIONS, ROUTING_LATENCY
         
@@ -59,7 +61,7 @@ class AIFeatureRouter:
         
         try:
             # 0. Check Cache (Tier 2)
-            cached_result = await self.cache.lookup(image_bytes)
+            cached_result = await self.cache.lookup(image_bytes, phash=phash)
             if cached_result:
                 ROUTING_DECISIONS.labels(tier="cache", reason="hit").inc()
                 return RoutingDecision(
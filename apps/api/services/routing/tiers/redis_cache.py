@@ -1,4 +1,7 @@
+import asyncio
+import base64
 import json
+import os
 import time
 import hashlib
 import logging
@@ -14,6 +17,7 @@ except ImportError:
 
 from apps.api.services.embedder_client import EmbedderClient
 from apps.api.services.routing.metrics.routing_metrics import CACHE_HITS, CACHE_MISSES
+from apps.api.services.utils.image_utils import perceptual_hash, hamming_distance
 
 logger = logging.getLogger("imagesearch.cache")
 
@@ -25,11 +29,20 @@ class SemanticCache:
     
     SIMILARITY_THRESHOLD = 0.95
     CACHE_TTL = 3600  # 1 hour
+    # Near-duplicate index: pHash -> cached result, plus one sorted set per
+    # pHash band (scored by insert time) so candidates are found without
+    # scanning every hash
+    PHASH_PREFIX = "caption:phash:"
+    PHASH_TTL = 7 * 24 * 3600
+    # Newest members kept per band; expired members are also dropped on write
+    PHASH_BAND_MAX = 1000
     
     def __init__(self, redis_url: str = "redis://localhost:6379"):
         self.redis_url = redis_url
         self.redis = None
         self.embedder = None
+        # Max pHash Hamming distance treated as the same picture (<0 disables)
+        self.phash_max_distance = int(os.getenv("PHASH_MAX_DISTANCE", "5"))
         if not REDIS_AVAILABLE:
             logger.warning("Redis not available (module missing). Cache disabled.")
         
@@ -50,9 +63,69 @@ class SemanticCache:
             self.embedder = get_embedder()
         return self.embedder
 
-    async def lookup(self, image_bytes: bytes) -> Optional[Dict[str, Any]]:
+    def _phash_bands(self, phash: int) -> List[str]:
+        """Split a 64-bit pHash into max_distance + 1 bands.
+        
+        Two hashes within max_distance bits must agree on at least one whole
+        band (pigeonhole), so exact band matches yield every candidate.
         """
-        Check cache for semantically similar image.
+        n = self.phash_max_distance + 1
+        bounds = [64 * i // n for i in range(n + 1)]
+        return [
+            f"{self.PHASH_PREFIX}zband:{i}:{(phash >> lo) & ((1 << (hi - lo)) - 1):x}"
+            for i, (lo, hi) in enumerate(zip(bounds, bounds[1:]))
+        ]
+
+    @staticmethod
+    def _encode(result: Dict[str, Any]) -> str:
+        """JSON for a cached result; an embedding is packed as raw float32.
+        
+        Not quantized: the ingestion worker writes a cached embedding to
+        pgvector on a hit, so it must keep full precision.
+        """
+        if "embedding" in result:
+            result = dict(result)
+            vec = np.asarray(result.pop("embedding"), dtype="<f4")
+            result["embedding_f32"] = base64.b64encode(vec.tobytes()).decode()
+        return json.dumps(result)
+
+    @staticmethod
+    def _decode(data) -> Dict[str, Any]:
+        result = json.loads(data)
+        if "embedding_f32" in result:
+            result["embedding"] = np.frombuffer(base64.b64decode(result.pop("embedding_f32")), dtype="<f4").tolist()
+        # Entries from before this were int8-quantized; drop the lossy vector
+        # so callers embed again rather than persist it
+        result.pop("embedding_i8", None)
+        return result
+
+    async def _phash(self, image_bytes: bytes, phash: Optional[int]) -> Optional[int]:
+        """The caller's pHash, else one computed off the event loop (None if undecodable)"""
+        if phash is not None or self.phash_max_distance < 0:
+            return phash
+        try:
+            return await asyncio.to_thread(perceptual_hash, image_bytes)
+        except Exception:
+            return None
+
+    async def _find_near_duplicate(self, phash: int) -> Optional[Dict[str, Any]]:
+        """Cached result of the closest indexed image, if near enough"""
+        pipe = self.redis.pipeline(transaction=False)
+        # Members older than PHASH_TTL point at expired results; skip them
+        oldest = time.time() - self.PHASH_TTL
+        for band_key in self._phash_bands(phash):
+            pipe.zrangebyscore(band_key, oldest, "+inf")
+        candidates = {int(m, 16) for members in await pipe.execute() for m in members}
+        best = min(candidates, key=lambda c: hamming_distance(phash, c), default=None)
+        if best is None or hamming_distance(phash, best) > self.phash_max_distance:
+            return None
+        cached = await self.redis.get(f"{self.PHASH_PREFIX}{best:016x}")
+        return self._decode(cached) if cached else None
+
+    async def lookup(self, image_bytes: bytes, phash: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Check cache for the same image, then for a near-duplicate (pHash).
+        Pass `phash` if already computed.
         """
         if not REDIS_AVAILABLE:
             return None
@@ -69,15 +142,26 @@ class SemanticCache:
             cached_data = await self.redis.get(cache_key)
             if cached_data:
                 CACHE_HITS.labels(tier="exact").inc()
-                return json.loads(cached_data)
+                return self._decode(cached_data)
                 
             CACHE_MISSES.labels(tier="exact").inc()
+            
+            # 2. Near-duplicate (re-encoded, resized, ...) by pHash distance
+            phash = await self._phash(image_bytes, phash)
+            if phash is None:
+                return None
+            near = await self._find_near_duplicate(phash)
+            if near:
+                CACHE_HITS.labels(tier="near_duplicate").inc()
+                return near
+            CACHE_MISSES.labels(tier="near_duplicate").inc()
             return None
         except Exception as e:
             logger.warning(f"Redis lookup failed: {e}")
             return None
     
-    async def store(self, image_bytes: bytes, result: Dict[str, Any]):
+    async def store(self, image_bytes: bytes, result: Dict[str, Any], phash: Optional[int] = None):
+        """Cache a result for these exact bytes and, by pHash, their near-duplicates"""
         if not REDIS_AVAILABLE:
             return
 
@@ -89,10 +173,26 @@ class SemanticCache:
             img_hash = hashlib.sha256(image_bytes).hexdigest()
             cache_key = f"caption:hash:{img_hash}"
             
+            data = self._encode(result)
             await self.redis.setex(
                 cache_key,
                 self.CACHE_TTL,
-                json.dumps(result)
+                data
             )
+            
+            phash = await self._phash(image_bytes, phash)
+            if phash is not None:
+                member = f"{phash:016x}"
+                now = time.time()
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.setex(f"{self.PHASH_PREFIX}{member}", self.PHASH_TTL, data)
+                for band_key in self._phash_bands(phash):
+                    pipe.zadd(band_key, {member: now})
+                    # A busy band never expires as a whole, so trim it here:
+                    # members whose results have expired, then all but the newest
+                    pipe.zremrangebyscore(band_key, "-inf", now - self.PHASH_TTL)
+                    pipe.zremrangebyrank(band_key, 0, -self.PHASH_BAND_MAX - 1)
+                    pipe.expire(band_key, self.PHASH_TTL)
+                await pipe.execute()
         except Exception as e:
             logger.warning(f"Redis store failed: {e}")
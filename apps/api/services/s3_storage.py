@@ -4,7 +4,7 @@ Works with AWS S3, Cloudflare R2, MinIO, and other S3-compatible services.
 """
 import os
 import io
-from typing import Optional
+from typing import Optional, Tuple
 from PIL import Image, ImageOps
 import asyncio
 import boto3
@@ -106,26 +106,16 @@ class S3Storage(ImageStorage):
         self, 
         image_id: str, 
         image_bytes: bytes,
-        generate_thumbnail: bool = True
+        generate_thumbnail: bool = True,
+        image: Optional[Image.Image] = None
     ) -> ImageMetadata:
         """Save image to S3 and generate thumbnail"""
-        # Detect format and dimensions (EXIF-correct orientation)
-        img = Image.open(io.BytesIO(image_bytes))
-        try:
-            img = ImageOps.exif_transpose(img)
-        except Exception:
-            pass
-        format_str = img.format.lower() if img.format else 'jpeg'
+        # Decode, EXIF-correct and re-encode off the event loop
+        loop = asyncio.get_event_loop()
+        img, format_str, orig_bytes = await loop.run_in_executor(
+            None, self._encode_original, image_bytes, image
+        )
         width, height = img.size
-        # Re-encode EXIF-corrected image for storage
-        orig_buffer = io.BytesIO()
-        save_kwargs = {}
-        if format_str in ('jpeg', 'jpg'):
-            if img.mode == 'RGBA':
-                img = img.convert('RGB')
-            save_kwargs = {"quality": 95, "optimize": True}
-        img.save(orig_buffer, format=format_str.upper(), **save_kwargs)
-        orig_bytes = orig_buffer.getvalue()
         size_bytes = len(orig_bytes)
         
         # Determine content type
@@ -140,7 +130,6 @@ class S3Storage(ImageStorage):
         # Save original (EXIF-corrected) image to S3
         object_key = self._get_object_key(image_id) + f".{format_str}"
         
-        loop = asyncio.get_event_loop()
         await loop.run_in_executor(
             None,
             lambda: self.s3_client.put_object(
@@ -171,6 +160,37 @@ class S3Storage(ImageStorage):
             thumbnail_path=thumbnail_key
         )
     
+    @staticmethod
+    def _encode_original(
+        image_bytes: bytes,
+        image: Optional[Image.Image] = None
+    ) -> Tuple[Image.Image, str, bytes]:
+        """Decode image bytes and re-encode them EXIF-corrected (CPU-bound)"""
+        # Detect format and dimensions (EXIF-correct orientation)
+        img = image if image is not None else Image.open(io.BytesIO(image_bytes))
+        try:
+            img = ImageOps.exif_transpose(img)
+        except Exception:
+            pass
+        format_str = img.format.lower() if img.format else 'jpeg'
+        # Re-encode EXIF-corrected image for storage
+        orig_buffer = io.BytesIO()
+        save_kwargs = {}
+        if format_str in ('jpeg', 'jpg'):
+            if img.mode == 'RGBA':
+                img = img.convert('RGB')
+            save_kwargs = {"quality": 95, "optimize": True}
+        img.save(orig_buffer, format=format_str.upper(), **save_kwargs)
+        return img, format_str, orig_buffer.getvalue()
+
+    def _encode_thumbnail(self, img: Image.Image, format_str: str) -> bytes:
+        """Resize and encode a thumbnail (CPU-bound)"""
+        thumb = img.copy()
+        thumb.thumbnail((self.thumbnail_size, self.thumbnail_size), Image.Resampling.LANCZOS)
+        thumb_buffer = io.BytesIO()
+        thumb.save(thumb_buffer, format=format_str.upper())
+        return thumb_buffer.getvalue()
+
     async def _generate_thumbnail(
         self, 
         image_id: str, 
@@ -179,13 +199,8 @@ class S3Storage(ImageStorage):
     ) -> str:
         """Generate and save thumbnail to S3"""
         # Create thumbnail (use EXIF-corrected image)
-        thumb = img.copy()
-        thumb.thumbnail((self.thumbnail_size, self.thumbnail_size), Image.Resampling.LANCZOS)
-        
-        # Convert to bytes
-        thumb_buffer = io.BytesIO()
-        thumb.save(thumb_buffer, format=format_str.upper())
-        thumb_bytes = thumb_buffer.getvalue()
+        loop = asyncio.get_event_loop()
+        thumb_bytes = await loop.run_in_executor(None, self._encode_thumbnail, img, format_str)
         
         # Determine content type
         content_type_map = {
@@ -199,7 +214,6 @@ class S3Storage(ImageStorage):
         # Save to S3
         thumbnail_key = self._get_object_key(image_id, is_thumbnail=True) + f".{format_str}"
         
-        loop = asyncio.get_event_loop()
         await loop.run_in_executor(
             None,
             lambda: self.s3_client.put_object(
@@ -1,11 +1,38 @@
 """Image utility functions"""
 
 import base64
+import hashlib
 from typing import Optional
+import numpy as np
 from PIL import Image
 import io
 
 
+# Decode results keyed by content digest, so re-sent identical images skip
+# PIL. Keys are 16-byte digests; the image bytes themselves are not retained.
+_DECODE_CACHE_MAX_ENTRIES = 256
+_verify_cache: dict[bytes, Optional[str]] = {}
+_info_cache: dict[bytes, dict] = {}
+
+
+def _content_key(img_bytes: bytes) -> bytes:
+    return hashlib.blake2b(img_bytes, digest_size=16).digest()
+
+
+# Orthonormal DCT-II basis for 32x32 pHash input: dct(x) = _DCT32 @ x @ _DCT32.T
+_PHASH_SIZE = 32
+_k = np.arange(_PHASH_SIZE)
+_DCT32 = np.sqrt(2.0 / _PHASH_SIZE) * np.cos(np.pi * (2 * _k[None, :] + 1) * _k[:, None] / (2 * _PHASH_SIZE))
+_DCT32[0] /= np.sqrt(2.0)
+
+
+def _remember(cache: dict, key: bytes, value) -> None:
+    if len(cache) >= _DECODE_CACHE_MAX_ENTRIES:
+        # dicts keep insertion order, so this evicts the oldest entry
+        del cache[next(iter(cache))]
+    cache[key] = value
+
+
 def encode_image_base64(img_bytes: bytes, format: str = "JPEG") -> str:
     """
     Encode image bytes to base64 string.
@@ -62,13 +89,18 @@ def validate_image_bytes(img_bytes: bytes, max_size_mb: float = 10.0) -> tuple[b
     if size_mb > max_size_mb:
         return False, f"Image size {size_mb:.2f}MB exceeds maximum {max_size_mb}MB"
     
-    # Try to load image
-    try:
-        img = Image.open(io.BytesIO(img_bytes))
-        img.verify()
-        return True, None
-    except Exception as e:
-        return False, f"Invalid image format: {e}"
+    # Try to load image (once per distinct content)
+    key = _content_key(img_bytes)
+    if key not in _verify_cache:
+        try:
+            img = Image.open(io.BytesIO(img_bytes))
+            img.verify()
+            error = None
+        except Exception as e:
+            error = f"Invalid image format: {e}"
+        _remember(_verify_cache, key, error)
+    error = _verify_cache[key]
+    return error is None, error
 
 
 def get_image_info(img_bytes: bytes) -> dict:
@@ -81,15 +113,50 @@ def get_image_info(img_bytes: bytes) -> dict:
     Returns:
         Dictionary with width, height, format, mode
     """
-    try:
-        img = Image.open(io.BytesIO(img_bytes))
-        return {
-            "width": img.width,
-            "height": img.height,
-            "format": img.format,
-            "mode": img.mode,
-            "size_bytes": len(img_bytes),
-            "size_mb": round(len(img_bytes) / (1024 * 1024), 2),
-        }
-    except Exception as e:
-        return {"error": str(e)}
+    key = _content_key(img_bytes)
+    info = _info_cache.get(key)
+    if info is None:
+        try:
+            img = Image.open(io.BytesIO(img_bytes))
+            info = {
+                "width": img.width,
+                "height": img.height,
+                "format": img.format,
+                "mode": img.mode,
+                "size_bytes": len(img_bytes),
+                "size_mb": round(len(img_bytes) / (1024 * 1024), 2),
+            }
+        except Exception as e:
+            info = {"error": str(e)}
+        _remember(_info_cache, key, info)
+    # Callers get their own copy; the cached dict is never handed out
+    return dict(info)
+
+
+def perceptual_hash(img_bytes: bytes) -> int:
+    """
+    64-bit DCT perceptual hash (pHash) of an image.
+    
+    Visually similar images (re-encoded, resized, lightly edited) get hashes
+    a small Hamming distance apart; same algorithm as imagehash.phash.
+    
+    Args:
+        img_bytes: Raw image bytes
+        
+    Returns:
+        The hash as an unsigned 64-bit int
+    """
+    img = Image.open(io.BytesIO(img_bytes))
+    img.draft("L", (_PHASH_SIZE * 2, _PHASH_SIZE * 2))  # JPEG: decode at reduced scale
+    pixels = np.asarray(
+        img.convert("L").resize((_PHASH_SIZE, _PHASH_SIZE), Image.Resampling.LANCZOS),
+        dtype=np.float64,
+    )
+    low = (_DCT32 @ pixels @ _DCT32.T)[:8, :8]
+    bits = (low > np.median(low)).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return (a ^ b).bit_count()
@@ -0,0 +1,32 @@
+"""Compact embedding encodings for Redis values"""
+
+import numpy as np
+
+
+def quantize_i8(vec) -> bytes:
+    """
+    Pack an embedding as int8 with one per-vector scale.
+    
+    Layout: float16 scale, then int8[dim] (little-endian); a quarter of the
+    float32 size. Cosine rankings of CLIP-style vectors are kept to within
+    rounding noise.
+    
+    Args:
+        vec: 1-D float vector
+        
+    Returns:
+        The packed bytes (2 + dim long)
+    """
+    v = np.asarray(vec, dtype=np.float32)
+    scale = np.float16(np.abs(v).max() / 127.0)
+    if not scale:
+        # Zero (or fp16-underflowing) vector: any scale decodes it back to ~0
+        scale = np.float16(1.0)
+    q = np.clip(np.round(v / np.float32(scale)), -127, 127).astype(np.int8)
+    return scale.astype("<f2").tobytes() + q.tobytes()
+
+
+def dequantize_i8(data: bytes) -> np.ndarray:
+    """Unpack quantize_i8 bytes into a float32 vector"""
+    scale = np.frombuffer(data, dtype="<f2", count=1)[0]
+    return np.frombuffer(data, dtype=np.int8, offset=2).astype(np.float32) * np.float32(scale)
@@ -1,5 +1,7 @@
+import asyncio
 import os
-from sqlalchemy import create_engine, text, or_, and_
+from sqlalchemy import create_engine, text, or_, and_, func, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import sessionmaker
 from apps.api.storage.models import Base, ImageDoc
 from datetime import datetime
@@ -109,6 +111,75 @@ class PgVectorStore:
             s.add(doc)
             s.commit()
 
+    async def upsert_images(self, rows: list):
+        """Upsert many images in one INSERT ... ON CONFLICT statement.
+        
+        Each row holds upsert_image's keyword arguments and is written the
+        same way (optional storage/owner/visibility fields keep their stored
+        value when None; a new image without a visibility is private). Runs
+        in a thread; one transaction for the whole batch.
+        """
+        if rows:
+            await asyncio.to_thread(self._upsert_images, rows)
+
+    def _upsert_images(self, rows: list):
+        _init_db()
+        # One statement can't touch a row twice; the latest write wins
+        latest = {row["image_id"]: row for row in rows}
+        now = datetime.utcnow()
+        values = [
+            {
+                "id": row["image_id"],
+                "caption": row["caption"],
+                "caption_confidence": row["caption_confidence"],
+                "caption_origin": row["caption_origin"],
+                "embed_vector": row["img_vec"],
+                "payload": row["payload"],
+                "search_vector": func.to_tsvector('english', row["caption"]),
+                "file_path": row.get("file_path"),
+                "format": row.get("format"),
+                "size_bytes": row.get("size_bytes"),
+                "width": row.get("width"),
+                "height": row.get("height"),
+                "thumbnail_path": row.get("thumbnail_path"),
+                "owner_user_id": row.get("owner_user_id"),
+                "visibility": row.get("visibility") or "private",
+                "deleted_at": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for row in latest.values()
+        ]
+        table = ImageDoc.__table__
+        stmt = pg_insert(table).values(values)
+        new = stmt.excluded
+        keep_if_none = ("file_path", "format", "size_bytes", "width", "height",
+                        "thumbnail_path", "owner_user_id")
+        # visibility is NOT NULL, so rows without one are inserted as private
+        # (Postgres checks that before ON CONFLICT); on conflict they keep it
+        keep_visibility = [row["image_id"] for row in latest.values() if row.get("visibility") is None]
+        visibility = new.visibility
+        if keep_visibility:
+            visibility = case((new.id.in_(keep_visibility), table.c.visibility), else_=new.visibility)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={
+                "caption": new.caption,
+                "caption_confidence": new.caption_confidence,
+                "caption_origin": new.caption_origin,
+                "embed_vector": new.embed_vector,
+                "payload": new.payload,
+                "search_vector": new.search_vector,
+                "visibility": visibility,
+                **{col: func.coalesce(new[col], table.c[col]) for col in keep_if_none},
+                # Revive soft-deleted images if re-uploaded
+                "deleted_at": None,
+                "updated_at": now,
+            },
+        )
+        with _engine.begin() as conn:
+            conn.execute(stmt)
+
     async def fetch_image(self, image_id: str):
         _init_db()
         with Session() as s:
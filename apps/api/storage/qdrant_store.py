@@ -1,15 +1,27 @@
 import os
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qm
 
 COLL = "images"
 
+# Payload fields search results carry (the Go search service returns the same
+# core set); storage paths and ingest metadata stay on the server
+SEARCH_PAYLOAD_FIELDS = [
+    "caption", "confidence", "origin", "owner_user_id", "visibility",
+    "created_at", "updated_at", "width", "height", "format",
+]
+
 class QdrantStore:
-    def __init__(self):
-        url = os.getenv("QDRANT_URL", "http://localhost:6333")
-        self.client = QdrantClient(url=url)
+    def __init__(self, client: Optional[QdrantClient] = None):
+        """Use the given client (e.g. one shared by tests) or build one from env"""
+        if client is None:
+            url = os.getenv("QDRANT_URL", "http://localhost:6333")
+            # gRPC (port 6334) sends vectors as protobuf instead of JSON
+            prefer_grpc = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+            client = QdrantClient(url=url, prefer_grpc=prefer_grpc)
+        self.client = client
         try:
             self.client.get_collection(COLL)
         except Exception:
@@ -76,6 +88,14 @@ class QdrantStore:
         r = self.client.retrieve(COLL, ids=[image_id])
         return None if not r else {"id": image_id, **(r[0].payload or {})}
 
+    async def fetch_images(self, image_ids: List[str]) -> List[Optional[dict]]:
+        """Fetch several images in one retrieve; None where an ID is missing"""
+        found = {str(p.id): p.payload or {} for p in self.client.retrieve(COLL, ids=image_ids)}
+        return [
+            {"id": image_id, **found[image_id]} if image_id in found else None
+            for image_id in image_ids
+        ]
+
     async def search(
         self,
         query_vec,
@@ -93,15 +113,25 @@ class QdrantStore:
             user_id: Current user ID (None for anonymous)
             scope: 'all', 'mine', or 'public'
         """
-        # Build filter for multi-tenant access control
+        res = self.client.search(
+            COLL,
+            query_vector=query_vec,
+            limit=k,
+            query_filter=self._search_filter(user_id, scope),
+            with_payload=SEARCH_PAYLOAD_FIELDS
+        )
+        return [{"id": p.id, "score": float(p.score), **(p.payload or {})} for p in res]
+    
+    def _search_filter(self, user_id: Optional[str], scope: str) -> qm.Filter:
+        """Build the multi-tenant access filter for a search scope"""
         must_conditions = [
             # Exclude deleted images (deleted_at must be null)
             qm.IsNullCondition(is_null=qm.PayloadField(key="deleted_at"))
         ]
         
         # Apply scope-based filtering
-        if user_id is None:
-            # Anonymous: only public images
+        if user_id is None or scope == "public":
+            # Anonymous, or public scope: only public images
             must_conditions.append(
                 qm.FieldCondition(
                     key="visibility",
@@ -116,18 +146,10 @@ class QdrantStore:
                     match=qm.MatchValue(value=user_id)
                 )
             )
-        elif scope == "public":
-            # Only public images
-            must_conditions.append(
-                qm.FieldCondition(
-                    key="visibility",
-                    match=qm.MatchAny(any=["public", "public_admin"])
-                )
-            )
         else:  # scope == "all"
             # User's images OR public images
             # Use should clause for OR logic
-            filter_obj = qm.Filter(
+            return qm.Filter(
                 must=must_conditions,
                 should=[
                     qm.FieldCondition(
@@ -140,25 +162,8 @@ class QdrantStore:
                     )
                 ]
             )
-            
-            res = self.client.search(
-                COLL,
-                query_vector=query_vec,
-                limit=k,
-                query_filter=filter_obj
-            )
-            return [{"id": p.id, "score": float(p.score), **(p.payload or {})} for p in res]
-        
-        # For other scopes, use simple must conditions
-        filter_obj = qm.Filter(must=must_conditions)
         
-        res = self.client.search(
-            COLL,
-            query_vector=query_vec,
-            limit=k,
-            query_filter=filter_obj
-        )
-        return [{"id": p.id, "score": float(p.score), **(p.payload or {})} for p in res]
+        return qm.Filter(must=must_conditions)
     
     async def update_visibility(self, image_id: str, visibility: str):
         """Update image visibility"""
@@ -16,186 +16,380 @@ Usage:
 """
 import asyncio
 import argparse
+import hashlib
 import json
+import math
 import os
 import sys
 import time
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import AsyncIterator, BinaryIO, List, Dict, Optional, Tuple
 import httpx
-from tqdm import tqdm
+import ijson
+from tqdm.asyncio import tqdm
+import itertools
+import shutil
+import sqlite3
 import zipfile
-import io
+from collections import deque
+
+
+def _extract_annotations(zip_path: Path, annotations_file: Path) -> None:
+    """Extract instances_val2017.json from the annotations zip to disk (blocking)"""
+    with zipfile.ZipFile(zip_path) as zf:
+        # Find the instances file
+        for name in zf.namelist():
+            if 'instances_val2017.json' in name:
+                # Stream the member straight to the cache file without parsing it;
+                # the rename means a crash never leaves a truncated JSON behind
+                tmp_file = annotations_file.with_suffix(".tmp")
+                with zf.open(name) as f, open(tmp_file, 'wb') as out:
+                    shutil.copyfileobj(f, out)
+                tmp_file.replace(annotations_file)
+                return
+    
+    raise ValueError("Could not find instances_val2017.json in annotations zip")
+
+
+def _sha256_file(path: Path) -> str:
+    """SHA-256 hex digest of a file, read in chunks (blocking)"""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _write_images_sidecar(annotations_file: Path, sidecar_file: Path) -> None:
+    """Stream the `images` array into an NDJSON sidecar (blocking)"""
+    tmp_file = sidecar_file.with_suffix(".tmp")
+    with open(annotations_file, 'rb') as f, open(tmp_file, 'w') as out:
+        for img_info in ijson.items(f, 'images.item', use_float=True):
+            out.write(json.dumps(img_info) + "\n")
+    tmp_file.replace(sidecar_file)
+
+
+def _open_image_file(img_path: Path) -> Tuple[BinaryIO, str]:
+    """Open an image for upload and hash it (blocking).
+    
+    The open file is passed to httpx as-is, so the multipart body is read
+    from disk in chunks while uploading instead of being held in memory.
+    The caller owns the returned file and must close it.
+    """
+    f = open(img_path, 'rb')
+    try:
+        if hasattr(os, "posix_fadvise"):
+            # Read twice front-to-back (hash, then upload); let the kernel read ahead
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+        f.seek(0)
+    except BaseException:
+        f.close()
+        raise
+    return f, digest
+
+
+def _read_images(sidecar_file: Path, limit: int) -> List[Dict]:
+    """Read the first `limit` image records from the NDJSON sidecar (blocking)"""
+    with open(sidecar_file) as f:
+        return [json.loads(line) for line in itertools.islice(f, limit)]
 
 
 class DatasetSeeder:
     """Base class for dataset seeders"""
     
-    def __init__(self, api_url: str = "http://localhost:8000", auth_token: Optional[str] = None, visibility: str = "public"):
+    def __init__(self, api_url: str = "http://localhost:8000", auth_token: Optional[str] = None, visibility: str = "public",
+                 cache_db: Optional[str] = None):
         self.api_url = api_url.rstrip('/')
         self.auth_token = auth_token
         self.visibility = visibility
+        self.cache_db = cache_db
         self.session = None
+        self._cache = None
+        # Precomputed once; these are identical for every POST /images
+        self._images_url = f"{self.api_url}/images"
+        self._batch_url = f"{self.api_url}/images/batch"
+        self._auth_headers = {"Authorization": f"Bearer {auth_token}"} if auth_token else {}
+        # Set on the first 401 so in-flight requests stop instead of each reporting it
+        self._aborted = asyncio.Event()
     
     async def __aenter__(self):
-        self.session = httpx.AsyncClient(timeout=60.0)
+        self.session = httpx.AsyncClient(timeout=60.0, limits=httpx.Limits(max_connections=20))
+        if self.cache_db:
+            # Local record of already-seeded images so reruns skip them
+            Path(self.cache_db).parent.mkdir(parents=True, exist_ok=True)
+            self._cache = sqlite3.connect(self.cache_db)
+            self._cache.execute(
+                "CREATE TABLE IF NOT EXISTS seeded ("
+                "api_url TEXT NOT NULL, key TEXT NOT NULL, result TEXT NOT NULL, ts REAL NOT NULL, "
+                "PRIMARY KEY (api_url, key))"
+            )
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.aclose()
+        if self._cache:
+            self._cache.commit()
+            self._cache.close()
     
-    async def ingest_image(self, image_url: str, metadata: Dict, retry_count: int = 3) -> Optional[Dict]:
-        """Ingest a single image from URL with authentication and retry logic"""
+    def cache_get(self, key: str) -> Optional[Dict]:
+        """Return the stored ingest result for a URL or file hash, if already seeded"""
+        if self._cache is None:
+            return None
+        row = self._cache.execute(
+            "SELECT result FROM seeded WHERE api_url = ? AND key = ?", (self.api_url, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def cache_put(self, key: str, result: Dict):
+        """Record a successful ingest"""
+        if self._cache is None:
+            return
+        self._cache.execute(
+            "INSERT OR REPLACE INTO seeded (api_url, key, result, ts) VALUES (?, ?, ?, ?)",
+            (self.api_url, key, json.dumps(result), time.time())
+        )
+    
+    def _report_auth_failure(self):
+        """Flag the run as aborted and print the 401 explanation once"""
+        if self._aborted.is_set():
+            return
+        self._aborted.set()
+        print(f"\n❌ Authentication failed (401 Unauthorized)")
+        print(f"   Your JWT token has likely expired.")
+        print(f"   Please get a new token and restart the seeding.")
+        print(f"   Images successfully seeded so far will be preserved.")
+    
+    async def _with_retry(self, fn, *args, retry_count: int = 3, **kwargs) -> httpx.Response:
+        """Run an httpx request, retrying transient failures with exponential backoff.
+        
+        Network errors, 429 and 5xx responses are retried; any other HTTP error
+        (including 401) is raised immediately. Retry-After is honoured on 429/503.
+        """
         for attempt in range(retry_count):
             try:
-                # Prepare headers with auth token if provided
-                headers = {}
-                if self.auth_token:
-                    headers["Authorization"] = f"Bearer {self.auth_token}"
-                
-                # Send as form data with url field and visibility
-                form_data = {
-                    "url": image_url,
-                    "visibility": self.visibility
-                }
-                
-                response = await self.session.post(
-                    f"{self.api_url}/images",
-                    data=form_data,
-                    headers=headers
-                )
+                response = await fn(*args, **kwargs)
                 response.raise_for_status()
-                result = response.json()
-                result["metadata"] = metadata
-                return result
+                return response
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+                retryable = status is None or status == 429 or status >= 500
+                if not retryable or attempt == retry_count - 1:
+                    raise
                 
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 401:
-                    print(f"\n❌ Authentication failed (401 Unauthorized)")
-                    print(f"   Your JWT token has likely expired.")
-                    print(f"   Please get a new token and restart the seeding.")
-                    print(f"   Images successfully seeded so far will be preserved.")
-                    raise  # Don't retry on auth errors
-                elif e.response.status_code >= 500 and attempt < retry_count - 1:
-                    # Retry on server errors
-                    wait_time = 2 ** attempt  # Exponential backoff
-                    print(f"\n⚠️  Server error {e.response.status_code}, retrying in {wait_time}s... (attempt {attempt + 1}/{retry_count})")
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    print(f"\n❌ Error ingesting {image_url}: HTTP {e.response.status_code}")
-                    return None
-                    
-            except httpx.RequestError as e:
-                if attempt < retry_count - 1:
-                    wait_time = 2 ** attempt
-                    print(f"\n⚠️  Network error, retrying in {wait_time}s... (attempt {attempt + 1}/{retry_count})")
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    print(f"\n❌ Network error ingesting {image_url}: {e}")
-                    return None
-                    
-            except Exception as e:
-                print(f"\n❌ Unexpected error ingesting {image_url}: {e}")
-                return None
+                wait_time = 2 ** attempt  # Exponential backoff
+                if status in (429, 503):
+                    try:
+                        wait_time = float(e.response.headers.get("Retry-After", wait_time))
+                    except ValueError:
+                        pass  # HTTP-date form; keep the backoff
+                reason = f"HTTP {status}" if status else "Network error"
+                print(f"\n⚠️  {reason}, retrying in {wait_time:.0f}s... (attempt {attempt + 1}/{retry_count})")
+                await asyncio.sleep(wait_time)
+    
+    async def ingest_batch(self, items: List[Dict]) -> List[Dict]:
+        """Ingest a batch of {"url", "metadata"} items with a single POST /images/batch"""
+        if self._aborted.is_set() or not items:
+            return []
         
-        return None
+        try:
+            response = await self._with_retry(
+                self.session.post,
+                self._batch_url,
+                json={"items": items, "visibility": self.visibility},
+                headers=self._auth_headers
+            )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 401:
+                self._report_auth_failure()
+                return []
+            print(f"\n❌ Error ingesting batch of {len(items)}: HTTP {e.response.status_code}")
+            return []
+        except httpx.TransportError as e:
+            print(f"\n❌ Network error ingesting batch of {len(items)}: {e}")
+            return []
+        
+        body = response.json()
+        for error in body.get("errors", []):
+            print(f"\n❌ Error ingesting {error.get('url')}: {error.get('error')}")
+        results = body.get("results", [])
+        for result in results:
+            self.cache_put(result["url"], result)
+        return results
+    
+    def progress_bar(self, total: int) -> tqdm:
+        """Single progress bar per run, advanced by whichever stage completes items"""
+        dataset = self.__class__.__name__.removesuffix("Seeder")
+        return tqdm(total=total, desc=f"Ingesting {dataset}")
     
     async def seed(self, count: int, **kwargs) -> List[Dict]:
         """Seed images from dataset"""
         raise NotImplementedError
 
 
+class BufferedIngester:
+    """Buffers ingest items and flushes them to POST /images/batch.
+    
+    Full batches are sent as tasks in a TaskGroup (up to `max_in_flight` at
+    once); leaving the context flushes the remainder and waits for all batches.
+    """
+    
+    def __init__(self, seeder: DatasetSeeder, max_batch: int = 64, max_in_flight: int = 4, progress=None):
+        self.seeder = seeder
+        self.max_batch = max_batch
+        self.progress = progress
+        self.results: List[Dict] = []
+        self._buffer = deque()
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._task_group = asyncio.TaskGroup()
+    
+    async def __aenter__(self):
+        await self._task_group.__aenter__()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            await self.flush()
+        # Waits for in-flight batches, or cancels them if the producer failed
+        return await self._task_group.__aexit__(exc_type, exc_val, exc_tb)
+    
+    def __len__(self):
+        return len(self._buffer)
+    
+    async def add(self, image_url: str, metadata: Dict):
+        cached = self.seeder.cache_get(image_url)
+        if cached is not None:
+            self.results.append(cached)
+            if self.progress is not None:
+                self.progress.update(1)
+            return
+        self._buffer.append({"url": image_url, "metadata": metadata})
+        if len(self._buffer) >= self.max_batch:
+            await self.flush()
+    
+    async def flush(self):
+        if not self._buffer:
+            return
+        items = list(self._buffer)
+        self._buffer.clear()
+        # Bound the number of concurrent batch requests
+        await self._in_flight.acquire()
+        self._task_group.create_task(self._send(items))
+    
+    async def _send(self, items: List[Dict]):
+        try:
+            self.results.extend(await self.seeder.ingest_batch(items))
+        finally:
+            self._in_flight.release()
+            if self.progress is not None:
+                self.progress.update(len(items))
+
+
 class COCOSeeder(DatasetSeeder):
     """Seeds images from COCO 2017 validation dataset"""
     
     ANNOTATIONS_URL = "http://images.cocodataset.org/annotations/annotations_trainval2017.zip"
     IMAGES_BASE_URL = "http://images.cocodataset.org/val2017"
+    # Optional integrity check for the cached zip; skipped when unset
+    ANNOTATIONS_SHA256 = os.getenv("COCO_ANNOTATIONS_SHA256")
+    DOWNLOAD_CHUNK_BYTES = 1 << 20
+    BATCH_SIZE = 64
+    
+    async def _download_zip(self, zip_path: Path):
+        """Stream the annotations zip to disk, resuming a partial download.
+        
+        Bytes land in `<zip>.part`; an interrupted run continues from its
+        current size with a Range request. The finished file is checked
+        against ANNOTATIONS_SHA256 (if set) and renamed into place.
+        """
+        part_path = zip_path.with_suffix(".zip.part")
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        
+        async with self.session.stream("GET", self.ANNOTATIONS_URL, headers=headers) as response:
+            if response.status_code == 416:
+                pass  # Range starts at EOF: the part file is already complete
+            else:
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    # Server ignored the Range header; start over
+                    offset = 0
+                if offset:
+                    print(f"Resuming download at {offset / 1e6:.0f} MB")
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    async for chunk in response.aiter_bytes(self.DOWNLOAD_CHUNK_BYTES):
+                        f.write(chunk)
+        
+        if self.ANNOTATIONS_SHA256:
+            digest = await asyncio.to_thread(_sha256_file, part_path)
+            if digest != self.ANNOTATIONS_SHA256:
+                part_path.unlink()
+                raise ValueError(f"Checksum mismatch for {self.ANNOTATIONS_URL} (got {digest})")
+        
+        os.replace(part_path, zip_path)
     
-    async def download_annotations(self, cache_dir: Path) -> Dict:
-        """Download and cache COCO annotations"""
+    async def download_annotations(self, cache_dir: Path) -> Path:
+        """Download and cache COCO annotations, returning the path of the images sidecar"""
         cache_dir.mkdir(parents=True, exist_ok=True)
         annotations_file = cache_dir / "instances_val2017.json"
+        sidecar_file = cache_dir / "instances_val2017.images.ndjson"
         
-        if annotations_file.exists():
-            print(f"Loading cached annotations from {annotations_file}")
-            with open(annotations_file) as f:
-                return json.load(f)
-        
-        print("Downloading COCO annotations...")
-        response = await self.session.get(self.ANNOTATIONS_URL)
-        response.raise_for_status()
+        if sidecar_file.exists():
+            print(f"Loading cached image list from {sidecar_file}")
+            return sidecar_file
         
-        # Extract annotations from zip
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
-            # Find the instances file
-            for name in zf.namelist():
-                if 'instances_val2017.json' in name:
-                    with zf.open(name) as f:
-                        annotations = json.load(f)
-                        # Cache for future use
-                        with open(annotations_file, 'w') as out:
-                            json.dump(annotations, out)
-                        return annotations
+        if not annotations_file.exists():
+            # The zip stays cached so a crash mid-extract doesn't mean re-downloading it
+            zip_path = cache_dir / "annotations_trainval2017.zip"
+            if not zip_path.exists():
+                print("Downloading COCO annotations...")
+                await self._download_zip(zip_path)
+            
+            # Decompress in a worker thread so the event loop is not blocked
+            await asyncio.to_thread(_extract_annotations, zip_path, annotations_file)
         
-        raise ValueError("Could not find instances_val2017.json in annotations zip")
+        # Only the `images` array is needed; cache it as NDJSON so reruns skip JSON parsing
+        print(f"Indexing images from {annotations_file}")
+        await asyncio.to_thread(_write_images_sidecar, annotations_file, sidecar_file)
+        return sidecar_file
+    
+    async def iter_images(self, cache_dir: Path, limit: int) -> AsyncIterator[Dict]:
+        """Yield up to `limit` COCO image records without loading the full annotations"""
+        sidecar_file = await self.download_annotations(cache_dir)
+        for img_info in await asyncio.to_thread(_read_images, sidecar_file, limit):
+            yield img_info
     
     async def seed(self, count: int, cache_dir: str = "./data/coco", **kwargs) -> List[Dict]:
         """Seed COCO images"""
         cache_path = Path(cache_dir)
         
-        # Download annotations
-        annotations = await self.download_annotations(cache_path)
-        
-        # Get image list
-        images = annotations['images'][:count]
+        print(f"Seeding up to {count} images from COCO val2017...")
         
-        print(f"Seeding {len(images)} images from COCO val2017...")
+        # Image records stream straight into batches; at most a few batch requests are in flight
+        print(f"\n🚀 Starting batched ingestion...")
+        print(f"   Batch size: {self.BATCH_SIZE} images per request\n")
         
-        results = []
-        # Use semaphore to limit concurrent requests
-        semaphore = asyncio.Semaphore(10)
-        
-        async def ingest_with_limit(img_info):
-            async with semaphore:
-                image_url = f"{self.IMAGES_BASE_URL}/{img_info['file_name']}"
-                metadata = {
-                    "dataset": "coco",
-                    "coco_id": img_info['id'],
-                    "license": img_info.get('license'),
-                    "flickr_url": img_info.get('flickr_url'),
-                    "date_captured": img_info.get('date_captured')
-                }
-                return await self.ingest_image(image_url, metadata)
-        
-        # Process in parallel with concurrency limit
-        print(f"\n🚀 Starting parallel ingestion of {len(images)} images...")
-        print(f"   Concurrency: up to 10 simultaneous requests")
-        print(f"   Estimated time: {len(images) * 3 // 60} minutes (with parallelization)\n")
-        
-        tasks = [ingest_with_limit(img) for img in images]
-        
-        # Use tqdm with as_completed for progress bar
-        for coro in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Ingesting"):
-            try:
-                result = await coro
-                if result:
-                    results.append(result)
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 401:
-                    # Auth error - likely seeding key issue
-                    print(f"\n\n⚠️  Authentication Error!")
-                    print(f"   Check your SEEDING_API_KEY in .env.docker")
-                    break
-            except Exception as e:
-                # Other errors are already logged in ingest_image
-                pass
+        produced = 0
+        with self.progress_bar(count) as progress:
+            async with BufferedIngester(self, max_batch=self.BATCH_SIZE, progress=progress) as buffer:
+                async for img_info in self.iter_images(cache_path, count):
+                    if self._aborted.is_set():
+                        # Auth error - likely seeding key issue
+                        print(f"   Check your SEEDING_API_KEY in .env.docker")
+                        break
+                    image_url = f"{self.IMAGES_BASE_URL}/{img_info['file_name']}"
+                    metadata = {
+                        "dataset": "coco",
+                        "coco_id": img_info['id'],
+                        "license": img_info.get('license'),
+                        "flickr_url": img_info.get('flickr_url'),
+                        "date_captured": img_info.get('date_captured')
+                    }
+                    await buffer.add(image_url, metadata)
+                    produced += 1
+        results = buffer.results
         
-        print(f"\n✅ Successfully ingested {len(results)}/{len(images)} images")
-        if len(results) < len(images):
-            print(f"   ⚠️  {len(images) - len(results)} images failed or were skipped")
+        print(f"\n✅ Successfully ingested {len(results)}/{produced} images")
+        if len(results) < produced:
+            print(f"   ⚠️  {produced - len(results)} images failed or were skipped")
         return results
 
 
@@ -203,10 +397,33 @@ class UnsplashSeeder(DatasetSeeder):
     """Seeds images from Unsplash API"""
     
     RANDOM_URL = "https://api.unsplash.com/photos/random"
+    MAX_BATCH = 30  # Upper bound for the `count` parameter on /photos/random
+    BATCH_SIZE = 30  # Images per POST /images/batch (one Unsplash page)
     
-    def __init__(self, api_url: str, api_key: str, auth_token: Optional[str] = None, visibility: str = "public"):
-        super().__init__(api_url, auth_token, visibility)
+    def __init__(self, api_url: str, api_key: str, auth_token: Optional[str] = None, visibility: str = "public",
+                 cache_db: Optional[str] = None):
+        super().__init__(api_url, auth_token, visibility, cache_db)
         self.api_key = api_key
+        self._quota_exhausted = False
+    
+    async def _fetch_page(self, batch_size: int) -> List[Dict]:
+        """Fetch one page of random photos, backing off only when Unsplash throttles us"""
+        try:
+            response = await self._with_retry(
+                self.session.get,
+                self.RANDOM_URL,
+                headers={"Authorization": f"Client-ID {self.api_key}"},
+                params={"count": batch_size, "orientation": "landscape"}
+            )
+        except Exception as e:
+            print(f"Error fetching from Unsplash: {e}")
+            return []
+        
+        remaining = response.headers.get("X-Ratelimit-Remaining")
+        if remaining is not None and int(remaining) == 0:
+            print("\n⚠️  Unsplash hourly rate limit reached; no further pages will be fetched")
+            self._quota_exhausted = True
+        return response.json()
     
     async def seed(self, count: int, **kwargs) -> List[Dict]:
         """Seed random Unsplash images"""
@@ -215,47 +432,33 @@ class UnsplashSeeder(DatasetSeeder):
         
         print(f"Seeding {count} images from Unsplash...")
         
-        results = []
-        semaphore = asyncio.Semaphore(5)  # Lower concurrency for API rate limits
-        
-        async def fetch_and_ingest():
-            async with semaphore:
-                try:
-                    # Get random image from Unsplash
-                    response = await self.session.get(
-                        self.RANDOM_URL,
-                        headers={"Authorization": f"Client-ID {self.api_key}"},
-                        params={"orientation": "landscape"}
-                    )
-                    response.raise_for_status()
-                    photo = response.json()
-                    
-                    # Extract metadata
-                    metadata = {
-                        "dataset": "unsplash",
-                        "unsplash_id": photo['id'],
-                        "photographer": photo['user']['name'],
-                        "photographer_url": photo['user']['links']['html'],
-                        "description": photo.get('description') or photo.get('alt_description'),
-                        "license": "Unsplash License",
-                        "attribution_required": True
-                    }
+        with self.progress_bar(count) as progress:
+            async with BufferedIngester(self, max_batch=self.BATCH_SIZE, progress=progress) as buffer:
+                # Fetch photo metadata in batches of up to MAX_BATCH per API call
+                remaining = count
+                for _ in range(math.ceil(count / self.MAX_BATCH)):
+                    if self._aborted.is_set() or self._quota_exhausted:
+                        break
+                    batch_size = min(self.MAX_BATCH, remaining)
+                    photos = await self._fetch_page(batch_size)
+                    if not photos:
+                        break
                     
-                    # Use regular quality image (not raw)
-                    image_url = photo['urls']['regular']
-                    
-                    return await self.ingest_image(image_url, metadata)
-                except Exception as e:
-                    print(f"Error fetching from Unsplash: {e}")
-                    return None
-        
-        tasks = [fetch_and_ingest() for _ in range(count)]
-        
-        for coro in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Ingesting"):
-            result = await coro
-            if result:
-                results.append(result)
-            await asyncio.sleep(0.1)  # Rate limiting
+                    for photo in photos:
+                        # Extract metadata
+                        metadata = {
+                            "dataset": "unsplash",
+                            "unsplash_id": photo['id'],
+                            "photographer": photo['user']['name'],
+                            "photographer_url": photo['user']['links']['html'],
+                            "description": photo.get('description') or photo.get('alt_description'),
+                            "license": "Unsplash License",
+                            "attribution_required": True
+                        }
+                        # Use regular quality image (not raw)
+                        await buffer.add(photo['urls']['regular'], metadata)
+                    remaining -= len(photos)
+        results = buffer.results
         
         print(f"Successfully ingested {len(results)}/{count} images")
         return results
@@ -264,6 +467,8 @@ class UnsplashSeeder(DatasetSeeder):
 class Flickr30kSeeder(DatasetSeeder):
     """Seeds images from Flickr30k dataset (requires Kaggle download)"""
     
+    CONCURRENCY = 10
+    
     async def seed(self, count: int, data_dir: str = "./data/flickr30k", **kwargs) -> List[Dict]:
         """Seed Flickr30k images from local directory"""
         data_path = Path(data_dir)
@@ -275,52 +480,79 @@ class Flickr30kSeeder(DatasetSeeder):
                 "Download from: kaggle datasets download -d adityajn105/flickr30k"
             )
         
-        # Get list of image files
-        image_files = list(images_dir.glob("*.jpg"))[:count]
-        
-        print(f"Seeding {len(image_files)} images from Flickr30k...")
+        print(f"Seeding up to {count} images from Flickr30k...")
         
         results = []
-        semaphore = asyncio.Semaphore(10)
+        semaphore = asyncio.Semaphore(self.CONCURRENCY)
         
         async def ingest_file(img_path):
-            async with semaphore:
-                try:
-                    # Prepare headers with auth token if provided
-                    headers = {}
-                    if self.auth_token:
-                        headers["Authorization"] = f"Bearer {self.auth_token}"
-                    
-                    # Read image file
-                    with open(img_path, 'rb') as f:
-                        files = {'file': (img_path.name, f, 'image/jpeg')}
-                        data = {'visibility': self.visibility}
-                        response = await self.session.post(
-                            f"{self.api_url}/images",
-                            files=files,
-                            data=data,
-                            headers=headers
-                        )
-                        response.raise_for_status()
-                        result = response.json()
-                        result["metadata"] = {
-                            "dataset": "flickr30k",
-                            "filename": img_path.name,
-                            "license": "CC BY-NC-SA 2.0"
-                        }
-                        return result
-                except Exception as e:
-                    print(f"Error ingesting {img_path.name}: {e}")
+            if self._aborted.is_set():
+                return None
+            img_file = None
+            try:
+                # Open and hash the image file off the event loop
+                img_file, img_hash = await asyncio.to_thread(_open_image_file, img_path)
+                cached = self.cache_get(img_hash)
+                if cached is not None:
+                    return cached
+                
+                # httpx streams the multipart body from the open file (and rewinds it on retry)
+                files = {'file': (img_path.name, img_file, 'image/jpeg')}
+                data = {
+                    'visibility': self.visibility,
+                    'metadata': json.dumps({
+                        "dataset": "flickr30k",
+                        "filename": img_path.name,
+                        "license": "CC BY-NC-SA 2.0"
+                    })
+                }
+                response = await self._with_retry(
+                    self.session.post,
+                    self._images_url,
+                    files=files,
+                    data=data,
+                    headers=self._auth_headers
+                )
+                result = response.json()
+                self.cache_put(img_hash, result)
+                return result
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 401:
+                    self._report_auth_failure()
                     return None
+                print(f"Error ingesting {img_path.name}: {e}")
+                return None
+            except Exception as e:
+                print(f"Error ingesting {img_path.name}: {e}")
+                return None
+            finally:
+                if img_file is not None:
+                    img_file.close()
         
-        tasks = [ingest_file(img) for img in image_files]
+        async def ingest_and_release(img_path, progress):
+            try:
+                result = await ingest_file(img_path)
+                if result:
+                    results.append(result)
+                progress.update(1)
+            finally:
+                semaphore.release()
         
-        for coro in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Ingesting"):
-            result = await coro
-            if result:
-                results.append(result)
+        produced = 0
+        with self.progress_bar(count) as progress:
+            # Tasks are created lazily as slots free up, so memory stays flat for any --count
+            async with asyncio.TaskGroup() as tg:
+                for img_path in itertools.islice(images_dir.glob("*.jpg"), count):
+                    if self._aborted.is_set():
+                        break
+                    await semaphore.acquire()
+                    tg.create_task(ingest_and_release(img_path, progress))
+                    produced += 1
+                # Directory may hold fewer files than requested
+                progress.total = produced
+                progress.refresh()
         
-        print(f"Successfully ingested {len(results)}/{len(image_files)} images")
+        print(f"Successfully ingested {len(results)}/{produced} images")
         return results
 
 
@@ -378,6 +610,8 @@ async def main():
     parser.add_argument("--list", action="store_true",
                        help="List available datasets")
     parser.add_argument("--output", help="Save results to JSON file")
+    parser.add_argument("--seed-cache", default="./data/seeded.db",
+                       help="SQLite file recording already-seeded images; pass '' to disable (default: ./data/seeded.db)")
     
     args = parser.parse_args()
     
@@ -403,17 +637,17 @@ async def main():
     
     # Create seeder
     if args.dataset == "coco":
-        async with COCOSeeder(args.api_url, auth_token, args.visibility) as seeder:
+        async with COCOSeeder(args.api_url, auth_token, args.visibility, args.seed_cache) as seeder:
             results = await seeder.seed(args.count, cache_dir=args.cache_dir)
     elif args.dataset == "unsplash":
         if not args.api_key:
             print("ERROR: Unsplash requires --api-key")
             print("Get a free key at: https://unsplash.com/developers")
             sys.exit(1)
-        async with UnsplashSeeder(args.api_url, args.api_key, auth_token, args.visibility) as seeder:
+        async with UnsplashSeeder(args.api_url, args.api_key, auth_token, args.visibility, args.seed_cache) as seeder:
             results = await seeder.seed(args.count)
     elif args.dataset == "flickr30k":
-        async with Flickr30kSeeder(args.api_url, auth_token, args.visibility) as seeder:
+        async with Flickr30kSeeder(args.api_url, auth_token, args.visibility, args.seed_cache) as seeder:
             results = await seeder.seed(args.count, data_dir=args.data_dir)
     
     # Save results
@@ -0,0 +1,60 @@
+"""
+Shared pytest fixtures
+"""
+import os
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+
+import apps.api.deps as deps
+from apps.api.main import app
+
+
+def pytest_configure(config):
+    # MockCloudProvider otherwise sleeps 1-3s per caption; keep a few ms so
+    # reported latencies stay non-zero
+    os.environ.setdefault("MOCK_PROVIDER_LATENCY_MS", "5")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def mock_model_backends(tmp_path_factory):
+    """Use the mock captioner/embedder and a throwaway image store.
+    
+    Upload tests only assert on auth/validation status codes, so loading
+    BLIP/CLIP would cost seconds per session for nothing. Set
+    RUN_INTEGRATION=1 to keep whatever deps.py selects.
+    """
+    if os.getenv("RUN_INTEGRATION"):
+        yield
+        return
+    
+    from apps.api.services.captioner_client_mock import CaptionerClient as MockCaptioner
+    from apps.api.services.embedder_client_mock import EmbedderClient as MockEmbedder
+    from apps.api.services.local_file_storage import LocalFileStorage
+    
+    saved = (deps._captioner, deps._embedder, deps._image_storage)
+    deps._captioner = MockCaptioner()
+    deps._embedder = MockEmbedder()
+    deps._image_storage = LocalFileStorage(base_path=str(tmp_path_factory.mktemp("images")))
+    yield
+    deps._captioner, deps._embedder, deps._image_storage = saved
+
+
+@pytest.fixture(scope="session")
+def client():
+    """One TestClient for the whole session; the app lifespan runs once"""
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def aclient():
+    """Async client over ASGITransport for firing independent requests concurrently.
+    
+    ASGITransport does not run the app lifespan; tests needing it use `client`.
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
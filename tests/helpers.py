@@ -0,0 +1,94 @@
+"""
+Helpers shared by the API test modules
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from functools import lru_cache
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image
+
+
+BANNER = "=" * 60
+
+
+def print_header(title: str) -> None:
+    """Print a section banner in one write"""
+    print(f"\n{BANNER}\n{title}\n{BANNER}")
+
+
+def create_test_token(user_id: str, email: str, role: str = "user") -> str:
+    """Create a test JWT token.
+    Uses a test secret if SUPABASE_JWT_SECRET is not set.
+    """
+    secret = os.getenv("SUPABASE_JWT_SECRET", "test-secret-for-development-only")
+    return _sign_test_token(user_id, email, role, secret)
+
+
+# Fixed HS256 JOSE header, as jose.jwt.encode would emit it
+_HS256_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+
+
+@lru_cache(maxsize=None)
+def _sign_test_token(user_id: str, email: str, role: str, secret: str) -> str:
+    """Sign once per (user, role, secret); tokens stay valid for an hour from first use.
+    
+    HS256 is signed with hmac directly; jose only adds per-call header/key
+    dispatch on top of the same HMAC-SHA256.
+    """
+    now = int(time.time())
+    payload = {
+        "sub": user_id,
+        "email": email,
+        "role": role,
+        "aud": "authenticated",
+        "exp": now + 3600,
+        "iat": now
+    }
+    body = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).rstrip(b"=")
+    signing_input = _HS256_HEADER + b"." + body
+    signature = hmac.new(secret.encode(), signing_input, hashlib.sha256).digest()
+    return (signing_input + b"." + base64.urlsafe_b64encode(signature).rstrip(b"=")).decode()
+
+
+def encode_test_jpeg(color="red") -> bytes:
+    """A 100x100 single-colour JPEG"""
+    img = Image.new('RGB', (100, 100), color=color)
+    img_bytes = BytesIO()
+    img.save(img_bytes, format='JPEG')
+    return img_bytes.getvalue()
+
+
+# Encoded once per session; shared by every prebuilt upload body below
+TEST_JPEG = encode_test_jpeg()
+
+UPLOAD_BOUNDARY = b"imagesearch-test-boundary"
+UPLOAD_CONTENT_TYPE = {"Content-Type": f"multipart/form-data; boundary={UPLOAD_BOUNDARY.decode()}"}
+
+
+def multipart_body(visibility: Optional[str] = None, image: bytes = TEST_JPEG) -> bytes:
+    """Assemble the POST /images form body around `image`"""
+    parts = [
+        b'--' + UPLOAD_BOUNDARY + b'\r\n'
+        b'Content-Disposition: form-data; name="file"; filename="test.jpg"\r\n'
+        b'Content-Type: image/jpeg\r\n\r\n' + image + b'\r\n'
+    ]
+    if visibility is not None:
+        parts.append(
+            b'--' + UPLOAD_BOUNDARY + b'\r\n'
+            b'Content-Disposition: form-data; name="visibility"\r\n\r\n' + visibility.encode() + b'\r\n'
+        )
+    parts.append(b'--' + UPLOAD_BOUNDARY + b'--\r\n')
+    return b''.join(parts)
+
+
+# Upload bodies are identical across runs; encode each multipart variant once
+UPLOAD_BODIES = {
+    visibility: multipart_body(visibility)
+    for visibility in (None, "private", "public", "public_admin", "invalid")
+}
@@ -1,35 +1,71 @@
-from locust import HttpUser, task, between
+from locust import task, between
+from locust.contrib.fasthttp import FastHttpUser
+from jose import jwt
+from pathlib import Path
+import os
+import time
 import random
+import uuid
 
-class SearchUser(HttpUser):
+from dotenv import load_dotenv
+
+# Load SUPABASE_JWT_SECRET from the project .env, as benchmark_search.py does
+load_dotenv(Path(__file__).parent.parent.parent / ".env")
+
+
+def create_test_token(user_id: str, email: str, role: str = "user") -> str:
+    """Create a test JWT token (same shape as tests/benchmark_search.py)"""
+    secret = os.getenv("SUPABASE_JWT_SECRET")
+    if not secret:
+        raise ValueError("SUPABASE_JWT_SECRET not found in environment")
+    now = int(time.time())
+    payload = {
+        "sub": user_id,
+        "email": email,
+        "role": role,
+        "aud": "authenticated",
+        "exp": now + 3600,
+        "iat": now
+    }
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+class SearchUser(FastHttpUser):
     wait_time = between(1, 3)
+    # geventhttpclient-based client; same .get() API as HttpUser
+    network_timeout = 10.0
+    connection_timeout = 5.0
+
+    # Request URLs are built once per class, not per task tick
+    _URLS_PUBLIC = tuple(
+        f"/search?q={q}&scope=public"
+        for q in ("cat", "dog", "car", "beach", "mountain", "city", "food", "people")
+    )
+    _URLS_ALL = tuple(
+        f"/search?q={q}&scope=all"
+        for q in ("office", "laptop", "meeting", "code")
+    )
+    _URLS_MINE = tuple(
+        f"/search?q={q}&scope=mine"
+        for q in ("my document", "notes", "screenshot")
+    )
+
+    def on_start(self):
+        # One token per simulated user, built once rather than per request
+        token = create_test_token(str(uuid.uuid4()), "load@test.com")
+        self.token_headers = {"Authorization": f"Bearer {token}"}
 
     @task(3)
     def search_public_vector(self):
         """Simulate a public vector search (most common)"""
-        queries = ["cat", "dog", "car", "beach", "mountain", "city", "food", "people"]
-        q = random.choice(queries)
-        self.client.get(f"/search?q={q}&scope=public", name="/search (public)")
+        self.client.get(random.choice(self._URLS_PUBLIC), name="/search (public)")
 
     @task(1)
     def search_hybrid_all(self):
         """Simulate an authenticated hybrid search across all images"""
-        # Note: In a real scenario, we'd need to handle auth tokens.
-        # For now, assuming the API handles auth or we are testing public endpoints primarily,
-        # or we can mock auth headers if needed.
-        # Given the current setup, let's stick to public search or mock a user if possible.
-        # The benchmark script used a hardcoded user_id.
-        # For simplicity in this load test, we'll focus on the public endpoint which hits the core search logic.
-        queries = ["office", "laptop", "meeting", "code"]
-        q = random.choice(queries)
-        self.client.get(f"/search?q={q}&scope=all", name="/search (all)")
+        self.client.get(random.choice(self._URLS_ALL), headers=self.token_headers, name="/search (all)")
 
     @task(1)
     def search_hybrid_mine(self):
         """Simulate searching own images"""
-        queries = ["my document", "notes", "screenshot"]
-        q = random.choice(queries)
-        # We need a user_id for 'mine' scope usually, or it defaults to current user.
-        # If no auth token, 'mine' might fail or return empty.
-        # Let's assume we want to stress test the 'public' path mostly as it's the heaviest.
-        self.client.get(f"/search?q={q}&scope=public", name="/search (public_random)")
+        self.client.get(random.choice(self._URLS_MINE), headers=self.token_headers, name="/search (mine)")
@@ -1,109 +1,70 @@
 """
 Tests for multi-tenant API endpoints (Phase 3).
 """
+import asyncio
 import pytest
-from fastapi.testclient import TestClient
-from apps.api.main import app
-from jose import jwt
-import os
-from datetime import datetime, timedelta
-from io import BytesIO
-from PIL import Image
+import hashlib
+import httpx
 
-client = TestClient(app)
+from tests.helpers import TEST_JPEG, UPLOAD_BODIES, UPLOAD_CONTENT_TYPE, create_test_token
 
 
-def create_test_token(user_id: str, email: str, role: str = "user") -> str:
-    """Create a test JWT token"""
-    secret = os.getenv("SUPABASE_JWT_SECRET", "test-secret-for-development-only")
-    payload = {
-        "sub": user_id,
-        "email": email,
-        "role": role,
-        "aud": "authenticated",
-        "exp": datetime.utcnow() + timedelta(hours=1),
-        "iat": datetime.utcnow()
-    }
-    return jwt.encode(payload, secret, algorithm="HS256")
-
-
-def create_test_image() -> BytesIO:
-    """Create a simple test image"""
-    img = Image.new('RGB', (100, 100), color='red')
-    img_bytes = BytesIO()
-    img.save(img_bytes, format='JPEG')
-    img_bytes.seek(0)
-    return img_bytes
+# Only one identity is needed across this module; signed once at import
+USER_TOKEN = create_test_token("user-1", "user1@test.com")
 
 
 class TestImageIngestion:
     """Test POST /images endpoint"""
     
-    def test_upload_requires_auth(self):
+    def test_upload_requires_auth(self, client):
         """Test that image upload requires authentication"""
-        img_bytes = create_test_image()
         response = client.post(
             "/images",
-            files={"file": ("test.jpg", img_bytes, "image/jpeg")}
+            content=UPLOAD_BODIES[None],
+            headers=UPLOAD_CONTENT_TYPE
         )
         assert response.status_code == 401
     
-    def test_upload_with_auth(self):
+    def test_upload_with_auth(self, client):
         """Test authenticated image upload"""
-        token = create_test_token("user-1", "user1@test.com")
-        img_bytes = create_test_image()
-        
         response = client.post(
             "/images",
-            files={"file": ("test.jpg", img_bytes, "image/jpeg")},
-            data={"visibility": "private"},
-            headers={"Authorization": f"Bearer {token}"}
+            content=UPLOAD_BODIES["private"],
+            headers={**UPLOAD_CONTENT_TYPE, "Authorization": f"Bearer {USER_TOKEN}"}
         )
         
         # Should succeed or fail with specific error (not auth error)
         assert response.status_code != 401
         # Note: May fail with 500 if embedder/storage not configured, but that's OK for this test
     
-    def test_upload_public_image(self):
+    def test_upload_public_image(self, client):
         """Test uploading a public image"""
-        token = create_test_token("user-1", "user1@test.com")
-        img_bytes = create_test_image()
-        
         response = client.post(
             "/images",
-            files={"file": ("test.jpg", img_bytes, "image/jpeg")},
-            data={"visibility": "public"},
-            headers={"Authorization": f"Bearer {token}"}
+            content=UPLOAD_BODIES["public"],
+            headers={**UPLOAD_CONTENT_TYPE, "Authorization": f"Bearer {USER_TOKEN}"}
         )
         
         assert response.status_code != 401
     
-    def test_upload_public_admin_requires_admin(self):
+    def test_upload_public_admin_requires_admin(self, client):
         """Test that public_admin visibility requires admin role"""
-        token = create_test_token("user-1", "user1@test.com", role="user")
-        img_bytes = create_test_image()
-        
         response = client.post(
             "/images",
-            files={"file": ("test.jpg", img_bytes, "image/jpeg")},
-            data={"visibility": "public_admin"},
-            headers={"Authorization": f"Bearer {token}"}
+            content=UPLOAD_BODIES["public_admin"],
+            headers={**UPLOAD_CONTENT_TYPE, "Authorization": f"Bearer {USER_TOKEN}"}
         )
         
         # Should fail with 403 or succeed if we get past validation
         if response.status_code not in [500]:  # Ignore infrastructure errors
             assert response.status_code in [403, 400]
     
-    def test_upload_invalid_visibility(self):
+    def test_upload_invalid_visibility(self, client):
         """Test that invalid visibility is rejected"""
-        token = create_test_token("user-1", "user1@test.com")
-        img_bytes = create_test_image()
-        
         response = client.post(
             "/images",
-            files={"file": ("test.jpg", img_bytes, "image/jpeg")},
-            data={"visibility": "invalid"},
-            headers={"Authorization": f"Bearer {token}"}
+            content=UPLOAD_BODIES["invalid"],
+            headers={**UPLOAD_CONTENT_TYPE, "Authorization": f"Bearer {USER_TOKEN}"}
         )
         
         # Should fail with 400 or 500 (depending on when validation happens)
@@ -111,21 +72,115 @@ class TestImageIngestion:
             assert response.status_code == 400
 
 
+class TestBatchIngestion:
+    """Test POST /images/batch (remote images by URL)"""
+    
+    # Public address literals resolve without DNS
+    GOOD_URL = "http://93.184.216.34/cat.jpg"
+    
+    @pytest.fixture
+    def remote(self, monkeypatch):
+        """Serve fetches from a dict of url -> httpx.Response and fake the
+        auth and ingest steps, so no DB is needed.
+        
+        Yields (responses, list of URLs actually fetched).
+        """
+        from apps.api.main import app
+        from apps.api.routes import images
+        from apps.api.auth.dependencies import require_auth
+        from apps.api.auth.models import CurrentUser
+        responses = {}
+        fetched = []
+        
+        def handler(request):
+            fetched.append(str(request.url))
+            return responses.get(str(request.url), httpx.Response(404))
+        
+        async def fake_ingest(img_bytes, src, *args, **kwargs):
+            return {"id": hashlib.sha256(img_bytes).hexdigest()[:16]}
+        
+        monkeypatch.setattr(images, "_fetch_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(images, "ingest_image_bytes", fake_ingest)
+        monkeypatch.setattr(images, "MAX_FETCH_BYTES", 1024 * 1024)
+        app.dependency_overrides[require_auth] = lambda: CurrentUser(id="user-1", email="user1@test.com", role="user")
+        yield responses, fetched
+        app.dependency_overrides.pop(require_auth, None)
+    
+    def _post(self, client, *urls):
+        return client.post("/images/batch", json={"items": [{"url": url} for url in urls]})
+    
+    def test_batch_size_limit(self, client, remote):
+        """Test that batches over MAX_BATCH_SIZE are rejected before any fetch"""
+        from apps.api.routes.images import MAX_BATCH_SIZE
+        _, fetched = remote
+        response = self._post(client, *[self.GOOD_URL] * (MAX_BATCH_SIZE + 1))
+        assert response.status_code == 413
+        assert fetched == []
+    
+    @pytest.mark.parametrize("url", [
+        "ftp://93.184.216.34/cat.jpg",
+        "file:///etc/passwd",
+        "http://127.0.0.1:8000/healthz",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://10.0.0.5/cat.jpg",
+        "http://[::1]/cat.jpg",
+    ])
+    def test_bad_url_never_fetched(self, client, remote, url):
+        """Test that non-http(s) and internal URLs are reported, not fetched"""
+        _, fetched = remote
+        response = self._post(client, url)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 0
+        assert [e["url"] for e in data["errors"]] == [url]
+        assert fetched == []
+    
+    def test_redirect_to_internal_host_not_followed(self, client, remote):
+        """Test that each redirect hop is checked like the original URL"""
+        responses, fetched = remote
+        responses[self.GOOD_URL] = httpx.Response(302, headers={"location": "http://169.254.169.254/"})
+        data = self._post(client, self.GOOD_URL).json()
+        assert data["count"] == 0
+        assert fetched == [self.GOOD_URL]
+    
+    @pytest.mark.parametrize("response", [
+        httpx.Response(404),
+        httpx.Response(200, content=b"<html></html>", headers={"content-type": "text/html"}),
+        httpx.Response(200, content=b"x" * (1024 * 1024 + 1), headers={"content-type": "image/jpeg"}),
+    ], ids=["not-found", "not-an-image", "too-large"])
+    def test_failed_fetch(self, client, remote, response):
+        """Test that a failed or rejected download becomes a per-item error"""
+        responses, _ = remote
+        responses[self.GOOD_URL] = response
+        data = self._post(client, self.GOOD_URL).json()
+        assert data["count"] == 0
+        assert len(data["errors"]) == 1
+    
+    def test_mixed_batch(self, client, remote):
+        """Test that failures are reported per item without failing the batch"""
+        responses, _ = remote
+        bad_url = "http://93.184.216.34/missing.jpg"
+        responses[self.GOOD_URL] = httpx.Response(200, content=TEST_JPEG, headers={"content-type": "image/jpeg"})
+        data = self._post(client, self.GOOD_URL, bad_url, "http://localhost/cat.jpg").json()
+        assert data["count"] == 1
+        assert [r["url"] for r in data["results"]] == [self.GOOD_URL]
+        assert sorted(e["url"] for e in data["errors"]) == [bad_url, "http://localhost/cat.jpg"]
+
+
 class TestImageRetrieval:
     """Test GET /images/{id} endpoint"""
     
-    def test_get_image_anonymous_public(self):
+    def test_get_image_anonymous_public(self, client):
         """Test anonymous access to public images"""
         # This will fail with 404 if image doesn't exist, which is expected
         response = client.get("/images/nonexistent-id")
         assert response.status_code in [404, 401]  # 404 if not found, 401 if private
     
-    def test_get_image_with_auth(self):
+    def test_get_image_with_auth(self, client):
         """Test authenticated access to images"""
-        token = create_test_token("user-1", "user1@test.com")
         response = client.get(
             "/images/nonexistent-id",
-            headers={"Authorization": f"Bearer {token}"}
+            headers={"Authorization": f"Bearer {USER_TOKEN}"}
         )
         assert response.status_code == 404  # Should be 404, not 401
 
@@ -133,7 +188,7 @@ class TestImageRetrieval:
 class TestImageSearch:
     """Test GET /search endpoint"""
     
-    def test_search_anonymous_public_scope(self):
+    def test_search_anonymous_public_scope(self, client):
         """Test anonymous search with public scope"""
         response = client.get("/search?q=test&scope=public")
         assert response.status_code == 200
@@ -142,46 +197,29 @@ class TestImageSearch:
         assert "results" in data
         assert data["query"] == "test"
     
-    def test_search_anonymous_all_scope_fails(self):
-        """Test that anonymous users cannot use 'all' scope"""
-        response = client.get("/search?q=test&scope=all")
-        assert response.status_code == 401
-    
-    def test_search_anonymous_mine_scope_fails(self):
-        """Test that anonymous users cannot use 'mine' scope"""
-        response = client.get("/search?q=test&scope=mine")
-        assert response.status_code == 401
-    
-    def test_search_authenticated_all_scope(self):
-        """Test authenticated search with 'all' scope"""
-        token = create_test_token("user-1", "user1@test.com")
-        response = client.get(
-            "/search?q=test&scope=all",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        assert response.status_code == 200
-        data = response.json()
-        assert "results" in data
-    
-    def test_search_authenticated_mine_scope(self):
-        """Test authenticated search with 'mine' scope"""
-        token = create_test_token("user-1", "user1@test.com")
-        response = client.get(
-            "/search?q=test&scope=mine",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        assert response.status_code == 200
-    
-    def test_search_invalid_scope(self):
-        """Test that invalid scope is rejected"""
-        response = client.get("/search?q=test&scope=invalid")
-        assert response.status_code == 400
+    @pytest.mark.parametrize("scope,auth,expected", [
+        ("public", False, 200),
+        ("all", False, 401),      # anonymous users cannot use 'all'
+        ("mine", False, 401),     # ...or 'mine'
+        ("all", True, 200),
+        ("mine", True, 200),
+        ("invalid", False, 400),
+    ])
+    def test_search_scope_matrix(self, client, scope, auth, expected):
+        """Test which scopes are allowed with and without authentication"""
+        headers = {}
+        if auth:
+            headers["Authorization"] = f"Bearer {USER_TOKEN}"
+        response = client.get(f"/search?q=test&scope={scope}", headers=headers)
+        assert response.status_code == expected
+        if expected == 200:
+            assert "results" in response.json()
 
 
 class TestImageUpdate:
     """Test PATCH /images/{id} endpoint"""
     
-    def test_update_requires_auth(self):
+    def test_update_requires_auth(self, client):
         """Test that update requires authentication"""
         response = client.patch(
             "/images/test-id",
@@ -189,35 +227,32 @@ class TestImageUpdate:
         )
         assert response.status_code == 401
     
-    def test_update_with_auth(self):
+    def test_update_with_auth(self, client):
         """Test authenticated update"""
-        token = create_test_token("user-1", "user1@test.com")
         response = client.patch(
             "/images/nonexistent-id",
             json={"visibility": "public"},
-            headers={"Authorization": f"Bearer {token}"}
+            headers={"Authorization": f"Bearer {USER_TOKEN}"}
         )
         # Should be 404 (not found) not 401 (unauthorized)
         assert response.status_code == 404
     
-    def test_update_invalid_visibility(self):
+    def test_update_invalid_visibility(self, client):
         """Test that invalid visibility is rejected"""
-        token = create_test_token("user-1", "user1@test.com")
         response = client.patch(
             "/images/test-id",
             json={"visibility": "invalid"},
-            headers={"Authorization": f"Bearer {token}"}
+            headers={"Authorization": f"Bearer {USER_TOKEN}"}
         )
         # Should fail with 400 or 404
         assert response.status_code in [400, 404]
     
-    def test_update_public_admin_requires_admin(self):
+    def test_update_public_admin_requires_admin(self, client):
         """Test that setting public_admin requires admin role"""
-        token = create_test_token("user-1", "user1@test.com", role="user")
         response = client.patch(
             "/images/test-id",
             json={"visibility": "public_admin"},
-            headers={"Authorization": f"Bearer {token}"}
+            headers={"Authorization": f"Bearer {USER_TOKEN}"}
         )
         # Should fail with 403 or 404
         assert response.status_code in [403, 404]
@@ -226,17 +261,16 @@ class TestImageUpdate:
 class TestImageDelete:
     """Test DELETE /images/{id} endpoint"""
     
-    def test_delete_requires_auth(self):
+    def test_delete_requires_auth(self, client):
         """Test that delete requires authentication"""
         response = client.delete("/images/test-id")
         assert response.status_code == 401
     
-    def test_delete_with_auth(self):
+    def test_delete_with_auth(self, client):
         """Test authenticated delete"""
-        token = create_test_token("user-1", "user1@test.com")
         response = client.delete(
             "/images/nonexistent-id",
-            headers={"Authorization": f"Bearer {token}"}
+            headers={"Authorization": f"Bearer {USER_TOKEN}"}
         )
         # Should be 404 (not found) not 401 (unauthorized)
         assert response.status_code == 404
@@ -245,28 +279,23 @@ class TestImageDelete:
 class TestImageList:
     """Test GET /images endpoint"""
     
-    def test_list_anonymous(self):
-        """Test anonymous image listing"""
-        response = client.get("/images")
-        assert response.status_code == 200
-        data = response.json()
-        assert "images" in data
-        assert "limit" in data
-        assert "offset" in data
-        assert "count" in data
-    
-    def test_list_authenticated(self):
-        """Test authenticated image listing"""
-        token = create_test_token("user-1", "user1@test.com")
-        response = client.get(
-            "/images",
-            headers={"Authorization": f"Bearer {token}"}
-        )
+    @pytest.mark.parametrize("auth,query", [
+        (False, ""),
+        (True, ""),
+        (False, "?visibility=public"),
+    ])
+    def test_list_matrix(self, client, auth, query):
+        """Test anonymous, authenticated and filtered image listing"""
+        headers = {}
+        if auth:
+            headers["Authorization"] = f"Bearer {USER_TOKEN}"
+        response = client.get(f"/images{query}", headers=headers)
         assert response.status_code == 200
         data = response.json()
-        assert "images" in data
+        for key in ("images", "limit", "offset", "count"):
+            assert key in data
     
-    def test_list_with_pagination(self):
+    def test_list_with_pagination(self, client):
         """Test image listing with pagination"""
         response = client.get("/images?limit=10&offset=0")
         assert response.status_code == 200
@@ -274,71 +303,58 @@ class TestImageList:
         assert data["limit"] == 10
         assert data["offset"] == 0
     
-    def test_list_max_limit(self):
+    def test_list_max_limit(self, client):
         """Test that limit is capped at 100"""
         response = client.get("/images?limit=200")
         assert response.status_code == 200
         data = response.json()
         assert data["limit"] == 100  # Should be capped
-    
-    def test_list_with_visibility_filter(self):
-        """Test image listing with visibility filter"""
-        response = client.get("/images?visibility=public")
-        assert response.status_code == 200
-        data = response.json()
-        assert "images" in data
 
 
 class TestAccessControl:
-    """Test access control logic"""
-    
-    def test_anonymous_cannot_access_private(self):
-        """Test that anonymous users cannot access private images"""
-        # This is tested indirectly through other tests
-        # The actual test would require creating a private image first
-        pass
+    """Test access control logic.
     
-    def test_user_can_access_own_images(self):
-        """Test that users can access their own images"""
-        # Would require creating an image and then accessing it
-        pass
+    The permission matrix is checked against CurrentUser directly; the HTTP
+    path is covered by the *_requires_auth / *_with_auth smoke tests above.
+    """
     
-    def test_admin_can_access_all_images(self):
-        """Test that admins can access all images"""
-        # Would require creating images and testing admin access
-        pass
+    @pytest.mark.parametrize("role,owner_id,visibility,can_access,can_modify", [
+        ("user", "user-1", "private", True, True),        # own private image
+        ("user", "user-1", "public", True, True),         # own public image
+        ("user", "user-2", "private", False, False),      # someone else's private image
+        ("user", "user-2", "public", True, False),        # someone else's public image
+        ("user", None, "public_admin", True, False),      # system image
+        ("admin", "user-2", "private", True, True),       # admin sees and edits everything
+        ("admin", None, "public_admin", True, True),
+    ])
+    def test_permission_matrix(self, role, owner_id, visibility, can_access, can_modify):
+        """Test access/modify decisions for each role, owner and visibility"""
+        from apps.api.auth.models import CurrentUser
+        
+        user = CurrentUser(id="user-1" if role == "user" else "admin-1", email="u@test.com", role=role)
+        assert user.can_access_image(owner_id, visibility) is can_access
+        assert user.can_modify_image(owner_id) is can_modify
 
 
 class TestDownloadEndpoints:
     """Test download and thumbnail endpoints"""
     
-    def test_download_anonymous_public(self):
-        """Test anonymous download of public images"""
-        response = client.get("/images/nonexistent-id/download")
-        assert response.status_code in [404, 401]
-    
-    def test_download_with_auth(self):
-        """Test authenticated download"""
-        token = create_test_token("user-1", "user1@test.com")
-        response = client.get(
-            "/images/nonexistent-id/download",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        assert response.status_code == 404
-    
-    def test_thumbnail_anonymous_public(self):
-        """Test anonymous thumbnail access"""
-        response = client.get("/images/nonexistent-id/thumbnail")
-        assert response.status_code in [404, 401]
-    
-    def test_thumbnail_with_auth(self):
-        """Test authenticated thumbnail access"""
-        token = create_test_token("user-1", "user1@test.com")
-        response = client.get(
-            "/images/nonexistent-id/thumbnail",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        assert response.status_code == 404
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_download_matrix(self, aclient):
+        """Test download and thumbnail access with and without auth, concurrently"""
+        auth = {"Authorization": f"Bearer {USER_TOKEN}"}
+        cases = [
+            ("download", {}, (404, 401)),
+            ("download", auth, (404,)),
+            ("thumbnail", {}, (404, 401)),
+            ("thumbnail", auth, (404,)),
+        ]
+        responses = await asyncio.gather(*(
+            aclient.get(f"/images/nonexistent-id/{path}", headers=headers)
+            for path, headers, _ in cases
+        ))
+        for (path, headers, expected), response in zip(cases, responses):
+            assert response.status_code in expected, f"{path} (auth={bool(headers)})"
 
 
 if __name__ == "__main__":
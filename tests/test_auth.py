@@ -2,37 +2,24 @@
 Tests for authentication and authorization.
 """
 import pytest
-from fastapi.testclient import TestClient
-from apps.api.main import app
 from jose import jwt
 import os
 import base64
 import time
-from datetime import datetime, timedelta
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import ec
 
-client = TestClient(app)
+from tests.helpers import create_test_token
 
-TEST_USER_ID = "00000000-0000-0000-0000-000000000123"
-TEST_ADMIN_ID = "00000000-0000-0000-0000-000000000999"
+try:
+    import pytest_benchmark  # noqa: F401
+    BENCHMARK_AVAILABLE = True
+except ImportError:
+    BENCHMARK_AVAILABLE = False
 
 
-def create_test_token(user_id: str, email: str, role: str = "user") -> str:
-    """
-    Create a test JWT token for testing.
-    Uses a test secret if SUPABASE_JWT_SECRET is not set.
-    """
-    secret = os.getenv("SUPABASE_JWT_SECRET", "test-secret-for-development-only")
-    payload = {
-        "sub": user_id,
-        "email": email,
-        "role": role,
-        "aud": "authenticated",
-        "exp": datetime.utcnow() + timedelta(hours=1),
-        "iat": datetime.utcnow()
-    }
-    return jwt.encode(payload, secret, algorithm="HS256")
+TEST_USER_ID = "00000000-0000-0000-0000-000000000123"
+TEST_ADMIN_ID = "00000000-0000-0000-0000-000000000999"
 
 
 def _base64url_uint(value: int) -> str:
@@ -56,13 +43,14 @@ def create_es256_test_token(user_id: str, email: str, role: str = "user") -> tup
         "alg": "ES256",
         "kid": "test-es256-key",
     }
+    now = int(time.time())
     payload = {
         "sub": user_id,
         "email": email,
         "role": role,
         "aud": "authenticated",
-        "exp": datetime.utcnow() + timedelta(hours=1),
-        "iat": datetime.utcnow(),
+        "exp": now + 3600,
+        "iat": now,
     }
     token = jwt.encode(
         payload,
@@ -73,10 +61,34 @@ def create_es256_test_token(user_id: str, email: str, role: str = "user") -> tup
     return token, jwk
 
 
+def _sign_with_jose(**claims) -> str:
+    """Sign a hand-built payload, for tokens the API must reject"""
+    secret = os.getenv("SUPABASE_JWT_SECRET", "test-secret-for-development-only")
+    now = int(time.time())
+    payload = {
+        "sub": TEST_USER_ID,
+        "email": "test@example.com",
+        "role": "user",
+        "aud": "authenticated",
+        "exp": now + 3600,
+        "iat": now,
+        **claims
+    }
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+# Every token this module needs, signed once at import
+USER_TOKEN = create_test_token(TEST_USER_ID, "test@example.com")
+ADMIN_TOKEN = create_test_token(TEST_ADMIN_ID, "admin@example.com", role="admin")
+_T0 = int(time.time())
+EXPIRED_TOKEN = _sign_with_jose(exp=_T0 - 3600, iat=_T0 - 7200)
+WRONG_AUD_TOKEN = _sign_with_jose(aud="wrong-audience")
+
+
 class TestAuthEndpoints:
     """Test authentication endpoints"""
     
-    def test_auth_me_anonymous(self):
+    def test_auth_me_anonymous(self, client):
         """Test /auth/me without authentication"""
         response = client.get("/auth/me")
         assert response.status_code == 200
@@ -84,12 +96,11 @@ class TestAuthEndpoints:
         assert data["authenticated"] is False
         assert data["user"] is None
     
-    def test_auth_me_authenticated(self):
+    def test_auth_me_authenticated(self, client):
         """Test /auth/me with valid token"""
-        token = create_test_token(TEST_USER_ID, "test@example.com")
         response = client.get(
             "/auth/me",
-            headers={"Authorization": f"Bearer {token}"}
+            headers={"Authorization": f"Bearer {USER_TOKEN}"}
         )
         assert response.status_code == 200
         data = response.json()
@@ -98,7 +109,7 @@ class TestAuthEndpoints:
         assert data["user"]["email"] == "test@example.com"
         assert data["user"]["role"] == "user"
 
-    def test_auth_me_authenticated_es256_jwks(self, monkeypatch):
+    def test_auth_me_authenticated_es256_jwks(self, client, monkeypatch):
         """Test /auth/me with a Supabase asymmetric signing-key token."""
         from apps.api.auth import dependencies as auth_deps
 
@@ -117,44 +128,41 @@ class TestAuthEndpoints:
         assert data["user"]["email"] == "test@example.com"
         assert data["user"]["role"] == "user"
     
-    def test_auth_check_requires_auth(self):
+    def test_auth_check_requires_auth(self, client):
         """Test /auth/check requires authentication"""
         response = client.get("/auth/check")
         assert response.status_code == 401  # No credentials provided
     
-    def test_auth_check_with_token(self):
+    def test_auth_check_with_token(self, client):
         """Test /auth/check with valid token"""
-        token = create_test_token(TEST_USER_ID, "test@example.com")
         response = client.get(
             "/auth/check",
-            headers={"Authorization": f"Bearer {token}"}
+            headers={"Authorization": f"Bearer {USER_TOKEN}"}
         )
         assert response.status_code == 200
         data = response.json()
         assert data["authenticated"] is True
     
-    def test_admin_endpoint_requires_admin(self):
+    def test_admin_endpoint_requires_admin(self, client):
         """Test admin endpoint rejects non-admin users"""
-        token = create_test_token(TEST_USER_ID, "test@example.com", role="user")
         response = client.get(
             "/admin/health",
-            headers={"Authorization": f"Bearer {token}"}
+            headers={"Authorization": f"Bearer {USER_TOKEN}"}
         )
         assert response.status_code == 403
     
-    def test_admin_endpoint_allows_admin(self):
+    def test_admin_endpoint_allows_admin(self, client):
         """Test admin endpoint allows admin users"""
-        token = create_test_token(TEST_ADMIN_ID, "admin@example.com", role="admin")
         response = client.get(
             "/admin/health",
-            headers={"Authorization": f"Bearer {token}"}
+            headers={"Authorization": f"Bearer {ADMIN_TOKEN}"}
         )
         assert response.status_code == 200
         data = response.json()
         assert data["status"] == "ok"
         assert data["admin"]["id"] == TEST_ADMIN_ID
     
-    def test_invalid_token(self):
+    def test_invalid_token(self, client):
         """Test invalid token is rejected"""
         response = client.get(
             "/auth/check",
@@ -162,45 +170,52 @@ class TestAuthEndpoints:
         )
         assert response.status_code == 401
     
-    def test_expired_token(self):
+    def test_expired_token(self, client):
         """Test expired token is rejected"""
-        secret = os.getenv("SUPABASE_JWT_SECRET", "test-secret-for-development-only")
-        payload = {
-            "sub": TEST_USER_ID,
-            "email": "test@example.com",
-            "role": "user",
-            "aud": "authenticated",
-            "exp": datetime.utcnow() - timedelta(hours=1),  # Expired
-            "iat": datetime.utcnow() - timedelta(hours=2)
-        }
-        token = jwt.encode(payload, secret, algorithm="HS256")
-        
         response = client.get(
             "/auth/check",
-            headers={"Authorization": f"Bearer {token}"}
+            headers={"Authorization": f"Bearer {EXPIRED_TOKEN}"}
         )
         assert response.status_code == 401
     
-    def test_wrong_audience(self):
+    def test_wrong_audience(self, client):
         """Test token with wrong audience is rejected"""
-        secret = os.getenv("SUPABASE_JWT_SECRET", "test-secret-for-development-only")
-        payload = {
-            "sub": TEST_USER_ID,
-            "email": "test@example.com",
-            "role": "user",
-            "aud": "wrong-audience",  # Wrong audience
-            "exp": datetime.utcnow() + timedelta(hours=1),
-            "iat": datetime.utcnow()
-        }
-        token = jwt.encode(payload, secret, algorithm="HS256")
-        
         response = client.get(
             "/auth/check",
-            headers={"Authorization": f"Bearer {token}"}
+            headers={"Authorization": f"Bearer {WRONG_AUD_TOKEN}"}
         )
         assert response.status_code == 401
 
 
+class TestVerifiedTokenCache:
+    """Test the short-lived cache of verified JWT payloads"""
+
+    @pytest.fixture(autouse=True)
+    def _isolated_cache(self, monkeypatch):
+        from apps.api.auth import dependencies as auth_deps
+        monkeypatch.setenv("SUPABASE_JWT_SECRET", os.getenv("SUPABASE_JWT_SECRET", "test-secret-for-development-only"))
+        monkeypatch.setattr(auth_deps, "_verified_jwt_cache", {})
+        return auth_deps
+
+    async def test_repeat_token_skips_verification(self, _isolated_cache, monkeypatch):
+        auth_deps = _isolated_cache
+        first = await auth_deps._decode_supabase_jwt(USER_TOKEN)
+        assert first["sub"] == TEST_USER_ID
+
+        async def fail(token):
+            raise AssertionError("cached token was verified again")
+        monkeypatch.setattr(auth_deps, "_verify_supabase_jwt", fail)
+
+        assert await auth_deps._decode_supabase_jwt(USER_TOKEN) == first
+
+    async def test_failures_are_not_cached(self, _isolated_cache):
+        from jose import JWTError
+        auth_deps = _isolated_cache
+        with pytest.raises(JWTError):
+            await auth_deps._decode_supabase_jwt(EXPIRED_TOKEN)
+        assert auth_deps._verified_jwt_cache == {}
+
+
 class TestCurrentUserModel:
     """Test CurrentUser model methods"""
     
@@ -258,5 +273,40 @@ class TestCurrentUserModel:
         assert admin.can_modify_image("user-2") is True
 
 
+@pytest.mark.skipif(not BENCHMARK_AVAILABLE, reason="pytest-benchmark not installed")
+class TestCurrentUserBenchmarks:
+    """Timing guards for the permission checks run on every fetched/searched image.
+    
+    Compare against a saved run to catch regressions (e.g. a lookup sneaking
+    into can_access_image):
+        pytest tests/test_auth.py -k Benchmarks --benchmark-autosave
+        pytest tests/test_auth.py -k Benchmarks --benchmark-compare --benchmark-compare-fail=mean:100%
+    """
+    
+    def test_bench_is_admin(self, benchmark):
+        from apps.api.auth.models import CurrentUser
+        
+        user = CurrentUser(id="user-1", email="user@test.com", role="user")
+        assert benchmark(user.is_admin) is False
+    
+    def test_bench_can_access_image_public(self, benchmark):
+        from apps.api.auth.models import CurrentUser
+        
+        user = CurrentUser(id="user-1", email="user@test.com", role="user")
+        assert benchmark(user.can_access_image, "user-2", "public") is True
+    
+    def test_bench_can_access_image_private(self, benchmark):
+        from apps.api.auth.models import CurrentUser
+        
+        user = CurrentUser(id="user-1", email="user@test.com", role="user")
+        assert benchmark(user.can_access_image, "user-2", "private") is False
+    
+    def test_bench_can_modify_image(self, benchmark):
+        from apps.api.auth.models import CurrentUser
+        
+        admin = CurrentUser(id="admin-1", email="admin@test.com", role="admin")
+        assert benchmark(admin.can_modify_image, "user-2") is True
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -4,56 +4,60 @@ Tests the complete flow from upload to search with different users.
 """
 import pytest
 import uuid
-from fastapi.testclient import TestClient
-from apps.api.main import app
-from jose import jwt
-import os
-from datetime import datetime, timedelta
-from io import BytesIO
-from PIL import Image
 
-client = TestClient(app)
+from tests.helpers import (
+    UPLOAD_BODIES,
+    UPLOAD_CONTENT_TYPE,
+    create_test_token,
+    encode_test_jpeg,
+    multipart_body,
+)
 
 
-def create_test_token(user_id: str, email: str, role: str = "user") -> str:
-    """Create a test JWT token"""
-    secret = os.getenv("SUPABASE_JWT_SECRET", "test-secret-for-development-only")
-    payload = {
-        "sub": user_id,
-        "email": email,
-        "role": role,
-        "aud": "authenticated",
-        "exp": datetime.utcnow() + timedelta(hours=1),
-        "iat": datetime.utcnow()
-    }
-    return jwt.encode(payload, secret, algorithm="HS256")
+def _upload(client, token: str, visibility: str):
+    """POST TEST_JPEG as the given user; returns the raw response"""
+    return client.post(
+        "/images",
+        content=UPLOAD_BODIES[visibility],
+        headers={**UPLOAD_CONTENT_TYPE, "Authorization": f"Bearer {token}"}
+    )
 
 
-def create_test_image() -> BytesIO:
-    """Create a simple test image"""
-    img = Image.new('RGB', (100, 100), color='red')
-    img_bytes = BytesIO()
-    img.save(img_bytes, format='JPEG')
-    img_bytes.seek(0)
-    return img_bytes
+@pytest.fixture(scope="module")
+def private_upload(client):
+    """One private image owned by a fresh user, shared by tests that leave it private.
+    
+    Returns (image_id, owner_token), or None when the upload pipeline is
+    unavailable (tests then skip their assertions, as they did inline).
+    Image IDs are content hashes, so the image gets a colour no other test
+    uploads; otherwise a public re-upload of TEST_JPEG would take its row over.
+    """
+    token = create_test_token(str(uuid.uuid4()), "owner@example.com")
+    color = tuple(uuid.uuid4().bytes[:3])
+    response = client.post(
+        "/images",
+        content=multipart_body("private", image=encode_test_jpeg(color)),
+        headers={**UPLOAD_CONTENT_TYPE, "Authorization": f"Bearer {token}"}
+    )
+    if response.status_code != 200:
+        return None
+    return response.json()["id"], token
 
 
+# The other uploads all send TEST_JPEG, and image IDs are derived from the
+# content hash, so those tests share rows; keep them on one xdist worker
+# (--dist loadgroup)
+@pytest.mark.xdist_group("e2e")
 class TestMultiTenantE2E:
     """End-to-end tests for multi-tenant scenarios"""
     
-    def test_complete_user_flow(self):
+    def test_complete_user_flow(self, client):
         """Test complete flow: signup -> login -> upload -> view -> search"""
         user_id = str(uuid.uuid4())
         token = create_test_token(user_id, "testuser@example.com")
         
-        # 1. Upload a private image
-        img_bytes = create_test_image()
-        response = client.post(
-            "/images",
-            files={"file": ("test.jpg", img_bytes, "image/jpeg")},
-            data={"visibility": "private"},
-            headers={"Authorization": f"Bearer {token}"}
-        )
+        # 1. Upload a private image (this test deletes it, so it is not shared)
+        response = _upload(client, token, "private")
         
         # Should succeed or fail with infrastructure error (not auth)
         assert response.status_code != 401
@@ -100,24 +104,14 @@ class TestMultiTenantE2E:
             )
             assert response.status_code == 404
     
-    def test_multi_user_isolation(self):
+    def test_multi_user_isolation(self, client, private_upload):
         """Test that users can only see their own private images"""
-        user1_id = str(uuid.uuid4())
         user2_id = str(uuid.uuid4())
-        token1 = create_test_token(user1_id, "user1@example.com")
         token2 = create_test_token(user2_id, "user2@example.com")
         
-        # User 1 uploads a private image
-        img_bytes = create_test_image()
-        response = client.post(
-            "/images",
-            files={"file": ("test.jpg", img_bytes, "image/jpeg")},
-            data={"visibility": "private"},
-            headers={"Authorization": f"Bearer {token1}"}
-        )
-        
-        if response.status_code == 200:
-            image_id = response.json()["id"]
+        # User 1 owns a private image
+        if private_upload:
+            image_id, token1 = private_upload
             
             # User 1 can access their image
             response = client.get(
@@ -133,19 +127,13 @@ class TestMultiTenantE2E:
             )
             assert response.status_code == 403
     
-    def test_public_image_visibility(self):
+    def test_public_image_visibility(self, client):
         """Test that public images are visible to everyone"""
         user_id = str(uuid.uuid4())
         token = create_test_token(user_id, "user@example.com")
         
         # Upload a public image
-        img_bytes = create_test_image()
-        response = client.post(
-            "/images",
-            files={"file": ("test.jpg", img_bytes, "image/jpeg")},
-            data={"visibility": "public"},
-            headers={"Authorization": f"Bearer {token}"}
-        )
+        response = _upload(client, token, "public")
         
         if response.status_code == 200:
             image_id = response.json()["id"]
@@ -169,24 +157,14 @@ class TestMultiTenantE2E:
             )
             assert response.status_code == 200
     
-    def test_admin_access(self):
+    def test_admin_access(self, client, private_upload):
         """Test that admins can access all images"""
-        user_id = str(uuid.uuid4())
         admin_id = str(uuid.uuid4())
-        user_token = create_test_token(user_id, "user@example.com", role="user")
         admin_token = create_test_token(admin_id, "admin@example.com", role="admin")
         
-        # User uploads a private image
-        img_bytes = create_test_image()
-        response = client.post(
-            "/images",
-            files={"file": ("test.jpg", img_bytes, "image/jpeg")},
-            data={"visibility": "private"},
-            headers={"Authorization": f"Bearer {user_token}"}
-        )
-        
-        if response.status_code == 200:
-            image_id = response.json()["id"]
+        # A user owns a private image
+        if private_upload:
+            image_id, _ = private_upload
             
             # Admin can access user's private image
             response = client.get(
@@ -202,8 +180,16 @@ class TestMultiTenantE2E:
                 headers={"Authorization": f"Bearer {admin_token}"}
             )
             assert response.status_code == 200
+            
+            # Put it back so the shared upload stays private
+            response = client.patch(
+                f"/images/{image_id}",
+                json={"visibility": "private"},
+                headers={"Authorization": f"Bearer {admin_token}"}
+            )
+            assert response.status_code == 200
     
-    def test_search_scopes(self):
+    def test_search_scopes(self, client):
         """Test search with different scopes"""
         user_id = str(uuid.uuid4())
         token = create_test_token(user_id, "user@example.com")
@@ -232,7 +218,7 @@ class TestMultiTenantE2E:
         )
         assert response.status_code == 200
     
-    def test_list_images_filtering(self):
+    def test_list_images_filtering(self, client):
         """Test image listing with filters"""
         user_id = str(uuid.uuid4())
         token = create_test_token(user_id, "user@example.com")
@@ -257,7 +243,7 @@ class TestMultiTenantE2E:
         )
         assert response.status_code == 200
     
-    def test_visibility_constraints(self):
+    def test_visibility_constraints(self, client):
         """Test visibility constraints and validation"""
         user_id = str(uuid.uuid4())
         admin_id = str(uuid.uuid4())
@@ -265,42 +251,24 @@ class TestMultiTenantE2E:
         admin_token = create_test_token(admin_id, "admin@example.com", role="admin")
         
         # User cannot create public_admin images
-        img_bytes = create_test_image()
-        response = client.post(
-            "/images",
-            files={"file": ("test.jpg", img_bytes, "image/jpeg")},
-            data={"visibility": "public_admin"},
-            headers={"Authorization": f"Bearer {user_token}"}
-        )
+        response = _upload(client, user_token, "public_admin")
         
         if response.status_code not in [500]:  # Ignore infrastructure errors
             assert response.status_code in [403, 400]
         
         # Admin can create public_admin images
-        img_bytes = create_test_image()
-        response = client.post(
-            "/images",
-            files={"file": ("test.jpg", img_bytes, "image/jpeg")},
-            data={"visibility": "public_admin"},
-            headers={"Authorization": f"Bearer {admin_token}"}
-        )
+        response = _upload(client, admin_token, "public_admin")
         
         # Should succeed or fail with infrastructure error (not permission error)
         assert response.status_code not in [403, 401]
     
-    def test_soft_deletion(self):
+    def test_soft_deletion(self, client):
         """Test that deleted images are properly hidden"""
         user_id = str(uuid.uuid4())
         token = create_test_token(user_id, "user@example.com")
         
         # Upload and delete an image
-        img_bytes = create_test_image()
-        response = client.post(
-            "/images",
-            files={"file": ("test.jpg", img_bytes, "image/jpeg")},
-            data={"visibility": "public"},
-            headers={"Authorization": f"Bearer {token}"}
-        )
+        response = _upload(client, token, "public")
         
         if response.status_code == 200:
             image_id = response.json()["id"]
@@ -312,57 +280,42 @@ class TestMultiTenantE2E:
             )
             assert response.status_code == 200
             
-            # Image should not be accessible
+            # Image should not be accessible; search/list filtering of deleted
+            # rows is covered by the soft-delete tests in test_qdrant_store.py
             response = client.get(f"/images/{image_id}")
             assert response.status_code == 404
-            
-            # Image should not appear in search
-            response = client.get("/search?q=test&scope=public")
-            assert response.status_code == 200
-            results = response.json()["results"]
-            assert image_id not in [r["id"] for r in results]
-            
-            # Image should not appear in list
-            response = client.get("/images?visibility=public")
-            assert response.status_code == 200
-            images = response.json()["images"]
-            assert image_id not in [img["id"] for img in images]
 
 
 class TestSecurityAndValidation:
     """Security and validation tests"""
     
-    def test_invalid_token(self):
+    def test_invalid_token(self, client):
         """Test that invalid tokens are rejected"""
         response = client.post(
             "/images",
-            files={"file": ("test.jpg", create_test_image(), "image/jpeg")},
-            headers={"Authorization": "Bearer invalid-token"}
+            content=UPLOAD_BODIES[None],
+            headers={**UPLOAD_CONTENT_TYPE, "Authorization": "Bearer invalid-token"}
         )
         assert response.status_code == 401
     
-    def test_missing_token(self):
+    def test_missing_token(self, client):
         """Test that protected endpoints require token"""
         response = client.post(
             "/images",
-            files={"file": ("test.jpg", create_test_image(), "image/jpeg")}
+            content=UPLOAD_BODIES[None],
+            headers=UPLOAD_CONTENT_TYPE
         )
         assert response.status_code == 401
     
-    def test_invalid_visibility(self):
+    def test_invalid_visibility(self, client):
         """Test that invalid visibility values are rejected"""
         token = create_test_token(str(uuid.uuid4()), "user@example.com")
-        response = client.post(
-            "/images",
-            files={"file": ("test.jpg", create_test_image(), "image/jpeg")},
-            data={"visibility": "invalid"},
-            headers={"Authorization": f"Bearer {token}"}
-        )
+        response = _upload(client, token, "invalid")
         
         if response.status_code not in [500]:
             assert response.status_code == 400
     
-    def test_invalid_scope(self):
+    def test_invalid_scope(self, client):
         """Test that invalid search scopes are rejected"""
         response = client.get("/search?q=test&scope=invalid")
         assert response.status_code == 400
@@ -3,104 +3,116 @@ Test suite for image storage functionality
 """
 import pytest
 import asyncio
-import httpx
 from pathlib import Path
 import io
 from PIL import Image
 
 
-BASE_URL = "http://localhost:8000"
+# Requests go through the session-scoped `aclient` fixture (tests/conftest.py),
+# which drives the app in-process over ASGITransport; no server on :8000 needed.
 
 
-@pytest.fixture
-def test_image_bytes():
-    """Create a simple test image"""
+def _encode_test_jpeg() -> bytes:
     img = Image.new('RGB', (100, 100), color='red')
     buf = io.BytesIO()
     img.save(buf, format='JPEG')
-    buf.seek(0)
-    return buf.read()
+    return buf.getvalue()
+
+
+# Encoded once per module
+TEST_JPEG_BYTES = _encode_test_jpeg()
+
+
+@pytest.fixture(scope="session")
+def test_image_bytes():
+    """Create a simple test image"""
+    return TEST_JPEG_BYTES
 
 
-@pytest.mark.asyncio
-async def test_upload_and_download(test_image_bytes):
+@pytest.mark.asyncio(loop_scope="session")
+async def test_upload_and_download(aclient, test_image_bytes):
     """Test complete workflow: upload -> retrieve -> download"""
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        # 1. Upload image
-        files = {'file': ('test.jpg', test_image_bytes, 'image/jpeg')}
-        response = await client.post(f"{BASE_URL}/images", files=files)
-        assert response.status_code == 200
-        
-        result = response.json()
-        image_id = result['id']
-        
-        # Verify response includes storage info
-        assert 'download_url' in result
-        assert 'thumbnail_url' in result
-        assert 'width' in result
-        assert 'height' in result
-        assert 'size_bytes' in result
-        assert 'format' in result
-        
-        print(f"✓ Upload successful: {image_id}")
-        print(f"  Caption: {result.get('caption', 'N/A')}")
-        print(f"  Format: {result['format']}")
-        print(f"  Size: {result['width']}x{result['height']}, {result['size_bytes']} bytes")
-        
-        # 2. Get metadata
-        response = await client.get(f"{BASE_URL}/images/{image_id}")
-        assert response.status_code == 200
-        
-        metadata = response.json()
-        assert metadata['id'] == image_id
-        assert 'download_url' in metadata
-        assert 'thumbnail_url' in metadata
-        
-        print(f"✓ Metadata retrieved")
-        
-        # 3. Download original image
-        response = await client.get(f"{BASE_URL}/images/{image_id}/download")
-        assert response.status_code == 200
-        assert response.headers['content-type'].startswith('image/')
-        
-        downloaded_bytes = response.content
-        assert len(downloaded_bytes) > 0
-        
-        # Verify it's a valid image
-        img = Image.open(io.BytesIO(downloaded_bytes))
-        assert img.size[0] > 0
-        assert img.size[1] > 0
-        
-        print(f"✓ Download successful: {len(downloaded_bytes)} bytes")
-        
-        # 4. Download thumbnail
-        response = await client.get(f"{BASE_URL}/images/{image_id}/thumbnail")
-        assert response.status_code == 200
-        assert response.headers['content-type'].startswith('image/')
-        
-        thumb_bytes = response.content
-        assert len(thumb_bytes) > 0
-        
-        # Verify thumbnail is smaller
-        thumb_img = Image.open(io.BytesIO(thumb_bytes))
-        assert max(thumb_img.size) <= 256  # Should be 256 or smaller
-        
-        print(f"✓ Thumbnail downloaded: {thumb_img.size}")
-        
-        print(f"\n✅ All tests passed for image {image_id}")
-
-
-@pytest.mark.asyncio
-async def test_download_nonexistent():
+    # 1. Upload image
+    files = {'file': ('test.jpg', test_image_bytes, 'image/jpeg')}
+    response = await aclient.post("/images", files=files)
+    assert response.status_code == 200
+    
+    result = response.json()
+    image_id = result['id']
+    
+    # Verify response includes storage info
+    assert 'download_url' in result
+    assert 'thumbnail_url' in result
+    assert 'width' in result
+    assert 'height' in result
+    assert 'size_bytes' in result
+    assert 'format' in result
+    
+    print(f"✓ Upload successful: {image_id}")
+    print(f"  Caption: {result.get('caption', 'N/A')}")
+    print(f"  Format: {result['format']}")
+    print(f"  Size: {result['width']}x{result['height']}, {result['size_bytes']} bytes")
+    
+    # 2-4. Metadata, original and thumbnail are independent reads; fetch them together
+    meta_response, download_response, thumb_response = await asyncio.gather(
+        aclient.get(f"/images/{image_id}"),
+        aclient.get(f"/images/{image_id}/download"),
+        aclient.get(f"/images/{image_id}/thumbnail")
+    )
+    
+    # 2. Metadata
+    response = meta_response
+    assert response.status_code == 200
+    
+    metadata = response.json()
+    assert metadata['id'] == image_id
+    assert 'download_url' in metadata
+    assert 'thumbnail_url' in metadata
+    
+    print(f"✓ Metadata retrieved")
+    
+    # 3. Original image
+    response = download_response
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('image/')
+    
+    downloaded_bytes = response.content
+    assert len(downloaded_bytes) > 0
+    
+    # Verify it's a valid image
+    img = Image.open(io.BytesIO(downloaded_bytes))
+    assert img.size[0] > 0
+    assert img.size[1] > 0
+    
+    print(f"✓ Download successful: {len(downloaded_bytes)} bytes")
+    
+    # 4. Thumbnail
+    response = thumb_response
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('image/')
+    
+    thumb_bytes = response.content
+    assert len(thumb_bytes) > 0
+    
+    # Verify thumbnail is smaller
+    thumb_img = Image.open(io.BytesIO(thumb_bytes))
+    assert max(thumb_img.size) <= 256  # Should be 256 or smaller
+    
+    print(f"✓ Thumbnail downloaded: {thumb_img.size}")
+    
+    print(f"\n✅ All tests passed for image {image_id}")
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_download_nonexistent(aclient):
     """Test downloading non-existent image returns 404"""
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(f"{BASE_URL}/images/nonexistent123/download")
-        assert response.status_code == 404
-        
-        response = await client.get(f"{BASE_URL}/images/nonexistent123/thumbnail")
-        assert response.status_code == 404
-        
-        print("✓ 404 handling works correctly")
+    response = await aclient.get("/images/nonexistent123/download")
+    assert response.status_code == 404
+    
+    response = await aclient.get("/images/nonexistent123/thumbnail")
+    assert response.status_code == 404
+    
+    print("✓ 404 handling works correctly")
 
 
 def test_storage_directory_created():
@@ -112,17 +124,4 @@ def test_storage_directory_created():
 
 
 if __name__ == "__main__":
-    print("Running Image Storage Tests...")
-    print("=" * 60)
-    
-    # Run tests
-    asyncio.run(test_upload_and_download(
-        test_image_bytes=Image.new('RGB', (100, 100), color='red')
-    ))
-    
-    asyncio.run(test_download_nonexistent())
-    
-    test_storage_directory_created()
-    
-    print("\n" + "=" * 60)
-    print("All tests completed!")
+    pytest.main([__file__, "-v"])
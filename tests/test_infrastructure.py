@@ -5,13 +5,14 @@ This test runs without requiring any API keys - perfect for CI/CD.
 
 import asyncio
 import sys
-import os
+import traceback
 from pathlib import Path
 
+import pytest
+
 # Set UTF-8 encoding for Windows console
 if sys.platform == 'win32':
     try:
-        os.system('chcp 65001 > nul')
         sys.stdout.reconfigure(encoding='utf-8')
     except:
         pass  # Ignore encoding errors in CI
@@ -28,23 +29,41 @@ from apps.api.services.utils.image_utils import (
 from apps.api.services.cloud_providers.rate_limiter import RateLimiter
 from apps.api.services.cloud_providers.factory import CloudProviderFactory
 from apps.api.services.cloud_providers.mock import MockCloudProvider
+from tests.helpers import print_header
+
+
+# Run as a script, each test reports pass/fail by its return value for the
+# summary; under pytest a failure must raise, or the test would pass
+STANDALONE = __name__ == "__main__"
+
+
+def _encode(size, color) -> bytes:
+    """Encode a solid-colour RGB test image as JPEG"""
+    import io
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new('RGB', size, color=color).save(buf, format='JPEG')
+    return buf.getvalue()
+
+
+# Encoded once at import; the bytes are deterministic
+_BLUE_100 = _encode((100, 100), 'blue')
+_RED_200 = _encode((200, 200), 'red')
+_GREEN_100 = _encode((100, 100), 'green')
+
+
+@pytest.fixture(scope="session")
+def mock_provider():
+    """One MockCloudProvider for the session (its metrics/limiter are singletons anyway)"""
+    return MockCloudProvider()
 
 
 def test_image_utils():
     """Test image utility functions"""
-    print("\n" + "="*60)
-    print("TEST 1: Image Utilities")
-    print("="*60)
+    print_header("TEST 1: Image Utilities")
     
     try:
-        # Create a simple test image
-        from PIL import Image
-        import io
-        
-        img = Image.new('RGB', (100, 100), color='blue')
-        buf = io.BytesIO()
-        img.save(buf, format='JPEG')
-        img_bytes = buf.getvalue()
+        img_bytes = _BLUE_100
         
         print(f"✓ Created test image ({len(img_bytes)} bytes)")
         
@@ -62,6 +81,8 @@ def test_image_utils():
         info = get_image_info(img_bytes)
         assert info['width'] == 100
         assert info['height'] == 100
+        assert get_image_info(img_bytes) == info  # cached by content hash
+        assert get_image_info(img_bytes) is not info  # ...but returned as a copy
         print(f"✓ Image info: {info['width']}x{info['height']}, {info['format']}, {info['size_bytes']} bytes")
         
         print("\n✅ Image utilities test PASSED")
@@ -69,23 +90,24 @@ def test_image_utils():
         
     except Exception as e:
         print(f"\n❌ Image utilities test FAILED: {e}")
-        import traceback
-        traceback.print_exc()
+        traceback.print_exception(e)
+        if not STANDALONE:
+            raise
         return False
 
 
 def test_rate_limiter():
     """Test rate limiter"""
-    print("\n" + "="*60)
-    print("TEST 2: Rate Limiter")
-    print("="*60)
+    print_header("TEST 2: Rate Limiter")
     
     try:
-        # Create rate limiter with low limits for testing
+        # Create rate limiter with low limits for testing, on a fake clock
+        clock = [0.0]
         limiter = RateLimiter(
             max_per_minute=5,
             max_per_day=10,
             daily_budget_usd=0.01,
+            time_fn=lambda: clock[0],
         )
         
         print(f"✓ Rate limiter created with limits: 5/min, 10/day, $0.01/day")
@@ -96,15 +118,19 @@ def test_rate_limiter():
         print(f"✓ Initial check passed")
         
         # Record some requests
-        for i in range(3):
-            limiter.record_request(cost_usd=0.001)
+        limiter.record_requests(3, 0.001)
         print(f"✓ Recorded 3 requests")
         
         # Check stats
         stats = limiter.get_stats()
         print(f"✓ Stats: {stats['requests_last_minute']}/min, {stats['requests_today']}/day, ${stats['cost_today_usd']}")
         assert stats['requests_last_minute'] == 3
-        assert stats['cost_today_usd'] == 0.003
+        assert stats['requests_today'] == 3
+        assert stats['cost_today_usd'] == pytest.approx(0.003)
+        
+        # An empty burst records nothing
+        limiter.record_requests(0, 0.001)
+        assert limiter.get_stats()['requests_today'] == 3
         
         # Test budget limit
         can_proceed, reason = limiter.can_proceed(estimated_cost_usd=0.02)
@@ -112,47 +138,46 @@ def test_rate_limiter():
         print(f"✓ Budget limit works: {reason}")
         
         # Fill up minute limit
-        for i in range(2):
-            limiter.record_request(cost_usd=0.0001)
+        limiter.record_requests(2, 0.0001)
         can_proceed, reason = limiter.can_proceed(estimated_cost_usd=0.0001)
         assert not can_proceed, "Should block due to per-minute limit"
         print(f"✓ Per-minute limit works: {reason}")
         
+        # Advance past the one-minute window without sleeping
+        clock[0] += 61
+        can_proceed, reason = limiter.can_proceed(estimated_cost_usd=0.0001)
+        assert can_proceed, f"Minute window should have rolled over: {reason}"
+        stats = limiter.get_stats()
+        assert stats['requests_last_minute'] == 0
+        assert stats['requests_today'] == 5
+        print(f"✓ Per-minute window rolls over")
+        
         print("\n✅ Rate limiter test PASSED")
         return True
         
     except Exception as e:
         print(f"\n❌ Rate limiter test FAILED: {e}")
-        import traceback
-        traceback.print_exc()
+        traceback.print_exception(e)
+        if not STANDALONE:
+            raise
         return False
 
 
-async def test_mock_provider():
+async def test_mock_provider(mock_provider):
     """Test mock cloud provider"""
-    print("\n" + "="*60)
-    print("TEST 3: Mock Cloud Provider")
-    print("="*60)
+    print_header("TEST 3: Mock Cloud Provider")
     
     try:
-        # Create test image
-        from PIL import Image
-        import io
-        
-        img = Image.new('RGB', (200, 200), color='red')
-        buf = io.BytesIO()
-        img.save(buf, format='JPEG')
-        img_bytes = buf.getvalue()
+        img_bytes = _RED_200
         
         print(f"✓ Created test image ({len(img_bytes)} bytes)")
         
-        # Create mock provider
-        provider = MockCloudProvider()
+        provider = mock_provider
         assert provider.health_check()
         print(f"✓ Mock provider created and healthy")
         
         # Test caption generation
-        print("⏳ Generating caption (this takes 1-3 seconds to simulate API latency)...")
+        print("⏳ Generating caption (simulated API latency, 1-3 seconds unless MOCK_PROVIDER_LATENCY_MS is set)...")
         response = await provider.caption(img_bytes)
         
         assert response.caption is not None
@@ -173,16 +198,15 @@ async def test_mock_provider():
         
     except Exception as e:
         print(f"\n❌ Mock provider test FAILED: {e}")
-        import traceback
-        traceback.print_exc()
+        traceback.print_exception(e)
+        if not STANDALONE:
+            raise
         return False
 
 
 async def test_factory():
     """Test cloud provider factory"""
-    print("\n" + "="*60)
-    print("TEST 4: Cloud Provider Factory")
-    print("="*60)
+    print_header("TEST 4: Cloud Provider Factory")
     
     try:
         # List providers
@@ -199,13 +223,7 @@ async def test_factory():
         print(f"✓ Created mock provider via factory")
         
         # Test it works
-        from PIL import Image
-        import io
-        
-        img = Image.new('RGB', (100, 100), color='green')
-        buf = io.BytesIO()
-        img.save(buf, format='JPEG')
-        img_bytes = buf.getvalue()
+        img_bytes = _GREEN_100
         
         print("⏳ Testing factory-created provider...")
         response = await provider.caption(img_bytes)
@@ -217,16 +235,15 @@ async def test_factory():
         
     except Exception as e:
         print(f"\n❌ Factory test FAILED: {e}")
-        import traceback
-        traceback.print_exc()
+        traceback.print_exception(e)
+        if not STANDALONE:
+            raise
         return False
 
 
 async def main():
     """Run all tests"""
-    print("\n" + "="*60)
-    print("INFRASTRUCTURE TESTS (CI/CD Safe)")
-    print("="*60)
+    print_header("INFRASTRUCTURE TESTS (CI/CD Safe)")
     print("\nTesting core infrastructure without API keys...")
     
     results = []
@@ -234,13 +251,11 @@ async def main():
     # Run tests
     results.append(("Image Utilities", test_image_utils()))
     results.append(("Rate Limiter", test_rate_limiter()))
-    results.append(("Mock Provider", await test_mock_provider()))
+    results.append(("Mock Provider", await test_mock_provider(MockCloudProvider())))
     results.append(("Provider Factory", await test_factory()))
     
     # Summary
-    print("\n" + "="*60)
-    print("TEST SUMMARY")
-    print("="*60)
+    print_header("TEST SUMMARY")
     
     passed = sum(1 for _, result in results if result)
     total = len(results)
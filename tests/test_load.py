@@ -6,17 +6,18 @@ Safe for CI/CD - uses mock provider, no API keys required.
 
 import asyncio
 import sys
+import traceback
 import os
 import time
 from pathlib import Path
 from collections import defaultdict
+from functools import lru_cache
 from PIL import Image
 import io
 
 # Set UTF-8 encoding for Windows console
 if sys.platform == 'win32':
     try:
-        os.system('chcp 65001 > nul')
         sys.stdout.reconfigure(encoding='utf-8')
     except:
         pass  # Ignore encoding errors in CI
@@ -28,75 +29,126 @@ sys.path.insert(0, str(project_root))
 from apps.api.services.cloud_providers.factory import CloudProviderFactory
 from apps.api.services.cloud_providers.rate_limiter import get_rate_limiter
 from apps.api.services.cloud_providers.circuit_breaker import get_circuit_breaker
+from tests.helpers import print_header
 
+import pytest
 
-def create_test_images(count=10, colors=None) -> list[bytes]:
-    """Create multiple test images"""
-    if colors is None:
-        colors = ['red', 'blue', 'green', 'yellow', 'purple', 'orange', 'pink', 'cyan']
+
+# Run as a script, each test reports pass/fail by its return value for the
+# summary; under pytest a failure must raise, or the test would pass
+STANDALONE = __name__ == "__main__"
+
+
+# Max in-flight caption calls in the concurrency test
+CONCURRENCY = int(os.getenv("LOAD_TEST_CONCURRENCY", 16))
+
+
+DEFAULT_COLORS = ('red', 'blue', 'green', 'yellow', 'purple', 'orange', 'pink', 'cyan')
+
+
+@lru_cache(maxsize=None)
+def _encode_jpeg(size, color) -> bytes:
+    img = Image.new('RGB', size, color=color)
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG')
+    return buf.getvalue()
+
+
+# The mock provider never decodes the image, so one payload serves every request
+_CACHED_JPEG = _encode_jpeg((100, 100), 'red')
+
+
+def create_test_images(count=10, colors=None, unique=False) -> list[bytes]:
+    """Create multiple test images
     
-    images = []
-    for i in range(count):
-        color = colors[i % len(colors)]
-        img = Image.new('RGB', (100 + i*10, 100 + i*10), color=color)
-        buf = io.BytesIO()
-        img.save(buf, format='JPEG')
-        images.append(buf.getvalue())
+    By default returns `count` references to one cached JPEG. Pass unique=True
+    for distinct images (varying size and colour) when the bytes must differ;
+    each (size, colour) is encoded at most once per run.
+    """
+    if not unique:
+        return [_CACHED_JPEG] * count
     
-    return images
+    colors = colors or DEFAULT_COLORS
+    return [
+        _encode_jpeg((100 + i*10, 100 + i*10), colors[i % len(colors)])
+        for i in range(count)
+    ]
+
+
+# Built once; the tests take slices of these
+TEST_IMAGES = create_test_images(15)
+
+
+@pytest.fixture(scope="module")
+def images():
+    return TEST_IMAGES
+
+
+@pytest.fixture(scope="module")
+def provider():
+    """One mock provider shared by the load tests"""
+    return CloudProviderFactory.create("mock")
 
 
-async def test_rate_limiter_under_load():
+async def test_rate_limiter_under_load(provider, images):
     """Test rate limiter behavior under sustained load"""
-    print("\n" + "="*60)
-    print("TEST 1: Rate Limiter Under Load")
-    print("="*60)
+    print_header("TEST 1: Rate Limiter Under Load")
+    
+    # The provider shares this singleton; restore it afterwards so later tests
+    # are not left behind a full 10/min window
+    rate_limiter = get_rate_limiter()
+    saved_limits = (rate_limiter.max_per_minute, rate_limiter.max_per_day, rate_limiter.daily_budget_usd)
     
     try:
-        # Use mock provider to avoid API costs
-        os.environ["CLOUD_PROVIDER"] = "mock"
-        provider = CloudProviderFactory.create()
-        
         # Reset rate limiter with low limits for testing
-        rate_limiter = get_rate_limiter()
         rate_limiter.max_per_minute = 10
         rate_limiter.max_per_day = 50
         rate_limiter.daily_budget_usd = 1.0
         rate_limiter.minute_requests.clear()
-        rate_limiter.daily_requests = []
+        rate_limiter.daily_requests.clear()
         rate_limiter.daily_cost = 0.0
         
         print(f"✓ Rate limiter configured: 10/min, 50/day, $1.00/day budget")
         
-        # Create test images
-        images = create_test_images(15)
-        print(f"✓ Created {len(images)} test images")
+        print(f"✓ Using {len(images)} test images")
         
-        # Send requests rapidly
+        # Send requests rapidly, a few in flight at once
         print("\n⏳ Sending 15 requests rapidly...")
-        start = time.time()
-        
-        success_count = 0
-        rate_limited_count = 0
-        
-        for i, img_bytes in enumerate(images):
-            try:
-                # Check if we can proceed
-                can_proceed, reason = rate_limiter.can_proceed(estimated_cost_usd=0.0001)
-                
-                if can_proceed:
+        start = time.perf_counter()
+        
+        sem = asyncio.Semaphore(5)
+        # Per-request lines are collected and printed after the timed window
+        log = [None] * len(images)
+        
+        async def one(i, img_bytes):
+            async with sem:
+                try:
+                    # Check if we can proceed
+                    can_proceed, reason = rate_limiter.can_proceed(estimated_cost_usd=0.0001)
+                    if not can_proceed:
+                        log[i] = f"  Request {i+1}: ⊘ Rate limited - {reason}"
+                        return "limited"
+                    
                     response = await provider.caption(img_bytes)
                     rate_limiter.record_request(response.cost_usd)
-                    success_count += 1
-                    print(f"  Request {i+1}: ✓ Success")
-                else:
-                    rate_limited_count += 1
-                    print(f"  Request {i+1}: ⊘ Rate limited - {reason}")
-            
-            except Exception as e:
-                print(f"  Request {i+1}: ✗ Error - {e}")
-        
-        elapsed = time.time() - start
+                    log[i] = f"  Request {i+1}: ✓ Success"
+                    return "success"
+                
+                except Exception as e:
+                    # Concurrent tasks can fill the window between our check and
+                    # the provider's own; that is still the limiter doing its job
+                    if str(e).startswith("Rate limit exceeded"):
+                        log[i] = f"  Request {i+1}: ⊘ Rate limited by provider - {e}"
+                        return "limited"
+                    log[i] = f"  Request {i+1}: ✗ Error - {e}"
+                    return "error"
+        
+        outcomes = await asyncio.gather(*[one(i, b) for i, b in enumerate(images)], return_exceptions=True)
+        elapsed = time.perf_counter() - start
+        
+        sys.stdout.write("\n".join(filter(None, log)) + "\n")
+        success_count = outcomes.count("success")
+        rate_limited_count = outcomes.count("limited")
         
         # Get final stats
         stats = rate_limiter.get_stats()
@@ -106,10 +158,7 @@ async def test_rate_limiter_under_load():
         print(f"  Successful: {success_count}")
         print(f"  Rate limited: {rate_limited_count}")
         print(f"  Time elapsed: {elapsed:.2f}s")
-        if elapsed > 0:
-            print(f"  Throughput: {success_count / elapsed:.2f} req/sec")
-        else:
-            print(f"  Throughput: N/A (too fast)")
+        print(f"  Throughput: {success_count / elapsed:.2f} req/sec")
         print(f"\n  Rate limiter stats:")
         print(f"    Requests in last minute: {stats['requests_last_minute']}")
         print(f"    Requests today: {stats['requests_today']}")
@@ -126,22 +175,28 @@ async def test_rate_limiter_under_load():
         
     except Exception as e:
         print(f"\n❌ Rate limiter test FAILED: {e}")
-        import traceback
-        traceback.print_exc()
+        traceback.print_exception(e)
+        if not STANDALONE:
+            raise
         return False
+    
+    finally:
+        rate_limiter.max_per_minute, rate_limiter.max_per_day, rate_limiter.daily_budget_usd = saved_limits
+        rate_limiter.minute_requests.clear()
+        rate_limiter.daily_requests.clear()
+        rate_limiter.daily_cost = 0.0
 
 
 async def test_circuit_breaker_under_load():
     """Test circuit breaker with simulated failures"""
-    print("\n" + "="*60)
-    print("TEST 2: Circuit Breaker Under Load")
-    print("="*60)
+    print_header("TEST 2: Circuit Breaker Under Load")
     
     try:
         from apps.api.services.cloud_providers.circuit_breaker import CircuitBreaker
         
-        # Create new circuit breaker for testing
-        cb = CircuitBreaker(failure_threshold=3, timeout_seconds=3)
+        # Create new circuit breaker for testing, on a fake clock
+        clock = [time.time()]
+        cb = CircuitBreaker(failure_threshold=3, timeout_seconds=3, time_fn=lambda: clock[0])
         print(f"✓ Circuit breaker created (threshold=3, timeout=3s)")
         
         # Simulate mixed success/failure pattern
@@ -187,12 +242,17 @@ async def test_circuit_breaker_under_load():
         print(f"  Blocked: {blocked_count}")
         print(f"  Final state: {cb.state.value}")
         
-        # Wait for timeout
-        print(f"\n⏳ Waiting 3 seconds for circuit to recover...")
-        await asyncio.sleep(3)
+        # Advance past the timeout instead of sleeping through it
+        print(f"\n⏳ Advancing clock 4 seconds for circuit to recover...")
+        clock[0] += 4
         
-        can_proceed, _ = cb.can_proceed()
-        print(f"✓ After timeout, can proceed: {can_proceed} (state: {cb.state.value})")
+        # A herd of callers arrives as the breaker half-opens; exactly one
+        # may be admitted as the recovery probe
+        probes = await asyncio.gather(*[asyncio.to_thread(cb.can_proceed) for _ in range(50)])
+        admitted = sum(1 for ok, _ in probes if ok)
+        print(f"✓ After timeout, {admitted}/{len(probes)} concurrent callers admitted (state: {cb.state.value})")
+        assert admitted == 1, f"Half-open should admit exactly one probe, admitted {admitted}"
+        can_proceed = admitted == 1
         
         # Simulate recovery
         if can_proceed:
@@ -207,42 +267,48 @@ async def test_circuit_breaker_under_load():
         
     except Exception as e:
         print(f"\n❌ Circuit breaker test FAILED: {e}")
-        import traceback
-        traceback.print_exc()
+        traceback.print_exception(e)
+        if not STANDALONE:
+            raise
         return False
 
 
-async def test_concurrent_requests():
+async def test_concurrent_requests(provider, images):
     """Test handling concurrent requests"""
-    print("\n" + "="*60)
-    print("TEST 3: Concurrent Request Handling")
-    print("="*60)
+    print_header("TEST 3: Concurrent Request Handling")
     
     try:
-        os.environ["CLOUD_PROVIDER"] = "mock"
-        
-        # Create test images
-        images = create_test_images(5)
-        print(f"✓ Created {len(images)} test images")
+        images = images[:5]
+        print(f"✓ Using {len(images)} test images")
         
         print("\n⏳ Sending 5 concurrent requests...")
-        start = time.time()
+        start = time.perf_counter()
+        
+        # One provider shared by all tasks; the semaphore bounds in-flight calls
+        sem = asyncio.Semaphore(CONCURRENCY)
         
-        # Create provider for each task (simulates real usage)
         async def caption_task(img_bytes, task_id):
-            provider = CloudProviderFactory.create()
-            response = await provider.caption(img_bytes)
-            return (task_id, response)
+            # Failures are returned, not raised, so one error doesn't make the
+            # TaskGroup cancel the other requests
+            async with sem:
+                try:
+                    return (task_id, await provider.caption(img_bytes))
+                except Exception as e:
+                    return e
         
         # Run concurrently
-        tasks = [caption_task(img, i+1) for i, img in enumerate(images)]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(caption_task(img, i+1)) for i, img in enumerate(images)]
+        results = [t.result() for t in tasks]
         
-        elapsed = time.time() - start
+        elapsed = time.perf_counter() - start
         
         # Analyze results
-        success_count = sum(1 for r in results if not isinstance(r, Exception))
-        error_count = sum(1 for r in results if isinstance(r, Exception))
+        error_count = 0
+        for r in results:
+            if isinstance(r, Exception):
+                error_count += 1
+        success_count = len(results) - error_count
         
         print(f"\n📊 Results:")
         print(f"  Total tasks: {len(images)}")
@@ -265,24 +331,20 @@ async def test_concurrent_requests():
         
     except Exception as e:
         print(f"\n❌ Concurrent request test FAILED: {e}")
-        import traceback
-        traceback.print_exc()
+        traceback.print_exception(e)
+        if not STANDALONE:
+            raise
         return False
 
 
-async def test_error_recovery():
+async def test_error_recovery(provider, images):
     """Test error handling and recovery"""
-    print("\n" + "="*60)
-    print("TEST 4: Error Handling and Recovery")
-    print("="*60)
+    print_header("TEST 4: Error Handling and Recovery")
     
     try:
         # Test with invalid image data
         print("⏳ Testing with invalid image data...")
         
-        os.environ["CLOUD_PROVIDER"] = "mock"
-        provider = CloudProviderFactory.create()
-        
         invalid_data = b"not an image"
         
         try:
@@ -293,7 +355,7 @@ async def test_error_recovery():
         
         # Test with valid image after error
         print("\n⏳ Testing recovery with valid image...")
-        valid_image = create_test_images(1)[0]
+        valid_image = images[0]
         
         try:
             response = await provider.caption(valid_image)
@@ -310,31 +372,38 @@ async def test_error_recovery():
         
     except Exception as e:
         print(f"\n❌ Error recovery test FAILED: {e}")
-        import traceback
-        traceback.print_exc()
+        traceback.print_exception(e)
+        if not STANDALONE:
+            raise
         return False
 
 
 async def main():
     """Run all load tests"""
-    print("\n" + "="*60)
-    print("LOAD TESTING & VALIDATION (CI/CD Safe)")
-    print("="*60)
+    print_header("LOAD TESTING & VALIDATION (CI/CD Safe)")
     print("\nTesting rate limiting, circuit breaker, and concurrency...")
     print("Uses mock provider - no API keys required\n")
     
     results = []
     
-    # Run tests
-    results.append(("Rate Limiter Under Load", await test_rate_limiter_under_load()))
+    # Shared setup, built once for every test
+    provider = CloudProviderFactory.create("mock")
+    images = TEST_IMAGES
+    
+    # Rate limiter and circuit breaker tests poke global state; run them in turn
+    results.append(("Rate Limiter Under Load", await test_rate_limiter_under_load(provider, images)))
     results.append(("Circuit Breaker Under Load", await test_circuit_breaker_under_load()))
-    results.append(("Concurrent Requests", await test_concurrent_requests()))
-    results.append(("Error Recovery", await test_error_recovery()))
+    
+    # The remaining two only issue captions, so they can overlap
+    concurrent_ok, recovery_ok = await asyncio.gather(
+        test_concurrent_requests(provider, images),
+        test_error_recovery(provider, images),
+    )
+    results.append(("Concurrent Requests", concurrent_ok))
+    results.append(("Error Recovery", recovery_ok))
     
     # Summary
-    print("\n" + "="*60)
-    print("TEST SUMMARY")
-    print("="*60)
+    print_header("TEST SUMMARY")
     
     passed = sum(1 for _, result in results if result)
     total = len(results)
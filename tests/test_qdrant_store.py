@@ -1,7 +1,10 @@
 """
 Tests for QdrantStore multi-tenant functionality (Phase 4).
 """
+import asyncio
+import itertools
 import pytest
+import pytest_asyncio
 import numpy as np
 import uuid
 from apps.api.storage.qdrant_store import QdrantStore
@@ -19,24 +22,39 @@ def generate_uuid():
     return str(uuid.uuid4())
 
 
-@pytest.fixture
-def qdrant_store():
-    """Create a test Qdrant store with a test collection"""
+@pytest.fixture(scope="session")
+def qdrant_client():
+    """One pooled client (gRPC unless told otherwise) for the whole session"""
+    client = QdrantClient(
+        url=os.getenv("QDRANT_URL", "http://localhost:6333"),
+        prefer_grpc=os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true",
+        timeout=30
+    )
+    yield client
+    client.close()
+
+
+@pytest.fixture(scope="session")
+def qdrant_collection_store(qdrant_client):
+    """Create the test collection once per session and point the store at it"""
     # Override collection name for testing
     original_coll = os.environ.get("QDRANT_COLLECTION")
     
-    # Create store
-    store = QdrantStore()
+    # Create store on the shared client
+    store = QdrantStore(client=qdrant_client)
     
-    # Recreate collection for clean tests
+    # Recreate collection for a clean session
     try:
         store.client.delete_collection(TEST_COLLECTION)
     except Exception:
         pass
     
+    # Indexing off: test data is tiny and searched by exact full scan, so
+    # HNSW builds would be pure optimizer overhead
     store.client.recreate_collection(
         collection_name=TEST_COLLECTION,
-        vectors_config=qm.VectorParams(size=512, distance=qm.Distance.COSINE)
+        vectors_config=qm.VectorParams(size=512, distance=qm.Distance.COSINE),
+        optimizers_config=qm.OptimizersConfigDiff(indexing_threshold=0)
     )
     
     # Override collection name in store
@@ -58,91 +76,145 @@ def qdrant_store():
         os.environ["QDRANT_COLLECTION"] = original_coll
 
 
+@pytest.fixture
+def qdrant_store(qdrant_collection_store):
+    """The session store with every point purged, so each test starts empty"""
+    qdrant_collection_store.client.delete(
+        collection_name=TEST_COLLECTION,
+        points_selector=qm.FilterSelector(filter=qm.Filter(must=[])),
+        wait=True
+    )
+    return qdrant_collection_store
+
+
+# Random vectors built once and handed out round-robin; the tests check
+# filtering, not similarity, so reuse across tests is harmless
+_VECTOR_POOL = np.random.rand(32, 512).astype(np.float32)
+_vector_ids = itertools.count()
+
+
 def create_test_vector():
-    """Create a random test vector"""
-    return np.random.rand(512).tolist()
+    """Return a random float32 test vector (a row view) from the shared pool"""
+    return _VECTOR_POOL[next(_vector_ids) % len(_VECTOR_POOL)]
+
+
+def seed_bulk(store, records):
+    """Load (caption, owner_user_id, visibility[, deleted]) records in one batched upload.
+    
+    Skips upsert_image, so the payload mirrors the fields it writes; the
+    upsert tests below still cover that code path. Records flagged deleted
+    are stored already soft-deleted. Returns the point ids.
+    """
+    now = datetime.utcnow().isoformat()
+    ids = [generate_uuid() for _ in records]
+    payloads = []
+    for caption, owner_user_id, visibility, *deleted in records:
+        payloads.append({
+            "caption": caption,
+            "confidence": 0.9,
+            "origin": "local",
+            "owner_user_id": owner_user_id,
+            "visibility": visibility,
+            "deleted_at": now if deleted and deleted[0] else None,
+            "created_at": now,
+            "updated_at": now,
+        })
+    store.client.upload_collection(
+        collection_name=TEST_COLLECTION,
+        vectors=np.random.rand(len(records), 512),
+        payload=payloads,
+        ids=ids,
+        batch_size=64,
+        wait=True
+    )
+    return ids
+
+
+def search_ids(store, query_vec, k, user_id=None, scope="all"):
+    """Search with the store's access filter, returning point ids only"""
+    response = store.client.query_points(
+        collection_name=TEST_COLLECTION,
+        query=query_vec,
+        query_filter=store._search_filter(user_id, scope),
+        limit=k,
+        with_payload=False,
+        with_vectors=False
+    )
+    return [p.id for p in response.points]
+
+
+# upsert_image keyword arguments per case; every field must read back as-is
+UPSERT_CASES = {
+    "owner_and_visibility": dict(
+        caption="Test image",
+        caption_confidence=0.95,
+        caption_origin="local",
+        owner_user_id="user-123",
+        visibility="private"
+    ),
+    "public_image": dict(
+        caption="Public image",
+        caption_confidence=0.90,
+        caption_origin="cloud",
+        owner_user_id="user-456",
+        visibility="public"
+    ),
+    "storage_fields": dict(
+        caption="Image with metadata",
+        caption_confidence=0.88,
+        caption_origin="local",
+        file_path="/path/to/image.jpg",
+        format="jpeg",
+        size_bytes=123456,
+        width=1920,
+        height=1080,
+        thumbnail_path="/path/to/thumb.jpg",
+        owner_user_id="user-789",
+        visibility="private"
+    ),
+}
+
+# upsert_image arguments stored under a different payload key
+PAYLOAD_KEYS = {"caption_confidence": "confidence", "caption_origin": "origin"}
 
 
 class TestQdrantUpsert:
     """Test upsert_image with multi-tenant fields"""
     
-    @pytest.mark.asyncio
-    async def test_upsert_with_owner_and_visibility(self, qdrant_store):
-        """Test upserting image with owner and visibility"""
-        image_id = generate_uuid()
-        vector = create_test_vector()
-        
-        await qdrant_store.upsert_image(
-            image_id=image_id,
-            caption="Test image",
-            caption_confidence=0.95,
-            caption_origin="local",
-            img_vec=vector,
-            payload={},
-            owner_user_id="user-123",
-            visibility="private"
-        )
-        
-        # Fetch and verify
-        result = await qdrant_store.fetch_image(image_id)
+    @pytest_asyncio.fixture(scope="class", loop_scope="class")
+    async def upserted(self, qdrant_collection_store):
+        """Upsert every case together, then fetch them back in one retrieve"""
+        store = qdrant_collection_store
+        ids = {name: generate_uuid() for name in UPSERT_CASES}
+        await asyncio.gather(*(
+            store.upsert_image(
+                image_id=ids[name],
+                img_vec=create_test_vector(),
+                payload={},
+                **kwargs
+            )
+            for name, kwargs in UPSERT_CASES.items()
+        ))
+        fetched = await store.fetch_images([ids[name] for name in UPSERT_CASES])
+        return dict(zip(UPSERT_CASES, fetched))
+    
+    @pytest.mark.parametrize("case", list(UPSERT_CASES))
+    def test_upsert_fields(self, upserted, case):
+        """Test upserted fields, multi-tenant defaults and timestamps read back"""
+        result = upserted[case]
         assert result is not None
-        assert result["caption"] == "Test image"
-        assert result["owner_user_id"] == "user-123"
-        assert result["visibility"] == "private"
+        for arg, value in UPSERT_CASES[case].items():
+            assert result[PAYLOAD_KEYS.get(arg, arg)] == value
         assert result["deleted_at"] is None
         assert "created_at" in result
         assert "updated_at" in result
     
     @pytest.mark.asyncio
-    async def test_upsert_public_image(self, qdrant_store):
-        """Test upserting public image"""
-        image_id = generate_uuid()
-        vector = create_test_vector()
-        
-        await qdrant_store.upsert_image(
-            image_id=image_id,
-            caption="Public image",
-            caption_confidence=0.90,
-            caption_origin="cloud",
-            img_vec=vector,
-            payload={},
-            owner_user_id="user-456",
-            visibility="public"
-        )
-        
-        result = await qdrant_store.fetch_image(image_id)
-        assert result["visibility"] == "public"
-        assert result["owner_user_id"] == "user-456"
-    
-    @pytest.mark.asyncio
-    async def test_upsert_with_storage_fields(self, qdrant_store):
-        """Test upserting with storage metadata"""
-        image_id = generate_uuid()
-        vector = create_test_vector()
-        
-        await qdrant_store.upsert_image(
-            image_id=image_id,
-            caption="Image with metadata",
-            caption_confidence=0.88,
-            caption_origin="local",
-            img_vec=vector,
-            payload={},
-            file_path="/path/to/image.jpg",
-            format="jpeg",
-            size_bytes=123456,
-            width=1920,
-            height=1080,
-            thumbnail_path="/path/to/thumb.jpg",
-            owner_user_id="user-789",
-            visibility="private"
-        )
-        
-        result = await qdrant_store.fetch_image(image_id)
-        assert result["file_path"] == "/path/to/image.jpg"
-        assert result["format"] == "jpeg"
-        assert result["size_bytes"] == 123456
-        assert result["width"] == 1920
-        assert result["height"] == 1080
+    async def test_fetch_images_order_and_missing(self, qdrant_collection_store, upserted):
+        """Test fetch_images keeps request order and returns None for unknown IDs"""
+        image = upserted["public_image"]
+        fetched = await qdrant_collection_store.fetch_images([generate_uuid(), image["id"]])
+        assert fetched == [None, image]
 
 
 class TestQdrantSearch:
@@ -151,153 +223,70 @@ class TestQdrantSearch:
     @pytest.fixture
     async def populated_store(self, qdrant_store):
         """Create a store with test data"""
-        # User 1's private images
-        for i in range(3):
-            await qdrant_store.upsert_image(
-                image_id=generate_uuid(),
-                caption=f"User 1 private image {i}",
-                caption_confidence=0.9,
-                caption_origin="local",
-                img_vec=create_test_vector(),
-                payload={},
-                owner_user_id="user-1",
-                visibility="private"
-            )
-        
-        # User 1's public images
-        for i in range(2):
-            await qdrant_store.upsert_image(
-                image_id=generate_uuid(),
-                caption=f"User 1 public image {i}",
-                caption_confidence=0.9,
-                caption_origin="local",
-                img_vec=create_test_vector(),
-                payload={},
-                owner_user_id="user-1",
-                visibility="public"
-            )
-        
-        # User 2's private images
-        for i in range(2):
-            await qdrant_store.upsert_image(
-                image_id=generate_uuid(),
-                caption=f"User 2 private image {i}",
-                caption_confidence=0.9,
-                caption_origin="local",
-                img_vec=create_test_vector(),
-                payload={},
-                owner_user_id="user-2",
-                visibility="private"
-            )
-        
-        # Public admin images
-        for i in range(2):
-            await qdrant_store.upsert_image(
-                image_id=generate_uuid(),
-                caption=f"Admin public image {i}",
-                caption_confidence=0.9,
-                caption_origin="local",
-                img_vec=create_test_vector(),
-                payload={},
-                owner_user_id="admin-user",
-                visibility="public_admin"
-            )
-        
-        # Deleted image
-        deleted_id = generate_uuid()
-        await qdrant_store.upsert_image(
-            image_id=deleted_id,
-            caption="Deleted image",
-            caption_confidence=0.9,
-            caption_origin="local",
-            img_vec=create_test_vector(),
-            payload={},
-            owner_user_id="user-1",
-            visibility="public"
+        records = (
+            # User 1's private images
+            [(f"User 1 private image {i}", "user-1", "private") for i in range(3)]
+            # User 1's public images
+            + [(f"User 1 public image {i}", "user-1", "public") for i in range(2)]
+            # User 2's private images
+            + [(f"User 2 private image {i}", "user-2", "private") for i in range(2)]
+            # Public admin images
+            + [(f"Admin public image {i}", "admin-user", "public_admin") for i in range(2)]
+            # Deleted image, stored soft-deleted (test_soft_delete covers the API)
+            + [("Deleted image", "user-1", "public", True)]
         )
-        await qdrant_store.soft_delete_image(deleted_id)
+        deleted_id = seed_bulk(qdrant_store, records)[-1]
         
         # Store deleted_id for later verification
         qdrant_store._test_deleted_id = deleted_id
         return qdrant_store
     
     @pytest.mark.asyncio
-    async def test_anonymous_search_public_only(self, populated_store):
-        """Test anonymous users only see public images"""
-        query_vec = create_test_vector()
-        results = await populated_store.search(
-            query_vec=query_vec,
-            k=20,
-            user_id=None,
-            scope="public"
+    async def test_search_scopes(self, populated_store):
+        """Test every search scope's filter with one batched round-trip"""
+        cases = [
+            (None, "public"),      # anonymous
+            ("user-1", "mine"),
+            ("user-1", "all"),
+        ]
+        responses = populated_store.client.query_batch_points(
+            collection_name=TEST_COLLECTION,
+            requests=[
+                qm.QueryRequest(
+                    query=create_test_vector(),
+                    filter=populated_store._search_filter(user_id, scope),
+                    limit=20,
+                    with_payload=True
+                )
+                for user_id, scope in cases
+            ]
         )
-        
-        # Should get 2 user1-public + 2 admin-public = 4 images
-        # (deleted image should be excluded)
-        assert len(results) == 4
-        
-        # Verify no private images
-        for result in results:
-            assert result["visibility"] in ["public", "public_admin"]
-    
-    @pytest.mark.asyncio
-    async def test_user_search_mine_scope(self, populated_store):
-        """Test user searching only their images"""
-        query_vec = create_test_vector()
-        results = await populated_store.search(
-            query_vec=query_vec,
-            k=20,
-            user_id="user-1",
-            scope="mine"
+        anonymous, mine, everything = (
+            [{"id": p.id, **(p.payload or {})} for p in response.points]
+            for response in responses
         )
         
-        # Should get 3 private + 2 public = 5 images from user-1
-        # (deleted image should be excluded)
-        assert len(results) == 5
+        # Anonymous users only see public images:
+        # 2 user1-public + 2 admin-public = 4 (deleted image excluded)
+        assert len(anonymous) == 4
+        for result in anonymous:
+            assert result["visibility"] in ["public", "public_admin"]
         
-        # Verify all belong to user-1
-        for result in results:
+        # "mine" is only the user's images: 3 private + 2 public = 5
+        assert len(mine) == 5
+        for result in mine:
             assert result["owner_user_id"] == "user-1"
-    
-    @pytest.mark.asyncio
-    async def test_user_search_all_scope(self, populated_store):
-        """Test user searching all accessible images"""
-        query_vec = create_test_vector()
-        results = await populated_store.search(
-            query_vec=query_vec,
-            k=20,
-            user_id="user-1",
-            scope="all"
-        )
-        
-        # Should get:
-        # - User 1's images: 3 private + 2 public = 5
-        # - Other public: 2 admin-public = 2
-        # Total: 7 images (deleted excluded)
-        assert len(results) == 7
         
-        # Verify access rules
-        for result in results:
+        # "all" is the user's 5 images + 2 admin-public = 7
+        assert len(everything) == 7
+        for result in everything:
             is_own = result["owner_user_id"] == "user-1"
             is_public = result["visibility"] in ["public", "public_admin"]
             assert is_own or is_public
-    
-    @pytest.mark.asyncio
-    async def test_search_excludes_deleted(self, populated_store):
-        """Test that deleted images are excluded from search"""
-        query_vec = create_test_vector()
         
-        # Search as owner
-        results = await populated_store.search(
-            query_vec=query_vec,
-            k=20,
-            user_id="user-1",
-            scope="mine"
-        )
-        
-        # Verify deleted image not in results
-        image_ids = [r["id"] for r in results]
-        assert populated_store._test_deleted_id not in image_ids
+        # Deleted images are excluded from every scope
+        for results in (anonymous, mine, everything):
+            assert populated_store._test_deleted_id not in [r["id"] for r in results]
 
 
 class TestQdrantUpdate:
@@ -372,31 +361,12 @@ class TestQdrantList:
     @pytest.fixture
     async def list_test_store(self, qdrant_store):
         """Create store with test data for listing"""
-        # Create 5 public images
-        for i in range(5):
-            await qdrant_store.upsert_image(
-                image_id=generate_uuid(),
-                caption=f"Public image {i}",
-                caption_confidence=0.9,
-                caption_origin="local",
-                img_vec=create_test_vector(),
-                payload={},
-                owner_user_id="user-1",
-                visibility="public"
-            )
-        
-        # Create 3 private images
-        for i in range(3):
-            await qdrant_store.upsert_image(
-                image_id=generate_uuid(),
-                caption=f"Private image {i}",
-                caption_confidence=0.9,
-                caption_origin="local",
-                img_vec=create_test_vector(),
-                payload={},
-                owner_user_id="user-1",
-                visibility="private"
-            )
+        seed_bulk(
+            qdrant_store,
+            # 5 public images, then 3 private images
+            [(f"Public image {i}", "user-1", "public") for i in range(5)]
+            + [(f"Private image {i}", "user-1", "private") for i in range(3)]
+        )
         
         return qdrant_store
     
@@ -450,7 +420,7 @@ class TestQdrantList:
         # Verify different images
         ids_page1 = {img["id"] for img in images_page1}
         ids_page2 = {img["id"] for img in images_page2}
-        assert len(ids_page1.intersection(ids_page2)) == 0
+        assert ids_page1.isdisjoint(ids_page2)
     
     @pytest.mark.asyncio
     async def test_list_with_visibility_filter(self, list_test_store):
@@ -490,15 +460,8 @@ class TestQdrantFilters:
         )
         await qdrant_store.soft_delete_image(image_id)
         
-        # Search should not find it
-        results = await qdrant_store.search(
-            query_vec=vector,
-            k=10,
-            user_id=None,
-            scope="public"
-        )
-        
-        ids = [r["id"] for r in results]
+        # Search should not find it (ids are all this needs)
+        ids = search_ids(qdrant_store, vector, k=10, user_id=None, scope="public")
         assert image_id not in ids
 
 
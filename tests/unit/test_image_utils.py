@@ -0,0 +1,47 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from apps.api.services.utils.image_utils import perceptual_hash, hamming_distance
+
+
+def _noise_image(seed: int) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    small = (rng.random((60, 80, 3)) * 255).astype("uint8")
+    return Image.fromarray(small).resize((640, 480), Image.Resampling.BICUBIC)
+
+
+def _encode(img: Image.Image, fmt: str = "JPEG", **kwargs) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="module")
+def base_image():
+    return _noise_image(0)
+
+
+def test_phash_is_64_bit(base_image):
+    phash = perceptual_hash(_encode(base_image))
+    assert 0 <= phash < 2**64
+
+
+@pytest.mark.parametrize("variant", ["recompressed", "resized", "png"])
+def test_phash_near_duplicates_are_close(base_image, variant):
+    original = perceptual_hash(_encode(base_image, quality=95))
+    if variant == "recompressed":
+        data = _encode(base_image, quality=40)
+    elif variant == "resized":
+        data = _encode(base_image.resize((320, 240)))
+    else:
+        data = _encode(base_image, "PNG")
+    assert hamming_distance(original, perceptual_hash(data)) <= 5
+
+
+def test_phash_different_images_are_far(base_image):
+    a = perceptual_hash(_encode(base_image))
+    b = perceptual_hash(_encode(_noise_image(1)))
+    assert hamming_distance(a, b) > 10
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from workers.ingestion import worker as ingestion_worker
+from workers.ingestion.worker import IngestionWorker
+
+
+class _FakeDB:
+    def __init__(self):
+        self.batches = []
+        self.error = None
+
+    async def upsert_images(self, rows):
+        if self.error:
+            raise self.error
+        self.batches.append([row["image_id"] for row in rows])
+
+
+@pytest.fixture
+def make_worker(monkeypatch):
+    for name in ("get_captioner", "get_embedder", "get_image_storage", "AIFeatureRouter"):
+        monkeypatch.setattr(ingestion_worker, name, lambda: None)
+    monkeypatch.setattr(ingestion_worker, "PgVectorStore", _FakeDB)
+
+    def make_worker(concurrency, flush_ms):
+        monkeypatch.setenv("INGEST_FLUSH_MS", str(flush_ms))
+        return IngestionWorker(concurrency=concurrency)
+    return make_worker
+
+
+async def test_upsert_flushes_once_flush_n_rows_are_buffered(make_worker):
+    # The timer would never fire within the test
+    worker = make_worker(concurrency=3, flush_ms=60_000)
+
+    await asyncio.wait_for(
+        asyncio.gather(*(worker._upsert({"image_id": i}) for i in "abc")), timeout=1
+    )
+
+    assert worker.db.batches == [["a", "b", "c"]]
+    assert worker._pending_rows == []
+
+
+async def test_upsert_flushes_a_partial_batch_after_flush_ms(make_worker):
+    worker = make_worker(concurrency=3, flush_ms=10)
+
+    await asyncio.gather(*(worker._upsert({"image_id": i}) for i in "ab"))
+    await worker._upsert({"image_id": "c"})
+
+    assert worker.db.batches == [["a", "b"], ["c"]]
+
+
+async def test_upsert_failure_reaches_every_waiter(make_worker):
+    worker = make_worker(concurrency=2, flush_ms=60_000)
+    worker.db.error = RuntimeError("db down")
+
+    results = await asyncio.gather(
+        *(worker._upsert({"image_id": i}) for i in "ab"), return_exceptions=True
+    )
+
+    assert results == [worker.db.error, worker.db.error]
+    assert worker._pending_rows == []
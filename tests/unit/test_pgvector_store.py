@@ -0,0 +1,68 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from apps.api.storage import pgvector_store
+from apps.api.storage.pgvector_store import PgVectorStore
+
+
+class _FakeEngine:
+    """Records the statements executed instead of sending them to Postgres"""
+    def __init__(self):
+        self.statements = []
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def execute(self, stmt):
+        self.statements.append(stmt.compile(dialect=postgresql.dialect()))
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = _FakeEngine()
+    monkeypatch.setattr(pgvector_store, "_initialized", True)
+    monkeypatch.setattr(pgvector_store, "_engine", engine)
+    return engine
+
+
+def _row(image_id, **fields):
+    return dict(
+        image_id=image_id, caption="a cat", caption_confidence=0.9,
+        caption_origin="local", img_vec=[0.0] * 4, payload={}, **fields,
+    )
+
+
+async def test_upsert_images_one_statement_latest_row_wins(engine):
+    await PgVectorStore().upsert_images([
+        _row("a", visibility="private"), _row("b", visibility="public"), _row("a", visibility="public"),
+    ])
+
+    (stmt,) = engine.statements
+    assert stmt.params["id_m0"] == "a"
+    assert stmt.params["visibility_m0"] == "public"
+    assert stmt.params["id_m1"] == "b"
+    assert "id_m2" not in stmt.params
+    assert "visibility = excluded.visibility" in str(stmt)
+
+
+async def test_upsert_images_keeps_stored_visibility_when_none(engine):
+    await PgVectorStore().upsert_images([_row("a"), _row("b", visibility="public")])
+
+    (stmt,) = engine.statements
+    # Inserted as private, but an existing row keeps its visibility
+    assert stmt.params["visibility_m0"] == "private"
+    assert stmt.params["id_1"] == ["a"]
+    assert (
+        "visibility = CASE WHEN (excluded.id IN (__[POSTCOMPILE_id_1])) "
+        "THEN images.visibility ELSE excluded.visibility END"
+    ) in str(stmt)
+    assert "owner_user_id = coalesce(excluded.owner_user_id, images.owner_user_id)" in str(stmt)
+
+
+async def test_upsert_images_empty_batch_is_a_no_op(engine):
+    await PgVectorStore().upsert_images([])
+
+    assert engine.statements == []
@@ -34,3 +34,104 @@ async def test_semantic_cache_store():
     await cache.store(b"fake_image", data)
     
     cache.redis.setex.assert_called_once()
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+class _FakeRedis:
+    """Just the commands SemanticCache uses, in memory"""
+    def __init__(self):
+        self.values, self.zsets = {}, {}
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update({m.encode(): score for m, score in mapping.items()})
+
+    async def zremrangebyscore(self, key, lo, hi):
+        hi = float(hi)
+        zset = self.zsets.get(key, {})
+        for member in [m for m, score in zset.items() if score <= hi]:
+            del zset[member]
+
+    async def zremrangebyrank(self, key, start, stop):
+        zset = self.zsets.get(key, {})
+        ranked = sorted(zset, key=zset.get)
+        end = max(0, len(ranked) + stop + 1) if stop < 0 else stop + 1
+        for member in ranked[start:end]:
+            del zset[member]
+
+    async def zrangebyscore(self, key, lo, hi):
+        zset = self.zsets.get(key, {})
+        return [m for m in sorted(zset, key=zset.get) if zset[m] >= lo]
+
+    async def expire(self, key, ttl):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_semantic_cache_near_duplicate_hit():
+    import io
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    img = Image.fromarray((rng.random((60, 80, 3)) * 255).astype("uint8")).resize((640, 480))
+
+    def jpeg(quality):
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=quality)
+        return buf.getvalue()
+
+    cache = SemanticCache()
+    cache.redis = _FakeRedis()
+    await cache.store(jpeg(95), {"caption": "test", "embedding": [0.1, 0.2]})
+
+    # Different bytes, same picture: found by pHash, not by exact hash
+    hit = await cache.lookup(jpeg(40))
+    assert hit["caption"] == "test"
+    # Embeddings are cached at float32 precision (they may be persisted)
+    assert hit["embedding"] == np.asarray([0.1, 0.2], dtype=np.float32).tolist()
+
+
+@pytest.mark.asyncio
+async def test_semantic_cache_phash_bands_are_trimmed(monkeypatch):
+    import itertools
+    import types
+    from apps.api.services.routing.tiers import redis_cache
+    # Strictly increasing insert times, whatever the clock resolution
+    clock = itertools.count(1_700_000_000)
+    monkeypatch.setattr(redis_cache, "time", types.SimpleNamespace(time=lambda: next(clock)))
+
+    cache = SemanticCache()
+    cache.redis = _FakeRedis()
+    cache.PHASH_BAND_MAX = 3
+
+    # Same low band for every hash, so all land in one band set
+    for i in range(5):
+        await cache.store(b"img%d" % i, {"caption": str(i)}, phash=i << 60)
+    band = cache._phash_bands(0)[0]
+    # Capped at the newest PHASH_BAND_MAX members
+    assert sorted(cache.redis.zsets[band]) == [b"%016x" % (i << 60) for i in (2, 3, 4)]
+
+    # Members older than PHASH_TTL are dropped on the next write
+    for member in cache.redis.zsets[band]:
+        cache.redis.zsets[band][member] -= cache.PHASH_TTL + 1
+    await cache.store(b"new", {"caption": "new"}, phash=7 << 60)
+    assert list(cache.redis.zsets[band]) == [b"%016x" % (7 << 60)]
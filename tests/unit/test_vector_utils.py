@@ -0,0 +1,21 @@
+import numpy as np
+
+from apps.api.services.utils.vector_utils import quantize_i8, dequantize_i8
+
+
+def test_quantize_i8_roundtrip():
+    rng = np.random.default_rng(0)
+    vec = rng.standard_normal(512).astype(np.float32)
+    vec /= np.linalg.norm(vec)
+
+    packed = quantize_i8(vec)
+    assert len(packed) == 2 + 512
+
+    restored = dequantize_i8(packed)
+    assert restored.dtype == np.float32
+    cosine = vec @ restored / np.linalg.norm(restored)
+    assert cosine > 0.999
+
+
+def test_quantize_i8_zero_vector():
+    assert not dequantize_i8(quantize_i8(np.zeros(8))).any()
@@ -0,0 +1,224 @@
+from fnmatch import fnmatch
+
+import msgpack
+
+from workers.base import BaseWorker
+
+QUEUE = "test:jobs"
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    async def execute(self):
+        self.redis.executed.append([name for name, _, _ in self.calls])
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class _FakeRedis:
+    """Just the list, stream and consumer-group commands BaseWorker uses, in memory"""
+    def __init__(self):
+        self.values, self.lists = {}, {}
+        self.entries = {}  # entry id -> fields, in stream order
+        self.seq = 0  # last entry id handed out by XADD
+        self.delivered = set()  # entries handed out by ">" reads so far
+        self.pending = {}  # consumer -> [entry id]
+        self.reads = []  # start id of each XREADGROUP
+        self.executed = []  # command names of each pipeline execute
+        self.on_idle = lambda: None
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def register_script(self, script):
+        # Python stand-in for the _CLAIM_LIST Lua script
+        async def claim(keys):
+            source, target = keys
+            if source not in self.lists:
+                return 0
+            self.lists[target] = self.lists.pop(source)
+            return 1
+        return claim
+
+    async def scan_iter(self, match):
+        for key in list(self.lists):
+            if fnmatch(key, match):
+                yield key
+
+    async def lrange(self, key, start, end):
+        return list(self.lists.get(key, []))
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.lists.pop(key, None)
+            self.values.pop(key, None)
+
+    async def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    async def xadd(self, name, fields):
+        self.seq += 1
+        entry_id = f"{self.seq}-0".encode()
+        # Redis hands fields back as bytes
+        self.entries[entry_id] = {key.encode(): value for key, value in fields.items()}
+        return entry_id
+
+    async def xreadgroup(self, group, consumer, streams, count, block):
+        ((name, start),) = streams.items()
+        self.reads.append(start)
+        if start == "0":
+            ids = self.pending.get(consumer, [])[:count]
+            # A pending entry trimmed from the stream has no fields
+            return [[name, [(entry_id, self.entries.get(entry_id)) for entry_id in ids]]]
+        ids = [entry_id for entry_id in self.entries if entry_id not in self.delivered][:count]
+        if not ids:
+            self.on_idle()
+            return []
+        self.delivered.update(ids)
+        self.pending.setdefault(consumer, []).extend(ids)
+        return [[name, [(entry_id, self.entries[entry_id]) for entry_id in ids]]]
+
+    async def xack(self, name, group, *ids):
+        for consumer_ids in self.pending.values():
+            consumer_ids[:] = [entry_id for entry_id in consumer_ids if entry_id not in ids]
+
+    async def xdel(self, name, *ids):
+        for entry_id in ids:
+            self.entries.pop(entry_id, None)
+
+
+class _Worker(BaseWorker):
+    def __init__(self, redis):
+        super().__init__(QUEUE, batch_size=2)
+        self.worker_name = "w"
+        self.redis = redis
+        self.seen = []
+
+    async def process_job(self, job, pipe):
+        self.seen.append(job["job_id"])
+        pipe.setex(f"result:{job['job_id']}", 60, "done")
+
+
+def _job(job_id: str) -> dict:
+    return {"job": msgpack.packb({"job_id": job_id})}
+
+
+async def _run_until_idle(worker):
+    """Run worker task 0 until it finds no new jobs"""
+    def stop():
+        worker.running = False
+    worker.redis.on_idle = stop
+    worker.running = True
+    await worker._worker_loop(0)
+
+
+async def test_worker_loop_rereads_pending_jobs_first():
+    redis = _FakeRedis()
+    for job_id in "abc":
+        await redis.xadd(QUEUE, _job(job_id))
+    # a and b were read by an earlier run of this consumer, then it died
+    redis.delivered = {b"1-0", b"2-0"}
+    redis.pending["w:0"] = [b"1-0", b"2-0"]
+    worker = _Worker(redis)
+
+    await _run_until_idle(worker)
+
+    assert worker.seen == ["a", "b", "c"]
+    assert redis.reads == ["0", "0", ">", ">"]
+    assert redis.pending["w:0"] == []
+    assert redis.entries == {}
+    assert set(redis.values) == {"result:a", "result:b", "result:c"}
+
+
+async def test_worker_loop_acks_trimmed_pending_entries():
+    redis = _FakeRedis()
+    redis.pending["w:0"] = [b"9-0"]  # no longer in the stream
+    worker = _Worker(redis)
+
+    await _run_until_idle(worker)
+
+    assert worker.seen == []
+    assert redis.pending["w:0"] == []
+
+
+async def test_ack_sends_results_xack_and_xdel_together():
+    redis = _FakeRedis()
+    for job_id in "ab":
+        await redis.xadd(QUEUE, _job(job_id))
+    await redis.xreadgroup(BaseWorker.GROUP, "w:0", {QUEUE: ">"}, count=2, block=None)
+    worker = _Worker(redis)
+
+    pipe = redis.pipeline(transaction=False)
+    pipe.setex("result:a", 60, "done")
+    await worker._ack([b"1-0", b"2-0"], pipe)
+
+    assert redis.executed == [["setex", "xack", "xdel"]]
+    assert redis.pending["w:0"] == []
+    assert redis.entries == {}
+    assert redis.values == {"result:a": "done"}
+
+
+async def test_claim_orphans_follows_the_cursor():
+    redis = _FakeRedis()
+    pages = [
+        (b"7-0", [(b"1-0", {}), (b"2-0", {})], []),
+        (b"0-0", [(b"8-0", {})], []),
+    ]
+    calls = []
+
+    async def xautoclaim(name, group, consumer, min_idle_time, start_id, count):
+        calls.append((consumer, min_idle_time, start_id))
+        return pages.pop(0)
+
+    redis.xautoclaim = xautoclaim
+    worker = _Worker(redis)
+
+    await worker._claim_orphans()
+
+    assert calls == [
+        ("w:0", worker.claim_idle_ms, "0-0"),
+        ("w:0", worker.claim_idle_ms, b"7-0"),
+    ]
+    assert pages == []
+
+
+async def test_migrate_list_queue_moves_lists_oldest_first():
+    redis = _FakeRedis()
+    # LPUSHed, so newest first
+    redis.lists[QUEUE] = [b"j3", b"j2", b"j1"]
+    redis.lists[f"{QUEUE}:processing:old"] = [b"j0"]
+    worker = _Worker(redis)
+
+    await worker._migrate_list_queue()
+
+    assert [fields[b"job"] for fields in redis.entries.values()] == [b"j1", b"j2", b"j3", b"j0"]
+    assert redis.lists == {}
+
+
+async def test_migrate_list_queue_resumes_its_own_claim_only():
+    redis = _FakeRedis()
+    # Claimed by this replica before it crashed, and by another one mid-move
+    redis.lists[f"{QUEUE}:migrating:w"] = [b"j1"]
+    redis.lists[f"{QUEUE}:migrating:other"] = [b"j2"]
+    worker = _Worker(redis)
+
+    await worker._migrate_list_queue()
+
+    assert [fields[b"job"] for fields in redis.entries.values()] == [b"j1"]
+    assert redis.lists == {f"{QUEUE}:migrating:other": [b"j2"]}
+
+
+async def test_migrate_list_queue_leaves_the_stream_alone():
+    redis = _FakeRedis()
+    await redis.xadd(QUEUE, _job("a"))
+    worker = _Worker(redis)
+
+    await worker._migrate_list_queue()
+
+    assert list(redis.entries) == [b"1-0"]
+    assert redis.executed == []
@@ -1,11 +1,23 @@
 import asyncio
+import base64
 import json
 import os
 import signal
+import socket
+import time
 import logging
+import msgpack
 from redis import asyncio as aioredis
 from abc import ABC, abstractmethod
 
+try:
+    # Shipped with uvicorn[standard] in requirements.base.txt (not on Windows)
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    uvloop = None
+    UVLOOP_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -13,26 +25,161 @@ logging.basicConfig(
 )
 logger = logging.getLogger("worker")
 
+
+def decode_job(job_data: bytes) -> dict:
+    """Decode a queued job: msgpack from the API, or JSON from older producers.
+    
+    A msgpack map never starts with '{', so the first byte tells them apart.
+    """
+    if job_data[:1] == b"{":
+        return json.loads(job_data)
+    return msgpack.unpackb(job_data, raw=False)
+
+
+def job_image_bytes(job: dict) -> bytes:
+    """Raw image bytes carried inline in a job; JSON jobs carry them base64-encoded"""
+    if "image" in job:
+        return job["image"]
+    return base64.b64decode(job["image_b64"])
+
+
+def run_worker(worker: "BaseWorker"):
+    """Run a worker until it stops, on uvloop when installed"""
+    if UVLOOP_AVAILABLE:
+        uvloop.run(worker.start())
+    else:
+        asyncio.run(worker.start())
+
+
+# RENAME KEYS[1] to KEYS[2] if KEYS[1] is a list; 1 if renamed, else 0
+_CLAIM_LIST = """
+if redis.call('TYPE', KEYS[1]).ok ~= 'list' then
+    return 0
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+return 1
+"""
+
+
 class BaseWorker(ABC):
-    def __init__(self, queue_name: str, concurrency: int = 1):
+    # Consumer group every worker of a queue reads through
+    GROUP = "workers"
+
+    def __init__(self, queue_name: str, concurrency: int = 1, batch_size: int = 1):
         self.queue_name = queue_name
         self.concurrency = concurrency
+        # Max jobs taken per wakeup and handed to process_batch together
+        self.batch_size = max(1, batch_size)
         self.redis = None
         self.running = False
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        # How long an idle read blocks before re-checking self.running; jobs
+        # are still delivered as soon as they are added
+        self.block_timeout = int(os.getenv("QUEUE_BLOCK_TIMEOUT", "5"))
+        # Pending jobs idle this long are presumed abandoned by a dead consumer
+        self.claim_idle_ms = int(os.getenv("QUEUE_CLAIM_IDLE_MS", "300000"))
+        # Tasks currently blocked in the read; stop() cancels these so shutdown
+        # doesn't wait out the timeout (tasks mid-job finish their job first)
+        self._idle_tasks = set()
+        # Set by SIGTERM/SIGINT; created in start() on the running loop
+        self._shutdown = None
+        # Jobs handled since the last stats line; per-job lines are DEBUG only
+        self._jobs_done = 0
+        # Prefix of this process's consumer names; keep it stable across restarts
+        # (e.g. set WORKER_NAME per replica) so a restart resumes its pending jobs
+        self.worker_name = os.getenv("WORKER_NAME", socket.gethostname())
+
+    def _consumer(self, worker_id: int) -> str:
+        """Consumer-group member name of worker task `worker_id`"""
+        return f"{self.worker_name}:{worker_id}"
+
+    async def _migrate_list_queue(self):
+        """Move jobs left in the LIST queue (and its in-flight lists) used by
+        earlier versions onto the stream; a no-op once migrated.
+        
+        Each list is first renamed to this process's own key, atomically and
+        only while it is still a list, so with several workers starting at
+        once exactly one of them queues a given list's jobs. A key left behind
+        by a crash mid-move is finished on the next start.
+        """
+        claimed = f"{self.queue_name}:migrating:{self.worker_name}"
+        await self._move_list(claimed)
+        claim = self.redis.register_script(_CLAIM_LIST)
+        keys = [self.queue_name]
+        keys += [key async for key in self.redis.scan_iter(match=f"{self.queue_name}:processing:*")]
+        for key in keys:
+            if await claim(keys=[key, claimed]):
+                await self._move_list(claimed)
+
+    async def _move_list(self, key: str):
+        """Append the jobs of list `key` to the stream and delete the list"""
+        jobs = await self.redis.lrange(key, 0, -1)
+        if not jobs:
+            return
+        # MULTI: the jobs are added and the list deleted together, or neither
+        pipe = self.redis.pipeline()
+        # The list was LPUSHed, so its oldest job is last
+        for job_data in reversed(jobs):
+            pipe.xadd(self.queue_name, {"job": job_data})
+        pipe.delete(key)
+        await pipe.execute()
+        logger.warning(f"Moved {len(jobs)} job(s) from a list queue onto stream {self.queue_name}")
+
+    async def _claim_orphans(self):
+        """Take over jobs a dead consumer read but never acked"""
+        claimed = 0
+        cursor = "0-0"
+        while True:
+            resp = await self.redis.xautoclaim(
+                self.queue_name, self.GROUP, self._consumer(0),
+                self.claim_idle_ms, start_id=cursor, count=100,
+            )
+            cursor = resp[0]
+            claimed += len(resp[1])
+            if cursor in (b"0-0", "0-0"):
+                break
+        if claimed:
+            logger.warning(f"Claimed {claimed} orphaned job(s) on {self.queue_name}")
 
     async def start(self):
         """Start the worker"""
         logger.info(f"Starting {self.__class__.__name__} on queue {self.queue_name} with concurrency {self.concurrency}")
         
-        # Connect to Redis
-        self.redis = await aioredis.from_url(self.redis_url)
+        # Connect to Redis. Every task parks a connection in its blocking read,
+        # so size the pool for that plus one per concurrently processed job
+        # (results, acks); the blocking pool waits for a free connection
+        # instead of erroring once the bound is reached.
+        pool = aioredis.BlockingConnectionPool.from_url(
+            self.redis_url,
+            max_connections=self.concurrency * (self.batch_size + 1) + 4,
+            socket_keepalive=True,
+            health_check_interval=30,
+        )
+        self.redis = await aioredis.Redis.from_pool(pool)
+        await self._migrate_list_queue()
+        try:
+            # From "0", so jobs added before the group existed are delivered too
+            await self.redis.xgroup_create(self.queue_name, self.GROUP, id="0", mkstream=True)
+        except aioredis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        await self._claim_orphans()
+        
+        # Load models and open connections before taking the first job, so
+        # that job doesn't carry the cold-start latency
+        started = time.perf_counter()
+        await self.warmup()
+        logger.info(f"Warmed up in {time.perf_counter() - started:.1f}s")
         self.running = True
         
-        # Handle shutdown signals
+        # Handle shutdown signals: the handler only sets an event; stopping
+        # happens in a task that was created up front on this loop
+        self._shutdown = asyncio.Event()
         loop = asyncio.get_running_loop()
         for sig in (signal.SIGTERM, signal.SIGINT):
-            loop.add_signal_handler(sig, lambda: asyncio.create_task(self.stop()))
+            loop.add_signal_handler(sig, self._shutdown.set)
+        stopper = asyncio.create_task(self._stop_on_shutdown())
+        reporter = asyncio.create_task(self._report_stats())
 
         # Start worker pool
         workers = [
@@ -45,39 +192,147 @@ class BaseWorker(ABC):
         except asyncio.CancelledError:
             logger.info("Worker tasks cancelled")
         finally:
-            await self.redis.close()
+            stopper.cancel()
+            reporter.cancel()
+            await self.redis.aclose()
             logger.info("Worker stopped")
 
+    async def _report_stats(self, interval: float = 10.0):
+        """Log one throughput line per interval instead of lines per job"""
+        while True:
+            await asyncio.sleep(interval)
+            done, self._jobs_done = self._jobs_done, 0
+            if done:
+                logger.info(f"{self.__class__.__name__} handled {done} job(s) in the last {interval:.0f}s")
+
+    async def _stop_on_shutdown(self):
+        await self._shutdown.wait()
+        if self.running:
+            await self.stop()
+
     async def stop(self):
         """Stop the worker gracefully"""
         logger.info("Stopping worker...")
         self.running = False
+        for task in self._idle_tasks:
+            task.cancel()
+
+    async def _read(self, consumer: str, pending: bool) -> list:
+        """Read up to batch_size jobs for `consumer` from the group.
+        
+        With `pending`, re-read jobs already delivered to `consumer` but not
+        acked (left by a previous run or claimed from a dead consumer), without
+        blocking. Otherwise block for new jobs. A read job stays pending until
+        _ack, so a crash mid-job doesn't lose it.
+        Returns [(entry_id, payload)], oldest first ([] on timeout).
+        """
+        # Only the blocking read is cancellable by stop(); a job delivered but
+        # not yet read here stays pending and is re-read on restart
+        task = asyncio.current_task()
+        self._idle_tasks.add(task)
+        try:
+            resp = await self.redis.xreadgroup(
+                self.GROUP, consumer, {self.queue_name: "0" if pending else ">"},
+                count=self.batch_size,
+                block=None if pending else self.block_timeout * 1000,
+            )
+        finally:
+            self._idle_tasks.discard(task)
+        if not resp:
+            return []
+        # A pending entry trimmed from the stream comes back with no fields
+        return [(entry_id, fields.get(b"job") if fields else None) for entry_id, fields in resp[0][1]]
+
+    async def _ack(self, entry_ids: list, pipe):
+        """Ack and delete finished jobs, sending the writes the jobs queued
+        on `pipe` (results) in the same round-trip"""
+        pipe.xack(self.queue_name, self.GROUP, *entry_ids)
+        # Acked entries aren't needed again; keep the stream to pending work
+        pipe.xdel(self.queue_name, *entry_ids)
+        await pipe.execute()
 
     async def _worker_loop(self, worker_id: int):
         """Main loop for each worker task"""
         logger.info(f"Worker {worker_id} started")
+        consumer = self._consumer(worker_id)
+        # Finish this consumer's unacked jobs before taking new ones
+        pending = True
         
         while self.running:
             try:
-                # Blocking pop from queue (timeout allows checking self.running)
-                result = await self.redis.brpop(self.queue_name, timeout=2)
+                # Blocking read (timeout allows checking self.running)
+                try:
+                    batch = await self._read(consumer, pending)
+                except asyncio.CancelledError:
+                    if self.running:
+                        raise
+                    break
                 
-                if result is None:
+                if not batch:
+                    pending = False
                     continue
                 
-                _, job_data = result
-                job = json.loads(job_data)
-                
-                logger.info(f"Worker {worker_id} processing job {job.get('job_id')}")
-                await self.process_job(job)
-                logger.info(f"Worker {worker_id} completed job {job.get('job_id')}")
+                # Jobs are acked even if they raise: pending entries guard
+                # against the worker dying mid-job, not against jobs that fail
+                pipe = self.redis.pipeline(transaction=False)
+                try:
+                    jobs = [decode_job(job_data) for _, job_data in batch if job_data is not None]
+                    debug = logger.isEnabledFor(logging.DEBUG)
+                    if debug:
+                        job_ids = [job.get('job_id') for job in jobs]
+                        logger.debug(f"Worker {worker_id} processing jobs {job_ids}")
+                    if jobs:
+                        await self.process_batch(jobs, pipe)
+                    self._jobs_done += len(jobs)
+                    if debug:
+                        logger.debug(f"Worker {worker_id} completed jobs {job_ids}")
+                finally:
+                    await self._ack([entry_id for entry_id, _ in batch], pipe)
                 
             except Exception as e:
                 if self.running:
                     logger.error(f"Worker {worker_id} error: {e}")
                     await asyncio.sleep(1)
 
+    async def job_image(self, job: dict, pipe) -> bytes:
+        """Raw image bytes of a job, by reference or inline.
+        
+        The API stores the image under `image_key` and queues only the key.
+        The blob is deleted on `pipe`, i.e. with the ack, so a job redelivered
+        after a crash can still read it.
+        """
+        image_key = job.get("image_key")
+        if image_key is None:
+            return job_image_bytes(job)
+        image_bytes = await self.redis.get(image_key)
+        if image_bytes is None:
+            raise ValueError(f"Image {image_key} expired or missing")
+        pipe.delete(image_key)
+        return image_bytes
+
+    async def warmup(self):
+        """Prepare shared clients before any worker task starts. Override to preload."""
+        pass
+
     @abstractmethod
-    async def process_job(self, job: dict):
-        """Process a single job. Must be implemented by subclasses."""
+    async def process_job(self, job: dict, pipe):
+        """Process a single job. Must be implemented by subclasses.
+        
+        Queue the job's Redis writes (its result) on `pipe` rather than
+        awaiting them; the worker loop sends them together with the ack.
+        """
         pass
+
+    async def process_batch(self, jobs: list, pipe):
+        """Process jobs dequeued together. Override to batch the work itself."""
+        # Wait for every job, even after one raises: the pipe is executed with
+        # the ack right after this returns, and writes a still-running job
+        # queues after that would be lost
+        results = await asyncio.gather(
+            *(self.process_job(job, pipe) for job in jobs), return_exceptions=True
+        )
+        for job, result in zip(jobs, results):
+            if isinstance(result, Exception):
+                logger.error(f"Job {job.get('job_id')} failed: {result}")
+            elif isinstance(result, BaseException):
+                raise result
@@ -1,11 +1,11 @@
 import asyncio
 import json
 import os
-import base64
 import time
-from workers.base import BaseWorker, logger
-from apps.api.services.captioner_client import CaptionerClient
+from workers.base import BaseWorker, logger, run_worker
+from apps.api.deps import get_captioner
 from apps.api.services.routing.router import AIFeatureRouter, RoutingContext
+from workers.tier_dispatch import resolve_caption
 from apps.api.schemas import CaptionRequest
 
 class CaptionWorker(BaseWorker):
@@ -14,13 +14,16 @@ class CaptionWorker(BaseWorker):
 
     def __init__(self, concurrency: int = 1):
         super().__init__(self.QUEUE_NAME, concurrency)
-        self.captioner = CaptionerClient()
+        self.captioner = get_captioner()
         self.router = AIFeatureRouter()
 
-    async def process_job(self, job: dict):
+    async def warmup(self):
+        await asyncio.gather(self.captioner.warmup(), self.router.cache.connect())
+
+    async def process_job(self, job: dict, pipe):
         job_id = job["job_id"]
         try:
-            image_bytes = base64.b64decode(job["image_b64"])
+            image_bytes = await self.job_image(job, pipe)
             
             # Use router to decide tier
             # Note: We create a dummy request object if needed, or update router to accept bytes
@@ -33,30 +36,9 @@ class CaptionWorker(BaseWorker):
                 client_confidence=job.get("client_confidence")
             )
             
-            caption = ""
-            conf = 0.0
-            origin = "local"
-            latency = 0
-            
-            # Execute based on routing decision
-            # (Logic copied/adapted from main.py ingest_image)
-            
-            if decision.tier == "local":
-                caption, conf, latency = await self.captioner.caption(image_bytes)
-                origin = "local"
-            elif decision.tier == "cloud":
-                caption, latency, cost = await self.captioner.caption_cloud(image_bytes)
-                conf = 0.95
-                origin = "cloud"
-            elif decision.tier == "edge":
-                caption = job.get("text_hint", "")
-                conf = job.get("client_confidence", 1.0)
-                origin = "edge"
-            elif decision.tier == "cache":
-                cached = decision.metadata.get("cached_result", {})
-                caption = cached.get("caption", "")
-                conf = cached.get("confidence", 1.0)
-                origin = cached.get("origin", "cache")
+            caption, conf, origin, latency = await resolve_caption(
+                decision, image_bytes, job, self.captioner
+            )
             
             # Store result
             result = {
@@ -69,7 +51,7 @@ class CaptionWorker(BaseWorker):
                 "completed_at": time.time()
             }
             
-            await self.redis.setex(
+            pipe.setex(
                 f"{self.RESULT_PREFIX}{job_id}",
                 3600,
                 json.dumps(result)
@@ -77,7 +59,7 @@ class CaptionWorker(BaseWorker):
             
         except Exception as e:
             logger.error(f"Job {job_id} failed: {e}")
-            await self.redis.setex(
+            pipe.setex(
                 f"{self.RESULT_PREFIX}{job_id}",
                 3600,
                 json.dumps({"status": "failed", "error": str(e)})
@@ -86,4 +68,4 @@ class CaptionWorker(BaseWorker):
 if __name__ == "__main__":
     concurrency = int(os.getenv("WORKER_CONCURRENCY", "4"))
     worker = CaptionWorker(concurrency=concurrency)
-    asyncio.run(worker.start())
+    run_worker(worker)
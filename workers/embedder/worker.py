@@ -1,54 +1,105 @@
 import asyncio
+import hashlib
 import json
 import os
-import base64
 import time
-from workers.base import BaseWorker, logger
-from apps.api.services.embedder_client import EmbedderClient
+import numpy as np
+from workers.base import BaseWorker, logger, run_worker
+from apps.api.deps import get_embedder
+from apps.api.services.utils.vector_utils import quantize_i8, dequantize_i8
 
 class EmbeddingWorker(BaseWorker):
     QUEUE_NAME = "embedding:jobs"
     RESULT_PREFIX = "embedding:result:"
+    RESULT_TTL = 3600
+    # Embeddings of already-seen image bytes by content hash (quantize_i8)
+    CACHE_PREFIX = "embedding:cache:"
+    CACHE_TTL = 86400
 
-    def __init__(self, concurrency: int = 1):
-        super().__init__(self.QUEUE_NAME, concurrency)
-        self.embedder = EmbedderClient()
+    def __init__(self, concurrency: int = 1, batch_size: int = 1):
+        super().__init__(self.QUEUE_NAME, concurrency, batch_size)
+        self.embedder = get_embedder()
 
-    async def process_job(self, job: dict):
+    async def warmup(self):
+        await self.embedder.warmup()
+
+    async def process_job(self, job: dict, pipe):
         job_id = job["job_id"]
         try:
-            image_bytes = base64.b64decode(job["image_b64"])
-            
-            # Generate embedding
-            # embed_image returns a numpy array or list
-            embedding = await self.embedder.embed_image(image_bytes)
-            
-            # Convert to list if numpy
-            if hasattr(embedding, 'tolist'):
-                embedding = embedding.tolist()
+            image_bytes = await self.job_image(job, pipe)
             
-            # Store result
-            result = {
-                "status": "completed",
-                "embedding": embedding,
-                "completed_at": time.time()
-            }
+            cache_key = self._cache_key(image_bytes)
+            cached = await self.redis.get(cache_key)
             
-            await self.redis.setex(
-                f"{self.RESULT_PREFIX}{job_id}",
-                3600,
-                json.dumps(result)
-            )
+            if cached is not None:
+                embedding = dequantize_i8(cached)
+            else:
+                # Generate embedding
+                embedding = await self.embedder.embed_image(image_bytes)
+                pipe.setex(cache_key, self.CACHE_TTL, quantize_i8(embedding))
+            self._store_result(pipe, job_id, embedding, time.time())
             
         except Exception as e:
             logger.error(f"Job {job_id} failed: {e}")
-            await self.redis.setex(
+            pipe.setex(
                 f"{self.RESULT_PREFIX}{job_id}",
-                3600,
+                self.RESULT_TTL,
                 json.dumps({"status": "failed", "error": str(e)})
             )
 
+    def _cache_key(self, image_bytes: bytes) -> str:
+        return f"{self.CACHE_PREFIX}{hashlib.sha256(image_bytes).hexdigest()}"
+
+    def _store_result(self, pipe, job_id: str, embedding, completed_at: float):
+        """Queue a job's result on `pipe`.
+        
+        The vector goes to `<result key>:vec` as int8 with a float16 scale
+        (apps.api.services.utils.vector_utils.dequantize_i8 reads it back);
+        the JSON status under the result key only points at it, so no float
+        is formatted as text.
+        """
+        vec = np.asarray(embedding, dtype=np.float32)
+        key = f"{self.RESULT_PREFIX}{job_id}"
+        pipe.setex(f"{key}:vec", self.RESULT_TTL, quantize_i8(vec))
+        pipe.setex(key, self.RESULT_TTL, json.dumps({
+            "status": "completed",
+            "vec_key": f"{key}:vec",
+            "dim": vec.shape[0],
+            "dtype": "i8",
+            "completed_at": completed_at
+        }))
+
+    async def process_batch(self, jobs: list, pipe):
+        """Embed every uncached job image in one model call, then store all results"""
+        if len(jobs) == 1:
+            return await self.process_job(jobs[0], pipe)
+        try:
+            # Let every fetch finish before falling back, so none queues its
+            # delete on the pipe after it has been executed
+            images = await asyncio.gather(*(self.job_image(job, pipe) for job in jobs), return_exceptions=True)
+            for image in images:
+                if isinstance(image, BaseException):
+                    raise image
+            cache_keys = [self._cache_key(image_bytes) for image_bytes in images]
+            cached = await self.redis.mget(cache_keys)
+            # Only images not embedded before go through the model
+            misses = [i for i, data in enumerate(cached) if data is None]
+            fresh = await self.embedder.embed_batch([images[i] for i in misses]) if misses else []
+        except Exception as e:
+            # A bad payload shouldn't fail its neighbours; retry one by one
+            logger.warning(f"Batch of {len(jobs)} failed ({e}); processing jobs individually")
+            return await super().process_batch(jobs, pipe)
+        
+        embeddings = [None if data is None else dequantize_i8(data) for data in cached]
+        completed_at = time.time()
+        for i, embedding in zip(misses, fresh):
+            embeddings[i] = embedding
+            pipe.setex(cache_keys[i], self.CACHE_TTL, quantize_i8(embedding))
+        for job, embedding in zip(jobs, embeddings):
+            self._store_result(pipe, job["job_id"], embedding, completed_at)
+
 if __name__ == "__main__":
     concurrency = int(os.getenv("WORKER_CONCURRENCY", "2"))
-    worker = EmbeddingWorker(concurrency=concurrency)
-    asyncio.run(worker.start())
+    batch_size = int(os.getenv("EMBED_BATCH_SIZE", "8"))
+    worker = EmbeddingWorker(concurrency=concurrency, batch_size=batch_size)
+    run_worker(worker)
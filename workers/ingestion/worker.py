@@ -1,18 +1,22 @@
 import asyncio
 import json
 import os
-import base64
 import time
 import hashlib
 import io
 from PIL import Image
-from workers.base import BaseWorker, logger
-from apps.api.services.captioner_client import CaptionerClient
-from apps.api.services.embedder_client import EmbedderClient
-from apps.api.services.routing.router import AIFeatureRouter, RoutingContext
+from workers.base import BaseWorker, logger, run_worker
+from apps.api.deps import get_captioner, get_embedder, get_image_storage
+from apps.api.services.routing.router import AIFeatureRouter, RoutingContext, RoutingTier
+from workers.tier_dispatch import resolve_caption
 from apps.api.storage.pgvector_store import PgVectorStore
-from apps.api.services.image_storage import ImageStorage
-from apps.api.services.cloud_providers.factory import CloudProviderFactory
+from apps.api.services.utils.image_utils import perceptual_hash
+
+def _decode_image(image_bytes: bytes) -> Image.Image:
+    """Fully decode image bytes so the result can be shared read-only"""
+    image = Image.open(io.BytesIO(image_bytes))
+    image.load()
+    return image
 
 class IngestionWorker(BaseWorker):
     QUEUE_NAME = "ingestion:jobs"
@@ -20,94 +24,114 @@ class IngestionWorker(BaseWorker):
 
     def __init__(self, concurrency: int = 1):
         super().__init__(self.QUEUE_NAME, concurrency)
-        self.captioner = CaptionerClient()
-        self.embedder = EmbedderClient()
+        # Process-wide singletons, shared by every worker task (as in the API)
+        self.captioner = get_captioner()
+        self.embedder = get_embedder()
+        self.storage = get_image_storage()
         self.router = AIFeatureRouter()
         self.db = PgVectorStore()
-        # Initialize storage (S3/Local)
-        # We need a concrete implementation. For now, we'll assume Local or S3 based on env.
-        # But wait, ImageStorage is an abstract class. We need the factory or concrete class.
-        # Let's check how main.py does it. It uses CloudProviderFactory? No, that's for LLMs.
-        # apps/api/deps.py uses get_image_storage which returns LocalImageStorage or S3ImageStorage.
-        # I'll implement a simple factory here or import the dependency logic.
-        self.storage = self._init_storage()
+        # DB rows of concurrent jobs are written together (see _upsert). At
+        # most one row per task can be waiting, so never wait for more.
+        self.flush_n = max(1, min(int(os.getenv("INGEST_FLUSH_N", "256")), concurrency))
+        self.flush_ms = int(os.getenv("INGEST_FLUSH_MS", "50"))
+        self._pending_rows = []
+
+    async def warmup(self):
+        await asyncio.gather(
+            self.captioner.warmup(),
+            self.embedder.warmup(),
+            self.router.cache.connect(),
+        )
 
-    def _init_storage(self) -> ImageStorage:
-        # Simple factory based on env
-        from apps.api.services.local_file_storage import LocalFileStorage
-        from apps.api.services.s3_storage import S3Storage
+    async def _upsert(self, row: dict):
+        """Buffer a row for a bulk upsert; returns once it is committed.
         
-        if os.getenv("IMAGE_STORAGE_BACKEND", "local") == "s3":
-            return S3Storage(
-                bucket_name=os.getenv("S3_BUCKET_NAME"),
-                endpoint_url=os.getenv("S3_ENDPOINT_URL"),
-                access_key_id=os.getenv("S3_ACCESS_KEY_ID"),
-                secret_access_key=os.getenv("S3_SECRET_ACCESS_KEY"),
-                region_name=os.getenv("S3_REGION", "auto"),
-                public_url_base=os.getenv("S3_PUBLIC_URL_BASE"),
-                use_presigned_urls=os.getenv("S3_USE_PRESIGNED_URLS", "true").lower() == "true",
-                presigned_url_expiry=int(os.getenv("S3_PRESIGNED_URL_EXPIRY", "3600"))
-            )
-        return LocalFileStorage()
+        The first row in waits up to flush_ms for concurrent jobs to add
+        theirs (or until flush_n are buffered), then writes them together.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending_rows.append((row, future))
+        if len(self._pending_rows) >= self.flush_n:
+            await self._flush()
+        elif len(self._pending_rows) == 1:
+            # Returns early if a full buffer is flushed by another job
+            await asyncio.wait((future,), timeout=self.flush_ms / 1000)
+            if not future.done():
+                await self._flush()
+        # Raises if the batch failed, so the job reports it
+        await future
 
-    async def process_job(self, job: dict):
+    async def _flush(self):
+        batch, self._pending_rows = self._pending_rows, []
+        try:
+            await self.db.upsert_images([row for row, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for _, future in batch:
+                future.set_result(None)
+
+    async def process_job(self, job: dict, pipe):
         job_id = job["job_id"]
-        logger.info(f"Starting ingestion for job {job_id}")
+        logger.debug("Starting ingestion for job %s", job_id)
         
         try:
             # 1. Decode Image
-            image_bytes = base64.b64decode(job["image_b64"])
+            image_bytes = await self.job_image(job, pipe)
             
-            # 2. Generate ID (Hash)
-            image_hash = hashlib.sha256(image_bytes).hexdigest()[:16]
+            # 2. Generate ID (Hash); hashlib drops the GIL on large inputs, so
+            # hashing in a thread keeps the loop serving concurrent jobs
+            image_hash = (await asyncio.to_thread(hashlib.sha256, image_bytes)).hexdigest()[:16]
             
-            # 3. Save to Storage
-            # Check if exists first? Ideally yes, but upsert handles it.
-            # We save first to ensure we have the path.
-            meta = await self.storage.save_image(image_hash, image_bytes)
+            # Perceptual hash: lets the router's cache match near-duplicates
+            # (re-encoded, resized) of images it has seen, not just exact bytes
+            try:
+                phash = await asyncio.to_thread(perceptual_hash, image_bytes)
+            except Exception as e:
+                logger.warning(f"pHash failed for job {job_id}: {e}")
+                phash = None
             
-            # 4. Captioning (Router)
+            # 3. Routing (cache lookup first; a hit can carry the embedding too)
             decision = await self.router.route_caption_request(
                 image_bytes=image_bytes,
                 context=RoutingContext(latency_budget_ms=job.get("latency_budget_ms", 2000)),
                 text_hint=job.get("text_hint"),
-                client_confidence=job.get("client_confidence")
+                client_confidence=job.get("client_confidence"),
+                phash=phash
             )
+            cached = decision.metadata.get("cached_result", {}) if decision.tier is RoutingTier.CACHE else {}
             
-            caption = ""
-            conf = 0.0
-            origin = "local"
+            # Decode once; storage, captioner and embedder all reuse it
+            image = await asyncio.to_thread(_decode_image, image_bytes)
             
-            if decision.tier == "local":
-                caption, conf, _ = await self.captioner.caption(image_bytes)
-                origin = "local"
-            elif decision.tier == "cloud":
-                caption, _, _ = await self.captioner.caption_cloud(image_bytes)
-                conf = 0.95
-                origin = "cloud"
-            elif decision.tier == "edge":
-                caption = job.get("text_hint", "")
-                conf = job.get("client_confidence", 1.0)
-                origin = "edge"
-            elif decision.tier == "cache":
-                cached = decision.metadata.get("cached_result", {})
-                caption = cached.get("caption", "")
-                conf = cached.get("confidence", 1.0)
-                origin = cached.get("origin", "cache")
+            # 4-6. Storage, captioning and embedding are independent of each
+            # other; run them concurrently so the job takes the slowest one
+            async def embed():
+                if "embedding" in cached:
+                    return cached["embedding"]
+                return await self.embedder.embed_image(image_bytes, image=image)
             
-            # 5. Embedding
-            embedding = await self.embedder.embed_image(image_bytes)
+            meta, (caption, conf, origin, _), embedding = await asyncio.gather(
+                self.storage.save_image(image_hash, image_bytes, image=image),
+                resolve_caption(decision, image_bytes, job, self.captioner, image),
+                embed(),
+            )
             if hasattr(embedding, 'tolist'):
                 embedding = embedding.tolist()
+            # Release the decoded pixels before the DB and Redis round-trips
+            del image
                 
-            # 6. Save to DB
+            # 7. Save to DB
             payload = {
                 "original_filename": job.get("filename", "unknown"),
                 "content_type": job.get("content_type", "image/jpeg"),
                 "job_id": job_id
             }
+            if phash is not None:
+                payload["phash"] = f"{phash:016x}"
             
-            await self.db.upsert_image(
+            await self._upsert(dict(
                 image_id=image_hash,
                 caption=caption,
                 caption_confidence=conf,
@@ -122,9 +146,19 @@ class IngestionWorker(BaseWorker):
                 thumbnail_path=meta.thumbnail_path,
                 owner_user_id=job.get("user_id"),
                 visibility=job.get("visibility", "private")
-            )
+            ))
+            
+            # Model-made captions become cache entries for this image and its
+            # near-duplicates (client-supplied edge captions are not shared)
+            if decision.tier in (RoutingTier.LOCAL, RoutingTier.CLOUD) and caption:
+                await self.router.cache.store(image_bytes, {
+                    "caption": caption,
+                    "confidence": conf,
+                    "origin": origin,
+                    "embedding": embedding
+                }, phash=phash)
             
-            # 7. Store Result in Redis (for polling)
+            # 8. Store Result in Redis (for polling)
             result = {
                 "status": "completed",
                 "image_id": image_hash,
@@ -134,16 +168,16 @@ class IngestionWorker(BaseWorker):
                 "completed_at": time.time()
             }
             
-            await self.redis.setex(
+            pipe.setex(
                 f"{self.RESULT_PREFIX}{job_id}",
                 3600,
                 json.dumps(result)
             )
-            logger.info(f"Ingestion complete for job {job_id} -> image {image_hash}")
+            logger.debug("Ingestion complete for job %s -> image %s", job_id, image_hash)
             
         except Exception as e:
             logger.error(f"Job {job_id} failed: {e}", exc_info=True)
-            await self.redis.setex(
+            pipe.setex(
                 f"{self.RESULT_PREFIX}{job_id}",
                 3600,
                 json.dumps({
@@ -157,4 +191,4 @@ class IngestionWorker(BaseWorker):
 if __name__ == "__main__":
     concurrency = int(os.getenv("WORKER_CONCURRENCY", "4"))
     worker = IngestionWorker(concurrency=concurrency)
-    asyncio.run(worker.start())
+    run_worker(worker)
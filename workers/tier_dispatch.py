@@ -0,0 +1,49 @@
+"""Caption resolution for a routing decision, shared by the caption and ingestion workers"""
+from typing import Optional, Tuple
+from PIL import Image
+from apps.api.services.routing.router import RoutingDecision, RoutingTier
+
+
+async def _local(decision, image_bytes, job, captioner, image):
+    caption, conf, latency = await captioner.caption(image_bytes, image=image)
+    return caption, conf, "local", latency
+
+
+async def _cloud(decision, image_bytes, job, captioner, image):
+    caption, latency, _ = await captioner.caption_cloud(image_bytes)
+    return caption, 0.95, "cloud", latency
+
+
+async def _edge(decision, image_bytes, job, captioner, image):
+    return job.get("text_hint", ""), job.get("client_confidence", 1.0), "edge", 0
+
+
+async def _cache(decision, image_bytes, job, captioner, image):
+    cached = decision.metadata.get("cached_result", {})
+    return cached.get("caption", ""), cached.get("confidence", 1.0), cached.get("origin", "cache"), 0
+
+
+_HANDLERS = {
+    RoutingTier.LOCAL: _local,
+    RoutingTier.CLOUD: _cloud,
+    RoutingTier.EDGE: _edge,
+    RoutingTier.CACHE: _cache,
+}
+
+
+async def resolve_caption(
+    decision: RoutingDecision,
+    image_bytes: bytes,
+    job: dict,
+    captioner,
+    image: Optional[Image.Image] = None
+) -> Tuple[str, float, str, int]:
+    """Run the caption tier the router chose.
+    
+    Returns (caption, confidence, origin, latency_ms); an unknown tier
+    yields an empty local caption.
+    """
+    handler = _HANDLERS.get(decision.tier)
+    if handler is None:
+        return "", 0.0, "local", 0
+    return await handler(decision, image_bytes, job, captioner, image)